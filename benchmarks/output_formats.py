@@ -0,0 +1,103 @@
+"""
+Compares the report formats of PROFILER_OUTPUT_FORMAT (csv, parquet, feather) on synthetic
+datasets: time to write the report chunk by chunk as the profiler does, size of the report
+and time to load it back with pandas, as the analysts do. The model is not run, the class
+column is filled with random classes.
+
+Usage, from the project's root directory:
+    python -m benchmarks.output_formats [--rows 10000 1000000] [--chunk-rows 100000]
+                                        [--formats csv parquet feather] [--output <json>]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from user_profiler import writers
+from . import synthetic
+
+
+BENCHMARKS_DIRECTORY = os.path.join(synthetic.PROJECT_DIRECTORY, 'benchmarks')
+
+
+def write_report(dataset: str, output_format: str, output: str, chunk_rows: int) -> float:
+  """Writes the report of the dataset like UserProfiler._write_chunk, returns the seconds spent writing."""
+  rng = np.random.default_rng(0)
+  dtype = str if output_format != 'csv' else None
+  reader = pd.read_csv(dataset, sep=synthetic.SEPARATOR, dtype=dtype, chunksize=chunk_rows)
+  writer = writers.get_writer(output_format, output) if output_format != 'csv' else None
+  seconds = 0.0
+  include_header = True
+  for chunk in reader:
+    chunk['gender_class'] = rng.integers(0, 2, size=len(chunk))
+    started = time.perf_counter()
+    if writer is None:
+      headers = chunk.columns.tolist() if include_header else False
+      chunk.to_csv(path_or_buf=output, sep=synthetic.SEPARATOR, mode='a', header=headers, index=False)
+    else:
+      writer.write(chunk)
+    seconds += time.perf_counter() - started
+    include_header = False
+  if writer is not None:
+    started = time.perf_counter()
+    writer.close()
+    seconds += time.perf_counter() - started
+  return seconds
+
+
+def load_report(output_format: str, output: str) -> float:
+  started = time.perf_counter()
+  if output_format == 'csv':
+    pd.read_csv(output, sep=synthetic.SEPARATOR)
+  elif output_format == 'parquet':
+    pd.read_parquet(output)
+  else:
+    pd.read_feather(output)
+  return time.perf_counter() - started
+
+
+def bench_format(dataset: str, output_format: str, chunk_rows: int) -> dict:
+  directory = tempfile.mkdtemp()
+  output = os.path.join(directory, f'report.{writers.get_extension(output_format)}')
+  try:
+    write_seconds = write_report(dataset, output_format, output, chunk_rows)
+    return {
+      'format': output_format,
+      'write_seconds': write_seconds,
+      'size_bytes': os.path.getsize(output),
+      'load_seconds': load_report(output_format, output),
+    }
+  finally:
+    if os.path.exists(output):
+      os.remove(output)
+    os.rmdir(directory)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000])
+  parser.add_argument('--chunk-rows', type=int, default=100000)
+  parser.add_argument('--formats', nargs='+', choices=list(writers.OUTPUT_FORMATS), default=list(writers.OUTPUT_FORMATS))
+  parser.add_argument('--data-directory', default=os.path.join(BENCHMARKS_DIRECTORY, 'data'))
+  parser.add_argument('--output', default=None, help='also writes the results to this JSON file')
+  args = parser.parse_args()
+
+  results = []
+  print(f'{"rows":>10} {"format":>8} {"write s":>9} {"size MB":>9} {"load s":>8}')
+  for rows in args.rows:
+    dataset = synthetic.generate_dataset(args.data_directory, rows)
+    for output_format in args.formats:
+      result = dict(bench_format(dataset, output_format, args.chunk_rows), rows=rows)
+      results.append(result)
+      print(f'{rows:>10} {output_format:>8} {result["write_seconds"]:>9.2f} '
+            f'{result["size_bytes"] / 1048576:>9.1f} {result["load_seconds"]:>8.2f}')
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,120 @@
+"""
+Compares the int8 quantized model (GENDER_CLASSIFIER_BACKEND=tflite_int8) with the float model:
+    - drift: rows whose gender_class changes, and the differences between the probabilities
+    - accuracy of both models, when the dataset has a column with the expected gender_class
+    - throughput of the forward pass of both models at several batch sizes
+
+The TFLite models are read from the model directory when they were exported there
+(python -m classifiers.export [--quantize]), else exported to a temporary directory.
+
+Usage, from the project's root directory:
+    python -m benchmarks.quantization --dataset <csv> [--label-column <column>] [--rows 10000]
+                                      [--reference keras] [--batch-sizes 1 32 128 512] [--output <json>]
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+
+from classifiers.gender_classifier import GenderClassifier
+
+
+def get_classifier(backend: str, model_directory: str, tokenizer_directory: str,
+                   export_directory: str) -> GenderClassifier:
+  if backend != 'keras' and not os.path.exists(GenderClassifier._get_model_file(model_directory, backend)):
+    from classifiers.export import export_tflite
+    export_tflite(model_directory, export_directory, quantize=backend == 'tflite_int8')
+    model_directory = export_directory
+  return GenderClassifier(model_directory, tokenizer_directory, backend=backend)
+
+
+def get_drift(reference: np.array, quantized: np.array, labels: np.array=None) -> dict:
+  """Compares the probabilities of both models and, given the expected classes, their accuracy."""
+  reference_classes = reference.argmax(axis=1)
+  quantized_classes = quantized.argmax(axis=1)
+  differences = np.abs(reference - quantized)
+  drift = {
+    'rows': len(reference),
+    'changed_rows': int((reference_classes != quantized_classes).sum()),
+    'agreement': float((reference_classes == quantized_classes).mean()),
+    'max_abs_proba_difference': float(differences.max()) if len(differences) else 0.0,
+    'mean_abs_proba_difference': float(differences.mean()) if len(differences) else 0.0,
+  }
+  if labels is not None:
+    drift['reference_accuracy'] = float((reference_classes == labels).mean())
+    drift['quantized_accuracy'] = float((quantized_classes == labels).mean())
+  return drift
+
+
+def get_throughput(classifier: GenderClassifier, X: np.array, batch_sizes: list) -> dict:
+  """Rows per second of the forward pass only, the inputs are tokenized once beforehand."""
+  xtest = [
+    classifier._preprocess_inputs(X[:, col], maxlen)
+    for col, maxlen in zip(classifier._col_X, classifier._maxlen)
+  ]
+  throughput = {}
+  for batch_size in batch_sizes:
+    classifier._model.predict([x[:batch_size] for x in xtest], batch_size=batch_size)  # Warm up
+    started = time.perf_counter()
+    classifier._model.predict(xtest, batch_size=batch_size)
+    throughput[batch_size] = len(X) / (time.perf_counter() - started)
+  return throughput
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--dataset', required=True)
+  parser.add_argument('--separator', default=';')
+  parser.add_argument('--label-column', default=None, help='column holding the expected gender_class')
+  parser.add_argument('--rows', type=int, default=10000)
+  parser.add_argument('--reference', choices=['keras', 'tflite'], default='keras')
+  parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 32, 128, 512])
+  parser.add_argument('--model-directory', default=os.getenv('GENDER_CLASSIFIER_MODEL_DIRECTORY'))
+  parser.add_argument('--tokenizer-directory', default=os.getenv('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY'))
+  parser.add_argument('--output', default=None, help='also writes the report to this JSON file')
+  args = parser.parse_args()
+
+  columns = GenderClassifier._INPUT_COLUMNS + ([args.label_column] if args.label_column else [])
+  df = pd.read_csv(args.dataset, sep=args.separator, usecols=columns, nrows=args.rows)
+  if args.label_column:
+    df = df.dropna(subset=[args.label_column])
+  X = df[GenderClassifier._INPUT_COLUMNS].values.astype(str)
+  labels = df[args.label_column].astype(int).values if args.label_column else None
+
+  export_directory = tempfile.mkdtemp()
+  backends = [args.reference, 'tflite_int8']
+  classifiers = {
+    backend: get_classifier(backend, args.model_directory, args.tokenizer_directory, export_directory)
+    for backend in backends
+  }
+  y_probas = {backend: classifier._infer(X) for backend, classifier in classifiers.items()}
+  report = {
+    'reference': args.reference,
+    'drift': get_drift(y_probas[args.reference], y_probas['tflite_int8'], labels),
+    'rows_per_second': {
+      backend: get_throughput(classifier, X, args.batch_sizes) for backend, classifier in classifiers.items()
+    },
+  }
+
+  drift = report['drift']
+  print(f'{drift["changed_rows"]} of {drift["rows"]} rows change class ({drift["agreement"]:.4%} agreement)')
+  print(f'Probabilities differ by {drift["mean_abs_proba_difference"]:.6f} on average, '
+        f'{drift["max_abs_proba_difference"]:.6f} at most')
+  if labels is not None:
+    print(f'Accuracy: {drift["reference_accuracy"]:.4%} ({args.reference}), '
+          f'{drift["quantized_accuracy"]:.4%} (tflite_int8)')
+  print(f'{"batch size":>12}' + ''.join(f'{backend + " rows/s":>22}' for backend in backends))
+  for batch_size in args.batch_sizes:
+    print(f'{batch_size:>12}' + ''.join(
+      f'{report["rows_per_second"][backend][batch_size]:>22.0f}' for backend in backends
+    ))
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
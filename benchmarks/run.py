@@ -0,0 +1,231 @@
+"""
+Benchmarks the profiling hot path on synthetic datasets and a stand-in model:
+    - preprocess: GenderClassifier._preprocess_inputs on every feature
+    - predict: GenderClassifier.predict, chunk by chunk
+    - profile_users: UserProfiler._profile_users end to end on a local file
+    - handler: Handler streaming upload and download against a local S3 stand-in
+      (skipped unless S3_ENDPOINT_URL is set, e.g. to a moto server)
+
+Every case runs in a fresh process, so its peak RSS is its own. Results are appended
+as JSON lines to the results file, one per case and dataset size, to compare runs.
+
+Usage, from the project's root directory:
+    python -m benchmarks.run [--rows 10000 1000000 10000000] [--duplicate-ratio 0.9]
+                             [--bio-length 80] [--cases preprocess predict ...]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from . import synthetic
+
+
+PROJECT_DIRECTORY = synthetic.PROJECT_DIRECTORY
+BENCHMARKS_DIRECTORY = os.path.join(PROJECT_DIRECTORY, 'benchmarks')
+_READ_CHUNK_ROWS = 100000
+_TRANSFER_PIECE_SIZE = 8388608  # 8 MB
+
+
+def _peak_rss_mb() -> float:
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _read_chunks(dataset: str, columns: list=None):
+  import pandas as pd
+  return pd.read_csv(dataset, sep=synthetic.SEPARATOR, usecols=columns, chunksize=_READ_CHUNK_ROWS)
+
+
+def _get_classifier():
+  from classifiers.gender_classifier import GenderClassifier
+  return GenderClassifier(
+    os.environ['GENDER_CLASSIFIER_MODEL_DIRECTORY'],
+    os.environ['GENDER_CLASSIFIER_TOKENIZER_DIRECTORY'],
+    backend=os.getenv('GENDER_CLASSIFIER_BACKEND'),
+    bucketing=os.getenv('GENDER_CLASSIFIER_BUCKETING', 'false').lower() in ('1', 'true', 'yes')
+  )
+
+
+def bench_preprocess(dataset: str) -> dict:
+  classifier = _get_classifier()
+  rows, seconds = 0, 0.0
+  for chunk in _read_chunks(dataset, classifier.get_input_columns()):
+    X = chunk[classifier.get_input_columns()].values.astype(str)
+    started = time.perf_counter()
+    for col, maxlen in zip(classifier._col_X, classifier._maxlen):
+      classifier._preprocess_inputs(X[:, col], maxlen)
+    seconds += time.perf_counter() - started
+    rows += len(X)
+  return {'rows': rows, 'seconds': seconds}
+
+
+def bench_predict(dataset: str) -> dict:
+  classifier = _get_classifier()
+  classifier.warm_up()
+  classifier.reset_stats()
+  rows, seconds = 0, 0.0
+  for chunk in _read_chunks(dataset, classifier.get_input_columns()):
+    started = time.perf_counter()
+    classifier.predict(chunk)
+    seconds += time.perf_counter() - started
+    rows += len(chunk)
+  return {'rows': rows, 'seconds': seconds, 'classifier': classifier.get_stats()}
+
+
+def bench_profile_users(dataset: str) -> dict:
+  from user_profiler import UserProfiler
+  profiler = UserProfiler()
+  profiler.warm_up()
+  started = time.perf_counter()
+  processed_file = profiler._profile_users(dataset)
+  seconds = time.perf_counter() - started
+  os.remove(processed_file)
+  stats = profiler.get_job_stats()
+  return {'rows': stats['rows'], 'seconds': seconds, 'stage_seconds': stats['stage_seconds']}
+
+
+def bench_handler(dataset: str) -> dict:
+  from storage_handler import Handler
+  handler = Handler()
+  client = handler._client
+  try:
+    client.create_bucket(Bucket=handler._bucket_name)
+  except client.exceptions.BucketAlreadyOwnedByYou:
+    pass
+  key = 'benchmarks/' + os.path.basename(dataset)
+
+  started = time.perf_counter()
+  with open(dataset, 'rb') as f, handler.open_upload_stream(key) as upload:
+    for piece in iter(lambda: f.read(_TRANSFER_PIECE_SIZE), b''):
+      upload.write(piece)
+  uploaded = time.perf_counter()
+  stream = handler.open_stream(key)
+  while stream.read(_TRANSFER_PIECE_SIZE):
+    pass
+  downloaded = time.perf_counter()
+  client.delete_object(Bucket=handler._bucket_name, Key=key)
+
+  rows = sum(len(chunk) for chunk in _read_chunks(dataset, ['id_str']))
+  return {
+    'rows': rows,
+    'seconds': downloaded - started,
+    'bytes': os.path.getsize(dataset),
+    'upload_seconds': uploaded - started,
+    'download_seconds': downloaded - uploaded,
+  }
+
+
+CASES = {
+  'preprocess': bench_preprocess,
+  'predict': bench_predict,
+  'profile_users': bench_profile_users,
+  'handler': bench_handler,
+}
+
+
+def _run_case(case: str, dataset: str) -> dict:
+  result = CASES[case](dataset)
+  result['peak_rss_mb'] = _peak_rss_mb()
+  return result
+
+
+def run_case(case: str, dataset: str) -> dict:
+  # A pool of one spawned process per case, so no case inherits another's memory
+  with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+    result = pool.submit(_run_case, case, dataset).result()
+  result['rows_per_second'] = result['rows'] / result['seconds'] if result['seconds'] > 0 else 0.0
+  return result
+
+
+def get_revision() -> str:
+  try:
+    return subprocess.run(
+      ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIRECTORY,
+      check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def setup_environment(artifacts_directory: str, dataset: str):
+  from .stand_in import build_stand_in
+  # The bucketing mode needs a model accepting sequences of any length
+  variable_length = os.getenv('GENDER_CLASSIFIER_BUCKETING', 'false').lower() in ('1', 'true', 'yes')
+  if variable_length:
+    artifacts_directory += '_variable_length'
+  model_directory, tokenizer_directory = build_stand_in(artifacts_directory, dataset, variable_length=variable_length)
+  backend = os.getenv('GENDER_CLASSIFIER_BACKEND', 'keras')
+  if backend != 'keras':
+    from classifiers.gender_classifier import GenderClassifier
+    if not os.path.exists(GenderClassifier._get_model_file(model_directory, backend)):
+      from classifiers.export import export_tflite
+      export_tflite(model_directory, quantize=backend == 'tflite_int8')
+  os.environ.setdefault('GENDER_CLASSIFIER_MODEL_DIRECTORY', model_directory)
+  os.environ.setdefault('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY', tokenizer_directory)
+  # UserProfiler requires them, but the benchmarks never send an email
+  os.environ.setdefault('EXPIRATION_IN_DAYS', '7')
+  os.environ.setdefault('SES_EMAIL', 'benchmarks@example.com')
+  os.environ.setdefault('AWS_REGION_NAME', 'us-east-1')
+  os.environ.setdefault('S3_BUCKET_NAME', 'benchmarks')
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--rows', type=int, nargs='+', default=[10000, 1000000, 10000000])
+  parser.add_argument('--duplicate-ratio', type=float, default=0.9)
+  parser.add_argument('--bio-length', type=int, default=80)
+  parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+  parser.add_argument('--data-directory', default=os.path.join(BENCHMARKS_DIRECTORY, 'data'))
+  parser.add_argument('--results', default=os.path.join(BENCHMARKS_DIRECTORY, 'results.jsonl'))
+  parser.add_argument('--label', default=None, help='free text stored with the results, e.g. the settings tried')
+  args = parser.parse_args()
+
+  cases = args.cases
+  if 'handler' in cases and not os.getenv('S3_ENDPOINT_URL'):
+    print('Skipping the handler benchmark: S3_ENDPOINT_URL is not set.', file=sys.stderr)
+    cases = [case for case in cases if case != 'handler']
+
+  datasets = {
+    rows: synthetic.generate_dataset(args.data_directory, rows, args.duplicate_ratio, args.bio_length)
+    for rows in args.rows
+  }
+  setup_environment(os.path.join(args.data_directory, 'stand_in'), datasets[min(datasets)])
+
+  run = {
+    'revision': get_revision(),
+    'label': args.label,
+    'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    'python': platform.python_version(),
+    'machine': platform.machine(),
+    'cpus': os.cpu_count(),
+    'duplicate_ratio': args.duplicate_ratio,
+    'bio_length': args.bio_length,
+    # The PROFILER_* and GENDER_CLASSIFIER_* settings the results were measured with
+    'settings': {
+      name: value for name, value in sorted(os.environ.items())
+      if name.startswith('PROFILER_') or name in (
+        'GENDER_CLASSIFIER_BATCH_SIZE', 'GENDER_CLASSIFIER_BACKEND', 'GENDER_CLASSIFIER_BUCKETING'
+      )
+    },
+  }
+  print(f'{"case":<16}{"rows":>12}{"seconds":>12}{"rows/s":>14}{"peak RSS (MB)":>16}')
+  with open(args.results, 'a') as f:
+    for rows, dataset in sorted(datasets.items()):
+      for case in cases:
+        result = run_case(case, dataset)
+        print(
+          f'{case:<16}{result["rows"]:>12}{result["seconds"]:>12.2f}'
+          f'{result["rows_per_second"]:>14.0f}{result["peak_rss_mb"]:>16.1f}'
+        )
+        f.write(json.dumps({**run, 'case': case, 'dataset_rows': rows, **result}, default=float) + '\n')
+        f.flush()
+
+
+if __name__ == '__main__':
+  main()
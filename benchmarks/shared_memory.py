@@ -0,0 +1,118 @@
+"""
+Measures the memory of Celery prefork children holding the classifier, with and without
+GENDER_CLASSIFIER_SHARED_DIRECTORY, for each inference backend. Like a Celery worker, a
+parent process forks --concurrency children, which each load the stand-in classifier,
+warm it up and classify a sample of a synthetic dataset; all of them are measured once
+they all hold their model.
+
+rss counts the pages a child shares with the others in full, pss counts its share of
+them and uss only its private pages: the memory of the host grows with the sum of pss.
+
+Usage, from the project's root directory:
+    python -m benchmarks.shared_memory [--concurrency 8] [--backends keras tflite]
+                                       [--shared-directory /dev/shm] [--output <json>]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+from . import synthetic
+
+
+BENCHMARKS_DIRECTORY = os.path.join(synthetic.PROJECT_DIRECTORY, 'benchmarks')
+
+_MEASURE = """
+import sys, json, multiprocessing
+import pandas as pd
+from user_profiler import resources
+
+def child(args, dataset, barrier, queue):
+  from classifiers.gender_classifier import GenderClassifier
+  classifier = GenderClassifier(**args)
+  classifier.warm_up()
+  classifier.predict(pd.read_csv(dataset, sep=';', dtype=str, nrows=10000))
+  barrier.wait()  # Every child holds its classifier
+  queue.put(resources.memory_usage())
+  barrier.wait()  # and is alive while the others are measured
+
+args, dataset, concurrency = json.loads(sys.argv[1]), sys.argv[2], int(sys.argv[3])
+context = multiprocessing.get_context('fork')  # Celery prefork
+barrier, queue = context.Barrier(concurrency), context.Queue()
+children = [context.Process(target=child, args=(args, dataset, barrier, queue)) for _ in range(concurrency)]
+for process in children:
+  process.start()
+usages = [queue.get() for _ in children]
+for process in children:
+  process.join()
+print(json.dumps(usages))
+"""
+
+
+def measure(args: dict, dataset: str, concurrency: int) -> list:
+  output = subprocess.run(
+    [sys.executable, '-c', _MEASURE, json.dumps(args), dataset, str(concurrency)],
+    cwd=synthetic.PROJECT_DIRECTORY, check=True, stdout=subprocess.PIPE, universal_newlines=True
+  ).stdout
+  # The classifiers print while loading, the measures are on the last line
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def get_artifacts(directory: str, dataset: str, backend: str) -> tuple:
+  from .stand_in import build_stand_in
+  from classifiers.gender_classifier import GenderClassifier
+  model_directory, tokenizer_directory = build_stand_in(directory, dataset)
+  if backend != 'keras' and not os.path.exists(GenderClassifier._get_model_file(model_directory, backend)):
+    from classifiers.export import export_tflite
+    export_tflite(model_directory, quantize=backend == 'tflite_int8')
+  return model_directory, tokenizer_directory
+
+
+def summarize(usages: list) -> dict:
+  mean = lambda name: sum(usage[name] or 0 for usage in usages) / len(usages) / 1048576
+  return {
+    'rss_mb': mean('rss'),
+    'pss_mb': mean('pss'),
+    'uss_mb': mean('uss'),
+    'total_pss_mb': mean('pss') * len(usages),
+  }
+
+
+def main():
+  default_shared_directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--concurrency', type=int, default=8)
+  parser.add_argument('--backends', nargs='+', choices=['keras', 'tflite', 'tflite_int8'], default=['keras', 'tflite'])
+  parser.add_argument('--shared-directory', default=default_shared_directory)
+  parser.add_argument('--data-directory', default=os.path.join(BENCHMARKS_DIRECTORY, 'data'))
+  parser.add_argument('--output', default=None, help='also writes the results to this JSON file')
+  args = parser.parse_args()
+
+  dataset = synthetic.generate_dataset(args.data_directory, 10000)
+  results = []
+  print(f'{"backend":<12}{"shared":>8}{"child RSS MB":>14}{"child PSS MB":>14}{"child USS MB":>14}{"total PSS MB":>14}')
+  for backend in args.backends:
+    model_directory, tokenizer_directory = get_artifacts(os.path.join(args.data_directory, 'stand_in'), dataset, backend)
+    for shared_directory in (None, args.shared_directory):
+      classifier_args = {
+        'model_directory': model_directory,
+        'tokenizer_directory': tokenizer_directory,
+        'backend': backend,
+        'shared_directory': shared_directory,
+      }
+      result = dict(
+        summarize(measure(classifier_args, dataset, args.concurrency)),
+        backend=backend, shared=shared_directory is not None, concurrency=args.concurrency
+      )
+      results.append(result)
+      print(f'{backend:<12}{str(result["shared"]):>8}{result["rss_mb"]:>14.1f}{result["pss_mb"]:>14.1f}'
+            f'{result["uss_mb"]:>14.1f}{result["total_pss_mb"]:>14.1f}')
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,61 @@
+"""
+Small stand-in for the production gender model, so the benchmarks run without the
+trained artifacts. It has the same three character inputs and output, and it is saved
+with the file names GenderClassifier expects, but its predictions are meaningless:
+only use it to measure throughput and memory.
+"""
+import os
+import pickle
+import pandas as pd
+
+from classifiers.gender_classifier import GenderClassifier
+
+
+def get_artifact_directories(directory: str) -> tuple:
+  return os.path.join(directory, 'model'), os.path.join(directory, 'tokenizer')
+
+
+def build_stand_in(directory: str, dataset: str, embedding_size: int=16, variable_length: bool=False) -> tuple:
+  """
+  Writes the tokenizer and the model of the stand-in classifier, reusing them if they exist.
+
+  Inputs:
+      - directory, str: where the artifacts are written
+      - dataset, str: CSV file the character tokenizer is fitted on
+      - embedding_size, int: size of the character embeddings
+      - variable_length, bool: leaves the sequence lengths undefined, for GENDER_CLASSIFIER_BUCKETING
+  Outputs:
+      - (model_directory, tokenizer_directory), tuple: the directories to give to GenderClassifier
+  """
+  from keras.layers import Concatenate, Dense, Embedding, GlobalAveragePooling1D, Input
+  from keras.models import Model
+  from keras.preprocessing.text import Tokenizer
+
+  model_directory, tokenizer_directory = get_artifact_directories(directory)
+  level = GenderClassifier._LEVEL
+  tokenizer_file = os.path.join(tokenizer_directory, f'tokenizer_{level}.pkl')
+  model_file = GenderClassifier._get_model_file(model_directory, 'keras')
+  if os.path.exists(tokenizer_file) and os.path.exists(model_file):
+    return model_directory, tokenizer_directory
+
+  os.makedirs(model_directory, exist_ok=True)
+  os.makedirs(tokenizer_directory, exist_ok=True)
+  df = pd.read_csv(dataset, sep=';', usecols=GenderClassifier._INPUT_COLUMNS, nrows=10000, dtype=str)
+  tokenizer = Tokenizer(char_level=True, lower=True, oov_token='UNK')
+  tokenizer.fit_on_texts(df.fillna('').values.ravel().tolist())
+  with open(tokenizer_file, 'wb') as f:
+    pickle.dump(tokenizer, f)
+
+  # Inputs in the order of GenderClassifier._FEATURES, like the production model
+  inputs, encoded = [], []
+  # Padding is masked, so trimming it does not change the predictions
+  embedding = Embedding(len(tokenizer.word_index) + 1, embedding_size, mask_zero=True)
+  for feature, (_, maxlen) in GenderClassifier._FEATURES.items():
+    layer = Input(shape=(None if variable_length else maxlen,), name=feature)
+    inputs.append(layer)
+    encoded.append(GlobalAveragePooling1D()(embedding(layer)))
+  output = Dense(2, activation='softmax')(Concatenate()(encoded))
+  model = Model(inputs=inputs, outputs=output)
+  model.compile(optimizer='adam', loss='categorical_crossentropy')
+  model.save(model_file)
+  return model_directory, tokenizer_directory
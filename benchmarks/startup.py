@@ -0,0 +1,67 @@
+"""
+Measures the startup cost of importing tasks in a producer (which only calls .delay)
+versus a worker process (which also initializes and warms up the profiler), for each
+inference backend (GENDER_CLASSIFIER_BACKEND).
+
+Usage, from the project's root directory:
+    python -m benchmarks.startup [--repeat 3] [--backends keras tflite]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_MEASURE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import tasks
+imported = time.perf_counter()
+if sys.argv[1] == 'worker':
+  tasks.get_profiler()
+initialized = time.perf_counter()
+print(json.dumps({
+  'import_seconds': imported - started,
+  'init_seconds': initialized - imported,
+  'total_seconds': initialized - started,
+  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+  'tensorflow_loaded': 'tensorflow' in sys.modules,
+}))
+"""
+
+
+def measure(role: str, backend: str=None) -> dict:
+  env = dict(os.environ)
+  if backend is not None:
+    env['GENDER_CLASSIFIER_BACKEND'] = backend
+  output = subprocess.run(
+    [sys.executable, '-c', _MEASURE, role], cwd=PROJECT_DIRECTORY, env=env,
+    check=True, stdout=subprocess.PIPE, universal_newlines=True
+  ).stdout
+  # The profiler prints while initializing, the measures are on the last line
+  return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--backends', nargs='+', choices=['keras', 'tflite', 'tflite_int8'], default=['keras'])
+  args = parser.parse_args()
+
+  roles = [('producer', None)] + [('worker', backend) for backend in args.backends]
+  print(f'{"role":<18}{"import (s)":>12}{"init (s)":>12}{"total (s)":>12}{"peak RSS (MB)":>16}{"TF loaded":>12}')
+  for role, backend in roles:
+    runs = [measure(role, backend) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run['total_seconds'])
+    name = f'{role} ({backend})' if backend else role
+    print(
+      f'{name:<18}{best["import_seconds"]:>12.2f}{best["init_seconds"]:>12.2f}'
+      f'{best["total_seconds"]:>12.2f}{best["peak_rss_mb"]:>16.1f}{str(best["tensorflow_loaded"]):>12}'
+    )
+
+
+if __name__ == '__main__':
+  main()
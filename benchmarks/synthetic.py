@@ -0,0 +1,98 @@
+"""
+Synthetic tweet datasets shaped like classifiers/tests/data/dataset.csv.
+
+Every row belongs to a user (name, username, bio) drawn from a pool sized by the
+duplicate ratio, like tweet exports where the same account appears many times.
+"""
+import os
+import numpy as np
+import pandas as pd
+
+
+PROJECT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DATASET = os.path.join(PROJECT_DIRECTORY, 'classifiers', 'tests', 'data', 'dataset.csv')
+SEPARATOR = ';'
+COLUMNS = [
+  'text', 'category', 'name', 'username', 'bio', 'url', 'img',
+  'lang', 'location', 'institution', 'dataset', 'id_str',
+]
+CATEGORIES = ['Salud', 'Seguridad', 'Economía', 'Educación', 'Política']
+_BLOCK_ROWS = 100000
+_EXCLUDED_CHARACTERS = set(SEPARATOR + '"\r\n\x00')
+
+
+def get_alphabet() -> np.array:
+  """Code points of the characters used in the sample dataset, weighted by frequency."""
+  df = pd.read_csv(SAMPLE_DATASET, sep=SEPARATOR)
+  text = ''.join(df[['name', 'bio', 'text']].fillna('').astype(str).values.ravel())
+  characters = [c for c in text if c not in _EXCLUDED_CHARACTERS]
+  return np.array([ord(c) for c in characters], dtype=np.uint32)
+
+
+def random_strings(rng: np.random.Generator, alphabet: np.array, count: int,
+                   mean_length: int, max_length: int) -> np.array:
+  """Random strings of the alphabet with lengths around mean_length, at most max_length."""
+  max_length = max(1, max_length)
+  code_points = alphabet[rng.integers(0, len(alphabet), size=(count, max_length))]
+  lengths = np.clip(rng.poisson(mean_length, size=count), 0, max_length)
+  # NumPy strips trailing NULs, which gives each string its own length
+  code_points[np.arange(max_length)[None, :] >= lengths[:, None]] = 0
+  return np.ascontiguousarray(code_points).view(f'<U{max_length}').ravel()
+
+
+def get_dataset_path(directory: str, rows: int, duplicate_ratio: float, bio_length: int) -> str:
+  name = f'tweets_{rows}_dup{duplicate_ratio:g}_bio{bio_length}.csv'
+  return os.path.join(directory, name)
+
+
+def generate_dataset(directory: str, rows: int, duplicate_ratio: float=0.9,
+                     bio_length: int=80, seed: int=0) -> str:
+  """
+  Writes a synthetic dataset of the given number of rows, reusing it if it already exists.
+
+  Inputs:
+      - directory, str: where the dataset is written
+      - rows, int: number of tweets
+      - duplicate_ratio, float: fraction of rows whose user already appeared (0 = one user per row)
+      - bio_length, int: mean length of the bios (at most twice that long)
+      - seed, int: seed of the random generator
+  Outputs:
+      - path, str: path of the dataset
+  """
+  path = get_dataset_path(directory, rows, duplicate_ratio, bio_length)
+  if os.path.exists(path):
+    return path
+
+  os.makedirs(directory, exist_ok=True)
+  rng = np.random.default_rng(seed)
+  alphabet = get_alphabet()
+  users = max(1, int(round(rows * (1 - duplicate_ratio))))
+  names = random_strings(rng, alphabet, users, 14, 50)
+  usernames = random_strings(rng, alphabet, users, 10, 15)
+  bios = random_strings(rng, alphabet, users, bio_length, 2 * bio_length)
+
+  temporary_path = path + '.tmp'
+  with open(temporary_path, 'w', encoding='utf-8', newline='') as f:
+    for start in range(0, rows, _BLOCK_ROWS):
+      count = min(_BLOCK_ROWS, rows - start)
+      # The first rows introduce every user once, the others pick from the pool
+      user_ids = rng.integers(0, users, size=count)
+      first_rows = np.arange(start, start + count)
+      user_ids = np.where(first_rows < users, first_rows, user_ids)
+      block = pd.DataFrame({
+        'text': random_strings(rng, alphabet, count, 120, 280),
+        'category': rng.choice(CATEGORIES, size=count),
+        'name': names[user_ids],
+        'username': usernames[user_ids],
+        'bio': bios[user_ids],
+        'url': '',
+        'img': 'https://pbs.twimg.com/profile_images/' + pd.Series(user_ids).astype(str) + '_normal.jpg',
+        'lang': 'es',
+        'location': '',
+        'institution': 0,
+        'dataset': 'AR_Argentina (T)',
+        'id_str': first_rows,
+      }, columns=COLUMNS)
+      block.to_csv(f, sep=SEPARATOR, header=start == 0, index=False)
+  os.replace(temporary_path, path)
+  return path
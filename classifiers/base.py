@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+from typing import Callable, List
+
+
+DataFrame = pd.DataFrame
+
+
+class Classifier(ABC):
+  """
+  Interface of the classifiers UserProfiler runs on every chunk, modeled on GenderClassifier.
+
+  A classifier reads its input columns (_INPUT_COLUMNS) from the chunk, encodes each of its
+  features (_FEATURES: name -> (index of the input column, maxlen)) and writes one class
+  column, <tag>_class. Classifiers returning the same tokenizer key encode a column the
+  same way, so the profiler has each column of a chunk encoded once for all of them
+  through SharedEncodings. A classifier may write more columns than its class, e.g. the
+  probability of each class, listed by get_output_columns and returned by predict_outputs.
+  A classifier missing one of the abstract methods fails when it is created.
+  """
+
+  _TAG = None
+  _FEATURES = {}
+  _INPUT_COLUMNS = []
+
+  def get_tag(self) -> str:
+    return self._TAG
+
+  def get_input_columns(self) -> list:
+    return list(self._INPUT_COLUMNS)
+
+  def get_class_column(self) -> str:
+    return '{}_class'.format(self._TAG)
+
+  def get_output_columns(self) -> list:
+    """Returns the columns the classifier adds to the chunks, its class column first."""
+    return [self.get_class_column()]
+
+  def get_features(self) -> dict:
+    """Returns the maximum length of the encoded sequence of each input column the model reads."""
+    return {self._INPUT_COLUMNS[index]: maxlen for index, maxlen in self._FEATURES.values()}
+
+  def get_input_bytes_per_row(self) -> int:
+    """Returns the size of the padded int32 model inputs of one row."""
+    return sum(maxlen for _, maxlen in self._FEATURES.values()) * np.dtype(np.int32).itemsize
+
+  def get_tokenizer_key(self) -> str:
+    """Returns the identity of the tokenizer, None when the encodings cannot be shared."""
+    return None
+
+  @abstractmethod
+  def get_batch_size(self) -> int:
+    pass
+
+  @abstractmethod
+  def get_model_version(self) -> str:
+    pass
+
+  def warm_up(self):
+    pass
+
+  @abstractmethod
+  def get_stats(self) -> dict:
+    pass
+
+  @abstractmethod
+  def reset_stats(self):
+    pass
+
+  @abstractmethod
+  def merge_stats(self, stats: dict):
+    pass
+
+  @abstractmethod
+  def predict_classes(self, dataset: DataFrame, encodings: 'SharedEncodings'=None) -> np.array:
+    """
+    Objective: predicts the class of every row of the dataset
+
+    Inputs:
+        - dataset, DataFrame: must contain the input columns
+        - encodings, SharedEncodings: the encodings of the columns of dataset shared with other classifiers
+    Outputs:
+        - y_preds, np.array: the predicted class of each row
+    """
+
+  def predict_outputs(self, dataset: DataFrame, encodings: 'SharedEncodings'=None) -> dict:
+    """
+    Objective: predicts the values of every output column for every row of the dataset
+
+    Inputs:
+        - dataset, DataFrame: must contain the input columns
+        - encodings, SharedEncodings: the encodings of the columns of dataset shared with other classifiers
+    Outputs:
+        - outputs, dict: the values of each row, by output column
+    """
+    return {self.get_class_column(): self.predict_classes(dataset, encodings)}
+
+
+class SharedEncodings:
+  """
+  Encoded columns of one chunk, shared by the classifiers of a tokenizer key. Each column
+  is factorized once and only its distinct values are encoded, once per (tokenizer key,
+  maxlen); every classifier then takes the rows it needs from them.
+  """
+
+  def __init__(self, dataset: DataFrame):
+    self._dataset = dataset
+    self._codes = {}
+    self._encodings = {}
+
+  def encode(self, tokenizer_key: str, encode: Callable, column: str, maxlen: int,
+             rows: np.array=None) -> np.array:
+    """
+    Objective: encodes a column of the chunk, reusing its encoding by another classifier
+
+    Inputs:
+        - tokenizer_key, str: identity of the tokenizer, see Classifier.get_tokenizer_key
+        - encode, Callable: encodes an array of texts into sequences of maxlen, encode(texts, maxlen)
+        - column, str: the column of the chunk
+        - maxlen, int: the length of each sequence
+        - rows, np.array: positions of the rows to return, all of them by default
+    Outputs:
+        - sequences, np.array: the encoded rows
+    """
+    if column not in self._codes:
+      self._codes[column] = pd.factorize(self._dataset[column].to_numpy().astype(str))
+    codes, uniques = self._codes[column]
+    key = (tokenizer_key, column, maxlen)
+    if key not in self._encodings:
+      self._encodings[key] = encode(np.asarray(uniques, dtype=str), maxlen)
+    encoded = self._encodings[key]
+    return encoded[codes] if rows is None else encoded[codes[rows]]
+
+
+def _as_objects(dataset: DataFrame, columns: list) -> DataFrame:
+  """
+  Returns the input columns as Python objects when they are held in extension arrays, e.g.
+  the Arrow backed strings of memory-bounded profiling, so a missing value is still
+  encoded as str(nan) and not str(pd.NA).
+  """
+  columns = list(dict.fromkeys(columns))
+  if not any(pd.api.types.is_extension_array_dtype(dataset[column].dtype) for column in columns):
+    return dataset
+  inputs = dataset[columns].astype(object)
+  return inputs.where(inputs.notna(), np.nan)
+
+
+def predict_all(classifiers: List[Classifier], dataset: DataFrame) -> dict:
+  """
+  Objective: runs every classifier on the dataset, encoding each column once for the
+  classifiers sharing a tokenizer
+
+  Inputs:
+      - classifiers, list: the classifiers, in the order of their output columns
+      - dataset, DataFrame: must contain the input columns of every classifier
+  Outputs:
+      - outputs, dict: the values of each row, by output column (e.g. the predicted class by class column)
+  """
+  dataset = _as_objects(dataset, [column for classifier in classifiers for column in classifier.get_input_columns()])
+  keys = [classifier.get_tokenizer_key() for classifier in classifiers]
+  encodings = SharedEncodings(dataset)
+  outputs = {}
+  for classifier, key in zip(classifiers, keys):
+    shared = key is not None and keys.count(key) > 1
+    outputs.update(classifier.predict_outputs(dataset, encodings if shared else None))
+  return outputs
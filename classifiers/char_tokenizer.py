@@ -0,0 +1,126 @@
+import os
+import uuid
+import numpy as np
+from typing import Iterable
+
+
+class CharTokenizer:
+  """
+  Vectorized replacement for Keras' character level texts_to_sequences followed by
+  pad_sequences (pre padding and pre truncation).
+
+  The word index of the fitted Keras tokenizer is compiled once into a lookup table
+  indexed by unicode code point, so a whole column is encoded with NumPy array
+  operations instead of per character Python loops.
+
+  The table can be kept in a file that every process maps read-only, e.g. the Celery
+  children of a worker: they share one copy of it, and only its pages of the code
+  points actually seen are ever read into memory.
+  """
+
+  _TABLE_SIZE = 0x110000  # Every unicode code point
+  _BLOCK_SIZE = 8192  # Rows encoded at once, bounds the temporary (rows, longest text) arrays
+  _LONG_TEXT_FACTOR = 4  # Texts longer than this many sequences are encoded one by one
+
+  def __init__(self, word_index: dict, lower: bool=True, num_words: int=None, oov_token: str=None,
+               table_file: str=None):
+    self._lower = lower
+    if table_file is None:
+      self._table = self._build_table(word_index, num_words, oov_token)
+    else:
+      self._table = self._map_table(table_file, word_index, num_words, oov_token)
+
+  @classmethod
+  def from_keras(cls, tokenizer, table_file: str=None):
+    """
+    Objective: build the lookup table tokenizer of a fitted Keras tokenizer
+
+    Inputs:
+        - tokenizer, keras.preprocessing.text.Tokenizer: a character level tokenizer
+        - table_file, str: .npy file mapped read-only as the lookup table, written first if it
+          does not exist. It must only hold tables of this tokenizer.
+    Outputs:
+        - char_tokenizer, CharTokenizer: encodes texts the same way as the Keras tokenizer
+    """
+    if not tokenizer.char_level:
+      raise ValueError('Only character level tokenizers can be vectorized.')
+    return cls(
+      tokenizer.word_index, lower=tokenizer.lower,
+      num_words=tokenizer.num_words, oov_token=tokenizer.oov_token, table_file=table_file
+    )
+
+  def _map_table(self, table_file: str, word_index: dict, num_words: int, oov_token: str) -> np.array:
+    if not os.path.exists(table_file):
+      table = self._build_table(word_index, num_words, oov_token)
+      temporary_file = f'{table_file}.{uuid.uuid4().hex}.tmp'
+      with open(temporary_file, 'wb') as f:
+        np.save(f, table)
+      try:
+        # Unlike a rename, a link never replaces the table another process may have mapped already
+        os.link(temporary_file, table_file)
+      except FileExistsError:
+        pass
+      finally:
+        os.remove(temporary_file)
+    table = np.load(table_file, mmap_mode='r')
+    if table.shape != (self._TABLE_SIZE,) or table.dtype != np.int32:
+      raise ValueError(f'{table_file}: Not a lookup table of {self._TABLE_SIZE} int32 indexes.')
+    return table
+
+  def _build_table(self, word_index: dict, num_words: int, oov_token: str) -> np.array:
+    oov_index = word_index.get(oov_token) if oov_token is not None else None
+    unknown_index = oov_index if oov_index is not None else 0
+    table = np.full(self._TABLE_SIZE, unknown_index, dtype=np.int32)
+    for char, index in word_index.items():
+      if len(char) != 1:  # e.g. the oov token itself
+        continue
+      if num_words and index >= num_words:
+        index = unknown_index
+      table[ord(char)] = index
+    # Code point 0 pads the fixed width NumPy strings and must never produce a token
+    table[0] = 0
+    return table
+
+  def encode(self, texts: Iterable[str], maxlen: int) -> np.array:
+    """
+    Objective: encode texts into padded sequences of character indexes
+
+    Inputs:
+        - texts, Iterable[str]: the texts to encode
+        - maxlen, int: the length of each sequence
+    Outputs:
+        - sequences, np.array: int32 array of shape (len(texts), maxlen)
+    """
+    texts = [text.lower() for text in texts] if self._lower else list(texts)
+    sequences = np.zeros((len(texts), maxlen), dtype=np.int32)
+    # A few very long texts (e.g. a field swallowing the rest of a file through a broken quote)
+    # would widen the arrays of their whole block to their length
+    max_length = self._LONG_TEXT_FACTOR * maxlen
+    for i, text in enumerate(texts):
+      if len(text) > max_length:
+        self._encode_text(text, sequences[i], maxlen)
+        texts[i] = ''
+    for start in range(0, len(texts), self._BLOCK_SIZE):
+      end = start + self._BLOCK_SIZE
+      self._encode_block(texts[start:end], sequences[start:end], maxlen)
+    return sequences
+
+  def _encode_text(self, text: str, out: np.array, maxlen: int):
+    code_points = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    indexes = self._table[code_points]
+    indexes = indexes[indexes > 0][-maxlen:]
+    out[maxlen - len(indexes):] = indexes
+
+  def _encode_block(self, texts: list, out: np.array, maxlen: int):
+    if not texts:
+      return
+    characters = np.array(texts, dtype=str)
+    code_points = characters.view(np.uint32).reshape(len(texts), -1)
+    indexes = self._table[code_points]
+    known = indexes > 0
+
+    # Number of known characters from each position to the end of its text: the last
+    # known character goes to the last column and only the last maxlen are kept
+    from_end = np.cumsum(known[:, ::-1], axis=1, dtype=np.int32)[:, ::-1]
+    rows, columns = np.nonzero(known & (from_end <= maxlen))
+    out[rows, maxlen - from_end[rows, columns]] = indexes[rows, columns]
@@ -0,0 +1,61 @@
+"""
+Exports the Keras gender model to TensorFlow Lite, for GENDER_CLASSIFIER_BACKEND=tflite,
+or with its weights quantized to int8 for GENDER_CLASSIFIER_BACKEND=tflite_int8.
+
+Usage, from the project's root directory:
+    python -m classifiers.export --model-directory <directory> [--output-directory <directory>] [--quantize]
+"""
+import os
+import argparse
+
+from .gender_classifier import GenderClassifier
+
+
+PathLike = os.PathLike
+
+
+def export_tflite(model_directory: PathLike, output_directory: PathLike=None,
+                  quantize: bool=False) -> PathLike:
+  """
+  Objective: converts the h5 model of the model directory to a TFLite flatbuffer
+
+  Inputs:
+      - model_directory, PathLike: the path where lies the h5 model
+      - output_directory, PathLike: where the TFLite model is written, the model directory by default
+      - quantize, bool: stores the weights as int8, activations are quantized dynamically at inference
+  Outputs:
+      - model_file, PathLike: path of the TFLite model
+  """
+  import tensorflow as tf
+  from keras.models import load_model
+
+  output_directory = output_directory if output_directory else model_directory
+  model = load_model(GenderClassifier._get_model_file(model_directory, 'keras'))
+  converter = tf.lite.TFLiteConverter.from_keras_model(model)
+  if quantize:
+    # Dynamic range quantization: no representative dataset needed
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+  flatbuffer = converter.convert()
+
+  backend = 'tflite_int8' if quantize else 'tflite'
+  model_file = GenderClassifier._get_model_file(output_directory, backend)
+  temporary_file = model_file + '.tmp'
+  with open(temporary_file, 'wb') as f:
+    f.write(flatbuffer)
+  os.replace(temporary_file, model_file)
+  return model_file
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--model-directory', default=os.getenv('GENDER_CLASSIFIER_MODEL_DIRECTORY'))
+  parser.add_argument('--output-directory', default=None)
+  parser.add_argument('--quantize', action='store_true', help='export the int8 model (tflite_int8 backend)')
+  args = parser.parse_args()
+  if args.model_directory is None:
+    parser.error('--model-directory is required when GENDER_CLASSIFIER_MODEL_DIRECTORY is not set.')
+  print(export_tflite(args.model_directory, args.output_directory, args.quantize))
+
+
+if __name__ == '__main__':
+  main()
@@ -1,22 +1,27 @@
 import os
+import time
+import hashlib
 from os.path import join
 import pandas as pd
 import numpy as np
 import pickle
-from keras.models import load_model
-from keras import Model
-from keras.preprocessing.sequence import pad_sequences
-from keras.preprocessing.text import Tokenizer
+from keras_preprocessing.sequence import pad_sequences
+from keras_preprocessing.text import Tokenizer
 
 
 from . import exceptions
+from .base import Classifier, SharedEncodings
+from .prediction_cache import PredictionCache
+from .char_tokenizer import CharTokenizer
+from .tflite_model import TFLiteModel
+from .name_lexicon import NameLexicon, get_lexicon_file
 
 
 PathLike = os.PathLike
 DataFrame = pd.DataFrame
 
 
-class GenderClassifier:
+class GenderClassifier(Classifier):
 
   _TAG = 'gender'
   _FEATURES = {
@@ -24,14 +29,49 @@ class GenderClassifier:
     'bio':(2, 160),
     'screenname': (1, 15),
   }
+  _INPUT_COLUMNS = ['name', 'username', 'bio']
   _LEVEL = 'char'
   _MODEL_FORMAT = 'character_embedding'
+  _DEFAULT_BATCH_SIZE = 32
+  _MODEL_EXTENSIONS = {
+    'keras': 'h5',
+    'tflite': 'tflite',
+    'tflite_int8': 'int8.tflite',
+  }
+  _DEFAULT_BACKEND = 'keras'
+  _LENGTH_BUCKETS = 4  # Sequence lengths per feature when bucketing, evenly spaced up to maxlen
+  _BUCKETING_TOLERANCE = 1e-4  # Largest difference of the probabilities with the padding trimmed
+  _PARITY_TEXT = 'maria jose garcia, periodista y lectora. hincha de river, amante del cafe y los libros '
+  _LEXICON_COLUMN = 'name'  # Looked up in the name lexicon
+  _DEFAULT_LEXICON_THRESHOLD = 0.95
 
-  def __init__(self, model_directory: PathLike, tokenizer_directory: PathLike):
+  def __init__(self, model_directory: PathLike, tokenizer_directory: PathLike,
+               cache_directory: PathLike=None, cache_max_entries: int=None, batch_size: int=None,
+               backend: str=None, bucketing: bool=False, shared_directory: PathLike=None,
+               probabilities: bool=False, lexicon_directory: PathLike=None, lexicon_threshold: float=None):
     try:
+      self._batch_size = batch_size if batch_size else self._DEFAULT_BATCH_SIZE
+      self._probabilities = probabilities
+      self._lexicon_threshold = lexicon_threshold if lexicon_threshold else self._DEFAULT_LEXICON_THRESHOLD
+      self._backend = backend if backend else self._DEFAULT_BACKEND
+      if self._backend not in self._MODEL_EXTENSIONS:
+        raise ValueError(f'{self._backend}: Unknown backend, expected one of {list(self._MODEL_EXTENSIONS)}.')
       self._validate_path(model_directory)
       self._validate_path(tokenizer_directory)
-      self._setup(model_directory, tokenizer_directory)
+      if cache_directory is not None:
+        self._validate_path(cache_directory)
+      if shared_directory is not None:
+        self._validate_path(shared_directory)
+      if lexicon_directory is not None:
+        self._validate_path(lexicon_directory)
+      self._setup(model_directory, tokenizer_directory, shared_directory, lexicon_directory)
+      self._bucketing = bucketing and self._supports_variable_length(self._model)
+      if bucketing and not self._bucketing:
+        print('The model inputs have a fixed length, length bucketing is disabled.')
+      elif self._bucketing and not self._check_bucketing_parity():
+        self._bucketing = False
+        print('The model predicts differently with the padding trimmed (e.g. no masking), length bucketing is disabled.')
+      self._cache = self._load_cache(model_directory, tokenizer_directory, cache_directory, cache_max_entries)
     except Exception as e:
       raise exceptions.ClassifierInitException(str(e))
   
@@ -40,27 +80,99 @@ class GenderClassifier:
       raise IOError(f'{path}: This is not a valid directory.')
     return True
    
-  def _setup(self, model_directory: PathLike, tokenizer_directory: PathLike):
+  def _setup(self, model_directory: PathLike, tokenizer_directory: PathLike, shared_directory: PathLike=None,
+             lexicon_directory: PathLike=None):
     self._setupParams()
+    self._lexicon_file = get_lexicon_file(lexicon_directory, self._TAG) if lexicon_directory is not None else None
+    self._model_version = self._get_model_version(model_directory, tokenizer_directory)
+    self._tokenizer_version = self._get_tokenizer_version(tokenizer_directory)
     self._tokenizer = self._load_tokenizer(tokenizer_directory)
+    self._char_tokenizer = self._build_char_tokenizer(self._tokenizer, self._get_table_file(shared_directory))
     self._model = self._load_model(model_directory)
+    needs_classes = self._probabilities or self._lexicon_file is not None
+    self._n_classes = self._get_n_classes(self._model) if needs_classes else None
+    self._lexicon = self._load_lexicon(self._lexicon_file)
+    if shared_directory is not None and self._backend == 'keras':
+      print('The Keras model weights are loaded in every process, use a tflite backend to share them.')
   
   def _setupParams(self):
+    self.reset_stats()
     features = self._FEATURES.values()
     self._col_X = [feature[0] for feature in features]
     self._maxlen = [feature[1] for feature in features]
   
-  def _get_model_name(self) -> str:
+  @classmethod
+  def _get_model_name(cls) -> str:
     """
     Objective: gets the name of the prediction model
 
     Output:
         - model_name, str: name of the prediction model
     """
-    name = '_'.join(self._FEATURES.keys())
-    model_name = '{}_{}_{}'.format(self._TAG, self._MODEL_FORMAT, name)
+    name = '_'.join(cls._FEATURES.keys())
+    model_name = '{}_{}_{}'.format(cls._TAG, cls._MODEL_FORMAT, name)
     return model_name
+
+  @classmethod
+  def _get_model_file(cls, directory: PathLike, backend: str='keras') -> PathLike:
+    """
+    Objective: gets the path of the model file of a backend
+
+    Inputs:
+        - directory, PathLike: the path where lie the models
+        - backend, str: keras (h5 file), tflite or tflite_int8 (exported by classifiers.export)
+    Output:
+        - model_file, PathLike: path of the model file
+    """
+    return join(directory, '{}.{}'.format(cls._get_model_name(), cls._MODEL_EXTENSIONS[backend]))
   
+  def _get_model_version(self, model_directory: PathLike, tokenizer_directory: PathLike) -> str:
+    """
+    Objective: fingerprints the files the predictions depend on, so results computed by
+    another model or tokenizer are told apart
+
+    Inputs:
+        - model_directory, PathLike: the path where lie the models
+        - tokenizer_directory, PathLike: the path to the tokenizer file
+    Outputs:
+        - model_version, str: hex digest of the backend, model and tokenizer files, and of the
+          output columns and name lexicon when they are enabled
+    """
+    files = [
+      self._get_model_file(model_directory, self._backend),
+      self._get_tokenizer_file(tokenizer_directory),
+    ]
+    prefix = self._backend
+    if self._probabilities:
+      prefix += ';probabilities'
+    if self._lexicon_file is not None:
+      # The users resolved by the lexicon depend on its names and threshold
+      files.append(self._lexicon_file)
+      prefix += ';lexicon:{}'.format(self._lexicon_threshold)
+    return self._get_files_digest(prefix, files)
+
+  def _get_tokenizer_version(self, tokenizer_directory: PathLike) -> str:
+    """
+    Objective: fingerprints the tokenizer file, the classifiers sharing it encode their inputs the same way
+
+    Inputs:
+        - tokenizer_directory, PathLike: the path to the tokenizer file
+    Outputs:
+        - tokenizer_version, str: hex digest of the tokenizer file
+    """
+    return self._get_files_digest(self._LEVEL, [self._get_tokenizer_file(tokenizer_directory)])
+
+  def _get_files_digest(self, prefix: str, files: list) -> str:
+    digest = hashlib.sha1(prefix.encode())
+    for file in files:
+      with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+          digest.update(block)
+    return digest.hexdigest()
+
+  def _get_tokenizer_file(self, directory: PathLike) -> PathLike:
+    return join(directory, 'tokenizer_{}.pkl'.format(self._LEVEL))
+
   def _load_tokenizer(self, directory: PathLike) -> Tokenizer:
     """
     Objective: load an existing tokenizer if exists in the folder directory, else fit one from Keras on X and save it in this folder
@@ -71,22 +183,142 @@ class GenderClassifier:
         - tokenizer, keras.preprocessing.text.Tokenizer: tokenizer for characeter embeddings
     """
 
-    tokenizer = pickle.load(open(join(directory, 'tokenizer_{}.pkl'.format(self._LEVEL)), 'rb'))
+    tokenizer = pickle.load(open(self._get_tokenizer_file(directory), 'rb'))
     return tokenizer
 
-  def _load_model(self, directory: PathLike) -> Model:
+  def _get_table_file(self, shared_directory: PathLike=None) -> PathLike:
+    """
+    Objective: gets the file of the lookup table shared by the processes of a shared directory
+
+    Inputs:
+        - shared_directory, PathLike: the path where lie the shared files, e.g. /dev/shm
+    Outputs:
+        - table_file, PathLike: one file per model version, or None when nothing is shared
+    """
+    if shared_directory is None:
+      return None
+    return join(shared_directory, '{}_{}_table_{}.npy'.format(self._get_model_name(), self._LEVEL, self._model_version))
+
+  def _build_char_tokenizer(self, tokenizer: Tokenizer, table_file: PathLike=None) -> CharTokenizer:
+    """
+    Objective: compile the word index of a character level tokenizer into a vectorized lookup table
+
+    Inputs:
+        - tokenizer, keras.preprocessing.text.Tokenizer: tokenizer for character embeddings
+        - table_file, PathLike: file mapped read-only as the lookup table, written if missing
+    Outputs:
+        - char_tokenizer, CharTokenizer: the vectorized tokenizer, or None if the tokenizer is not character level
+    """
+    if not getattr(tokenizer, 'char_level', False):
+      return None
+    return CharTokenizer.from_keras(tokenizer, table_file)
+
+  def _load_model(self, directory: PathLike):
     """
     Objective: from a model check if it exists and load it otherwise create a new one
     
     Inputs:
         - directory, PathLike: the path where lie the models
     Outputs:
-        - model, keras.model: a keras model to train from scratch
+        - model, keras.Model or TFLiteModel: the model of the selected backend
     """
-    model_name = self._get_model_name()
-    model = load_model(join(directory, '{}.h5'.format(model_name)))
+    model_file = self._get_model_file(directory, self._backend)
+    if self._backend != 'keras':
+      # The interpreter maps the model file read-only: every process shares its weights
+      return TFLiteModel(model_file, self._maxlen, list(self._FEATURES.keys()))
+
+    # Imported here so the TFLite backend never loads Keras (and TensorFlow)
+    from keras.models import load_model
+    model = load_model(model_file)
     return model
 
+  def _get_n_classes(self, model) -> int:
+    """Returns the number of class probabilities the model outputs."""
+    if isinstance(model, TFLiteModel):
+      return model.get_output_size()
+    return int(model.output_shape[-1])
+
+  def _load_lexicon(self, lexicon_file: PathLike) -> NameLexicon:
+    """
+    Objective: loads the name lexicon resolving the confident users without the model, see classifiers.name_lexicon
+
+    Inputs:
+        - lexicon_file, PathLike: the lexicon built for the model
+    Outputs:
+        - lexicon, NameLexicon: the first names whose class reaches the threshold, or None without a lexicon file
+    """
+    if lexicon_file is None:
+      return None
+    lexicon = NameLexicon.load(lexicon_file, self._lexicon_threshold)
+    if lexicon.get_n_classes() != self._n_classes:
+      raise ValueError(f'{lexicon_file}: {lexicon.get_n_classes()} classes in the lexicon, the model has {self._n_classes}.')
+    print(f'{len(lexicon)} first names are resolved by the name lexicon.')
+    return lexicon
+
+  def _supports_variable_length(self, model) -> bool:
+    """
+    Objective: checks if the model accepts sequences shorter than maxlen
+
+    Inputs:
+        - model, keras.Model or TFLiteModel: the model of the selected backend
+    Outputs:
+        - supported, bool: True if the sequence length of every input is undefined
+    """
+    if isinstance(model, TFLiteModel):
+      return model.supports_variable_length()
+    return all(layer.shape[1] is None for layer in model.inputs)
+
+  def _get_parity_sample(self) -> np.array:
+    """
+    Objective: builds rows whose features fall in every length bucket, in several combinations
+
+    Outputs:
+        - X, np.array: the features array (name, username, bio) as strings, one row per bucket
+    """
+    X = np.full((self._LENGTH_BUCKETS, len(self._INPUT_COLUMNS)), self._PARITY_TEXT[0], dtype=object)
+    for row in range(self._LENGTH_BUCKETS):
+      for feature, (_col, _maxlen) in enumerate(zip(self._col_X, self._maxlen)):
+        bucket = (row + feature) % self._LENGTH_BUCKETS + 1
+        length = max(1, _maxlen * bucket // self._LENGTH_BUCKETS)
+        X[row, _col] = (self._PARITY_TEXT * (length // len(self._PARITY_TEXT) + 1))[:length]
+    return X.astype(str)
+
+  def _check_bucketing_parity(self) -> bool:
+    """
+    Objective: checks the model gives the same probabilities with the padding trimmed, which an
+    undefined input length does not ensure (e.g. an LSTM or a global pooling reading the padding)
+
+    Outputs:
+        - same, bool: True if the bucketed predictions of a sample match those of the full padding
+    """
+    X = self._get_parity_sample()
+    xtest = [self._preprocess_inputs(X[:, _col], maxlen=_maxlen) for _col, _maxlen in zip(self._col_X, self._maxlen)]
+    y_probas = self._model.predict(xtest, batch_size=self._batch_size)
+    return np.allclose(self._predict_bucketed(xtest), y_probas, atol=self._BUCKETING_TOLERANCE)
+
+  def _load_cache(self, model_directory: PathLike, tokenizer_directory: PathLike, cache_directory: PathLike,
+                  max_entries: int=None) -> PredictionCache:
+    """
+    Objective: open the persistent prediction cache, if a cache directory is given
+
+    Inputs:
+        - model_directory, PathLike: the path where lie the models, the entries of another model are not read
+        - tokenizer_directory, PathLike: the path to the tokenizer file, likewise
+        - cache_directory, PathLike: the path where lies the cache file
+        - max_entries, int: the maximum number of users kept in the cache
+    Outputs:
+        - cache, PredictionCache: the cache, or None when caching is disabled
+    """
+    if cache_directory is None:
+      return None
+    model_name = self._get_model_name()
+    model_files = [
+      self._get_model_file(model_directory, self._backend),
+      self._get_tokenizer_file(tokenizer_directory),
+    ]
+    lower = getattr(self._tokenizer, 'lower', False)
+    return PredictionCache(cache_directory, model_name, model_files, lower, max_entries)
+
   def _preprocess_inputs(self, X: np.array, maxlen: str):
     """
     Objective: preprocess the inputs/features for the model
@@ -94,10 +326,13 @@ class GenderClassifier:
     Inputs:
         - X, np.array: the features array
         - maxlen, int: the maximum length for each sequence
-    Outputs: (generator)
-        - X_ppd, np.array: X preprocessed
+    Outputs:
+        - X_ppd, np.array: X preprocessed, int32 array of shape (len(X), maxlen)
     """
     try:
+      if self._char_tokenizer is not None:
+        return self._char_tokenizer.encode(X, maxlen)
+
       X_ppd = self._tokenizer.texts_to_sequences(X)
       X_ppd = pad_sequences(X_ppd, maxlen=maxlen)
 
@@ -105,25 +340,314 @@ class GenderClassifier:
     except Exception as e:
       raise exceptions.PreprocessException(str(e))
 
-  def predict(self, dataset: DataFrame) -> DataFrame:
+  def _get_unique_rows(self, X: np.array):
+    """
+    Objective: find the first row of each unique user of the features array
+
+    Inputs:
+        - X, np.array: the features array (name, username, bio) as strings
+    Outputs:
+        - first_rows, np.array: the position in X of the first row of each unique user
+        - inverse, np.array: for each row of X, the index of its user in first_rows
+    """
+    frame = pd.DataFrame(X)
+    inverse = frame.groupby(list(frame.columns), sort=False).ngroup().values
+    _, first_rows = np.unique(inverse, return_index=True)
+    return first_rows, inverse
+
+  def _infer(self, X: np.array, encodings: SharedEncodings=None, rows: np.array=None) -> np.array:
+    """
+    Objective: runs the model on the features array
+
+    Inputs:
+        - X, np.array: the features array (name, username, bio) as strings
+        - encodings, SharedEncodings: the encoded columns of the chunk X was taken from, if shared
+        - rows, np.array: the position in that chunk of each row of X
+    Outputs:
+        - y_probas, np.array: the class probabilities of each row
+    """
+    # pre processing of the data before applying the model
+    started = time.perf_counter()
+    xtest = []
+    for _col, _maxlen in zip(self._col_X, self._maxlen):
+      if encodings is not None:
+        _xtest = encodings.encode(
+          self.get_tokenizer_key(), self._preprocess_inputs, self._INPUT_COLUMNS[_col], _maxlen, rows
+        )
+      else:
+        _xtest = self._preprocess_inputs(X[:, _col], maxlen=_maxlen)
+      xtest.append(_xtest)
+    tokenized = time.perf_counter()
+
+    #apply the model on the pre-processed inputs
+    if self._bucketing and len(X) > 0:
+      y_probas = self._predict_bucketed(xtest)
+    else:
+      y_probas = self._model.predict(xtest, batch_size=self._batch_size)
+    self._stats['tokenize_seconds'] += tokenized - started
+    self._stats['infer_seconds'] += time.perf_counter() - tokenized
+    return y_probas
+
+  def _get_length_buckets(self, xtest: list) -> np.array:
+    """
+    Objective: assigns every row to a bucket of sequence lengths, one length per feature
+
+    Inputs:
+        - xtest, list: the pre-padded sequences of each feature
+    Outputs:
+        - buckets, np.array: for each row, the bucket number (1 to _LENGTH_BUCKETS) of each feature
+    """
+    buckets = []
+    for _xtest, _maxlen in zip(xtest, self._maxlen):
+      # Sequences are pre-padded with zeros, their length starts at the first non zero index
+      lengths = np.where(_xtest.any(axis=1), _maxlen - (_xtest != 0).argmax(axis=1), 0)
+      bucket = np.ceil(lengths * self._LENGTH_BUCKETS / _maxlen).astype(int)
+      buckets.append(np.clip(bucket, 1, self._LENGTH_BUCKETS))
+    return np.stack(buckets, axis=1)
+
+  def _predict_bucketed(self, xtest: list) -> np.array:
+    """
+    Objective: runs the model on groups of rows of similar lengths, with the padding trimmed to the longest row of each group
+
+    Inputs:
+        - xtest, list: the pre-padded sequences of each feature
+    Outputs:
+        - y_probas, np.array: the class probabilities of each row, in the original order
+    """
+    buckets, inverse = np.unique(self._get_length_buckets(xtest), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    y_probas = None
+    for i, bucket in enumerate(buckets):
+      rows = np.flatnonzero(inverse == i)
+      lengths = [int(np.ceil(_maxlen * b / self._LENGTH_BUCKETS)) for _maxlen, b in zip(self._maxlen, bucket)]
+      inputs = [_xtest[rows, -length:] for _xtest, length in zip(xtest, lengths)]
+      _y_probas = self._model.predict(inputs, batch_size=self._batch_size)
+      if y_probas is None:
+        y_probas = np.empty((len(xtest[0]), _y_probas.shape[1]), dtype=_y_probas.dtype)
+      y_probas[rows] = _y_probas
+    return y_probas
+
+  def _predict_probas(self, X: np.array, encodings: SharedEncodings=None, rows: np.array=None) -> np.array:
+    """
+    Objective: gets the class probabilities of each row, from the cache when possible
+
+    Inputs:
+        - X, np.array: the features array (name, username, bio) as strings
+        - encodings, SharedEncodings: the encoded columns of the chunk X was taken from, if shared
+        - rows, np.array: the position in that chunk of each row of X
+    Outputs:
+        - y_probas, np.array: the class probabilities of each row
+    """
+    if self._cache is None:
+      return self._infer(X, encodings, rows)
+
+    keys = self._cache.make_keys(X)
+    cached = self._cache.get(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    self._stats['cached_rows'] += len(keys) - len(missing)
+    if len(missing) == len(keys):
+      y_probas = self._infer(X, encodings, rows)
+      self._cache.put(keys, y_probas)
+      return y_probas
+
+    inferred = None
+    if missing:
+      inferred = self._infer(X[missing], encodings, rows[missing] if rows is not None else None)
+      self._cache.put([keys[i] for i in missing], inferred)
+
+    n_classes = len(next(iter(cached.values())))
+    y_probas = np.empty((len(keys), n_classes), dtype=np.float32)
+    for i, key in enumerate(keys):
+      if key in cached:
+        y_probas[i] = cached[key]
+    if inferred is not None:
+      y_probas[missing] = inferred
+    return y_probas
+
+  def get_stats(self) -> dict:
+    """
+    Objective: gets the prediction counters since the last reset
+
+    Output:
+        - stats, dict: total rows predicted, unique users, users found in the cache, rows resolved by the
+          name lexicon, the unique ratio, the fraction of the rows resolved by each tier (lexicon, model)
+          and the time spent tokenizing, running the model and predicting overall
+    """
+    total_rows = self._stats['total_rows']
+    unique_rows = self._stats['unique_rows']
+    lexicon_ratio = self._stats['lexicon_rows'] / total_rows if total_rows else 0.0
+    return {
+      'total_rows': total_rows,
+      'unique_rows': unique_rows,
+      'cached_rows': self._stats['cached_rows'],
+      'lexicon_rows': self._stats['lexicon_rows'],
+      'unique_ratio': unique_rows / total_rows if total_rows else 0.0,
+      'tiers': {'lexicon': lexicon_ratio, 'model': 1.0 - lexicon_ratio if total_rows else 0.0},
+      'tokenize_seconds': self._stats['tokenize_seconds'],
+      'infer_seconds': self._stats['infer_seconds'],
+      'predict_seconds': self._stats['predict_seconds'],
+    }
+
+  def reset_stats(self):
+    self._stats = {
+      'total_rows': 0, 'unique_rows': 0, 'cached_rows': 0, 'lexicon_rows': 0,
+      'tokenize_seconds': 0.0, 'infer_seconds': 0.0, 'predict_seconds': 0.0,
+    }
+
+  def merge_stats(self, stats: dict):
+    """
+    Objective: adds the counters of predictions made elsewhere (e.g. in a worker process)
+
+    Inputs:
+        - stats, dict: counters as returned by get_stats
+    """
+    for name in self._stats:
+      self._stats[name] += stats.get(name, 0)
+
+  def get_batch_size(self) -> int:
+    return self._batch_size
+
+  def get_backend(self) -> str:
+    return self._backend
+
+  def get_model_version(self) -> str:
+    return self._model_version
+
+  def get_tokenizer_key(self) -> str:
+    return self._tokenizer_version
+
+  def get_output_columns(self) -> list:
+    """Returns the class column, then the probability of each class (<tag>_proba_<class>) when enabled."""
+    columns = [self.get_class_column()]
+    if self._probabilities:
+      columns += ['{}_proba_{}'.format(self._TAG, i) for i in range(self._n_classes)]
+    return columns
+
+  def warm_up(self):
+    """
+    Objective: runs a first prediction so the model graph is built before the first real dataset
+    """
+    try:
+      self._infer(np.array([['warm up', 'warm_up', 'warm up']]))
+    except Exception as e:
+      raise exceptions.PredictionException(str(e))
+
+  def _predict_unique(self, dataset: DataFrame, encodings: SharedEncodings=None):
+    """
+    Objective: gets the class probabilities of every unique user of the dataset
+
+    Inputs:
+        - dataset, DataFrame: must contain the name, username and bio columns
+        - encodings, SharedEncodings: the encoded columns of dataset, shared with other classifiers
+    Outputs:
+        - y_probas, np.array: the class probabilities of each unique user
+        - inverse, np.array: for each row of the dataset, the index of its user in y_probas
+    """
+    started = time.perf_counter()
+    # the data we need to apply the model
+    X = dataset[self._INPUT_COLUMNS].values.astype(str)
+    first_rows, inverse = self._get_unique_rows(X)
+    X_unique = X[first_rows]
+    self._stats['total_rows'] += len(X)
+    self._stats['unique_rows'] += len(X_unique)
+
+    if self._lexicon is None:
+      y_probas = self._predict_probas(X_unique, encodings, first_rows if encodings is not None else None)
+    else:
+      y_probas = self._predict_cascade(X_unique, encodings, first_rows, inverse)
+    self._stats['predict_seconds'] += time.perf_counter() - started
+    return y_probas, inverse
+
+  def _predict_cascade(self, X: np.array, encodings: SharedEncodings, first_rows: np.array,
+                       inverse: np.array) -> np.array:
+    """
+    Objective: resolves the users of a confident first name with the name lexicon, the others with the model
+
+    Inputs:
+        - X, np.array: the features array of the unique users
+        - encodings, SharedEncodings: the encoded columns of the chunk X was taken from, if shared
+        - first_rows, np.array: the position in that chunk of each row of X
+        - inverse, np.array: for each row of the chunk, its row in X
+    Outputs:
+        - y_probas, np.array: the class probabilities of each row of X
+    """
+    resolved, lexicon_probas = self._lexicon.lookup(X[:, self._INPUT_COLUMNS.index(self._LEXICON_COLUMN)])
+    ambiguous = np.flatnonzero(~resolved)
+    y_probas = np.empty((len(X), self._n_classes), dtype=np.float32)
+    y_probas[resolved] = lexicon_probas
+    if len(ambiguous):
+      rows = first_rows[ambiguous] if encodings is not None else None
+      y_probas[ambiguous] = self._predict_probas(X[ambiguous], encodings, rows)
+    self._stats['lexicon_rows'] += int(resolved[inverse].sum())
+    return y_probas
+
+  def predict_probas(self, dataset: DataFrame, encodings: SharedEncodings=None) -> np.array:
+    """
+    Objective: predicts the class probabilities of every row of the dataset, inferring once per unique user
+
+    Inputs:
+        - dataset, DataFrame: must contain the name, username and bio columns
+        - encodings, SharedEncodings: the encoded columns of dataset, shared with other classifiers
+    Outputs:
+        - y_probas, np.array: the probability of each class for each row
+    """
     try:
-      # the data we need to apply the model
-      X = dataset[['name', 'username', 'bio']].values
-
-      # pre processing of the data before applying the model
-      xtest = []
-      for _col, _maxlen in zip(self._col_X, self._maxlen):
-          _xtest = self._preprocess_inputs(X[:, _col].astype(str), maxlen=_maxlen)
-          xtest.append(_xtest)
-          
-      #apply the model on the pre-processed inputs
-      y_probas = self._model.predict(xtest)
-
-      #convert probabilities in classes
+      y_probas, inverse = self._predict_unique(dataset, encodings)
+      return y_probas[inverse]
+    except Exception as e:
+      raise exceptions.PredictionException(str(e))
+
+  def predict_classes(self, dataset: DataFrame, encodings: SharedEncodings=None) -> np.array:
+    """
+    Objective: predicts the class of every row of the dataset, inferring once per unique user
+
+    Inputs:
+        - dataset, DataFrame: must contain the name, username and bio columns
+        - encodings, SharedEncodings: the encoded columns of dataset, shared with other classifiers
+    Outputs:
+        - y_preds, np.array: the predicted class of each row
+    """
+    try:
+      y_probas, inverse = self._predict_unique(dataset, encodings)
+      #convert probabilities in classes and broadcast them back to every row
       y_preds = y_probas.argmax(axis=1)
+      return y_preds[inverse]
+    except Exception as e:
+      raise exceptions.PredictionException(str(e))
+
+  def predict_outputs(self, dataset: DataFrame, encodings: SharedEncodings=None) -> dict:
+    """
+    Objective: predicts the class of every row of the dataset and, when enabled, the probability
+    of each class as float16, enough for a confidence and half the size of float32
+
+    Inputs:
+        - dataset, DataFrame: must contain the name, username and bio columns
+        - encodings, SharedEncodings: the encoded columns of dataset, shared with other classifiers
+    Outputs:
+        - outputs, dict: the values of each row, by output column
+    """
+    if not self._probabilities:
+      return {self.get_class_column(): self.predict_classes(dataset, encodings)}
+    try:
+      y_probas, inverse = self._predict_unique(dataset, encodings)
+      columns = self.get_output_columns()
+      outputs = {columns[0]: y_probas.argmax(axis=1)[inverse]}
+      y_probas = y_probas.astype(np.float16)[inverse]
+      for i, column in enumerate(columns[1:]):
+        outputs[column] = y_probas[:, i]
+      return outputs
+    except Exception as e:
+      raise exceptions.PredictionException(str(e))
+
+  def predict(self, dataset: DataFrame, encodings: SharedEncodings=None) -> DataFrame:
+    try:
+      outputs = self.predict_outputs(dataset, encodings)
 
-      #add the column to the DataFrame
-      dataset.loc[:, '{}_class'.format(self._TAG)] = y_preds
+      #add the columns to the DataFrame
+      for column, values in outputs.items():
+        dataset.loc[:, column] = values
       return dataset
+    except exceptions.PredictionException:
+      raise
     except Exception as e:
       raise exceptions.PredictionException(str(e))
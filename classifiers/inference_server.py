@@ -0,0 +1,388 @@
+"""
+Local inference server: one process owns a classifier and predicts for every job of the
+host. Concurrent profile_users tasks each send small chunks; the server coalesces the
+requests arriving within --max-wait-ms into one batch of up to --max-batch-rows rows, so
+the model runs on full batches instead of paying its per-call overhead for every chunk.
+
+UserProfiler uses the server instead of loading the classifier when
+<NAME>_CLASSIFIER_SERVER_ADDRESS points to its Unix socket, see classifiers.registry.
+The server reads the arguments of its classifier from the same <NAME>_CLASSIFIER_*
+variables as the profiler, and both authenticate the connections with the shared key of
+<NAME>_CLASSIFIER_SERVER_AUTHKEY before any request is read.
+
+Usage, from the project's root directory:
+    python -m classifiers.inference_server --address <socket> [--classifier gender]
+                                           [--max-batch-rows 8192] [--max-wait-ms 5]
+"""
+import os
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, answer_challenge, deliver_challenge
+
+from . import exceptions
+from . import registry
+from .base import Classifier, SharedEncodings
+
+
+DataFrame = pd.DataFrame
+
+_FAMILY = 'AF_UNIX'
+
+
+class _Request:
+  def __init__(self, X: np.array):
+    self.X = X
+    self.done = threading.Event()
+    self.reply = None
+
+
+class InferenceServer:
+  """
+  Serves the predictions of one classifier on a Unix socket, one thread per client
+  connection. A single batching thread runs the classifier, so it is never called
+  concurrently.
+  """
+
+  def __init__(self, classifier: Classifier, address: str, authkey: bytes, max_batch_rows: int=8192,
+               max_wait_seconds: float=0.005):
+    if not authkey:
+      raise ValueError('The inference server needs a key to authenticate its clients.')
+    if max_batch_rows < 1:
+      raise ValueError(f'{max_batch_rows}: The batches must hold at least one row.')
+    if max_wait_seconds < 0:
+      raise ValueError(f'{max_wait_seconds}: The latency budget cannot be negative.')
+    self._classifier = classifier
+    self._address = address
+    self._authkey = authkey
+    self._max_batch_rows = max_batch_rows
+    self._max_wait_seconds = max_wait_seconds
+    self._requests = queue.Queue()
+    self._closed = threading.Event()
+    self._listener = None
+    self._threads = []
+    self._stats_lock = threading.Lock()
+    self._stats = {'requests': 0, 'batches': 0, 'rows': 0}
+
+  def _remove_stale_socket(self):
+    """Removes the socket left by a server that is gone, fails if one still listens there."""
+    if not os.path.exists(self._address):
+      return
+    try:
+      Client(self._address, family=_FAMILY).close()
+    except (ConnectionRefusedError, FileNotFoundError):
+      os.remove(self._address)
+      return
+    raise exceptions.ClassifierInitException(f'{self._address}: An inference server is already listening.')
+
+  def start(self) -> 'InferenceServer':
+    """Listens on the socket and starts serving in background threads."""
+    self._remove_stale_socket()
+    self._classifier.warm_up()
+    # Only the user running the jobs may connect, the socket is never open to the others
+    umask = os.umask(0o177)
+    try:
+      self._listener = Listener(self._address, family=_FAMILY)
+    finally:
+      os.umask(umask)
+    for target in (self._accept_connections, self._run_batches):
+      thread = threading.Thread(target=target, daemon=True)
+      thread.start()
+      self._threads.append(thread)
+    print(f'Inference server of {self._classifier.get_class_column()} listening on {self._address}.')
+    return self
+
+  def serve_forever(self):
+    self.start()
+    try:
+      self._closed.wait()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      self.close()
+
+  def close(self):
+    if self._closed.is_set():
+      return
+    self._closed.set()
+    if self._listener is not None:
+      # Wakes up the accepting thread so it sees the server is closed
+      try:
+        Client(self._address, family=_FAMILY).close()
+      except OSError:
+        pass
+      self._listener.close()
+    for thread in self._threads:
+      thread.join()
+    if os.path.exists(self._address):
+      os.remove(self._address)
+
+  def __enter__(self) -> 'InferenceServer':
+    return self.start()
+
+  def __exit__(self, *args):
+    self.close()
+
+  def get_info(self) -> dict:
+    """Describes the served classifier, for the clients to stand in for it."""
+    return {
+      'tag': self._classifier.get_tag(),
+      'input_columns': self._classifier.get_input_columns(),
+      'class_column': self._classifier.get_class_column(),
+      'output_columns': self._classifier.get_output_columns(),
+      'features': self._classifier.get_features(),
+      'batch_size': self._classifier.get_batch_size(),
+      'model_version': self._classifier.get_model_version(),
+    }
+
+  def get_stats(self) -> dict:
+    """
+    Objective: gets the counters of the server since it started
+
+    Output:
+        - stats, dict: requests received, batches run, rows predicted and the counters of the classifier
+    """
+    with self._stats_lock:
+      stats = dict(self._stats)
+    stats['rows_per_batch'] = stats['rows'] / stats['batches'] if stats['batches'] else 0.0
+    stats['classifier'] = self._classifier.get_stats()
+    return stats
+
+  def _accept_connections(self):
+    while not self._closed.is_set():
+      try:
+        connection = self._listener.accept()
+      except OSError:
+        break
+      if self._closed.is_set():
+        connection.close()
+        break
+      threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+  def _authenticate(self, connection) -> bool:
+    """Checks the client holds the key, like Listener.accept, without blocking the accepting thread."""
+    try:
+      deliver_challenge(connection, self._authkey)
+      answer_challenge(connection, self._authkey)
+    except (AuthenticationError, EOFError, OSError):
+      return False
+    return True
+
+  def _serve_connection(self, connection):
+    with connection:
+      # Nothing is unpickled from a client without the key
+      if not self._authenticate(connection):
+        return
+      while not self._closed.is_set():
+        try:
+          message = connection.recv()
+        except (EOFError, OSError):
+          return
+        kind = message[0] if isinstance(message, tuple) and message else None
+        if kind == 'predict':
+          reply = self._submit(message[1])
+        elif kind == 'info':
+          reply = ('ok', self.get_info())
+        elif kind == 'stats':
+          reply = ('ok', self.get_stats())
+        else:
+          reply = ('error', f'{kind}: Unknown request.')
+        try:
+          connection.send(reply)
+        except OSError:
+          return
+
+  def _submit(self, X: np.array) -> tuple:
+    """Queues the rows for the next batch and waits for their predictions."""
+    request = _Request(X)
+    self._requests.put(request)
+    while not request.done.wait(0.1):
+      if self._closed.is_set():
+        return ('error', 'The inference server is closed.')
+    return request.reply
+
+  def _run_batches(self):
+    pending = None
+    while not self._closed.is_set():
+      if pending is None:
+        try:
+          pending = self._requests.get(timeout=0.1)
+        except queue.Empty:
+          continue
+      batch, rows, pending = [pending], len(pending.X), None
+      deadline = time.perf_counter() + self._max_wait_seconds
+      while rows < self._max_batch_rows:
+        timeout = deadline - time.perf_counter()
+        try:
+          request = self._requests.get(timeout=timeout) if timeout > 0 else self._requests.get_nowait()
+        except queue.Empty:
+          break
+        if rows + len(request.X) > self._max_batch_rows:
+          # Starts the next batch, requests are never split
+          pending = request
+          break
+        batch.append(request)
+        rows += len(request.X)
+      self._predict_batch(batch, rows)
+
+  def _predict_batch(self, batch: list, rows: int):
+    try:
+      X = np.concatenate([request.X for request in batch]) if len(batch) > 1 else batch[0].X
+      outputs = self._classifier.predict_outputs(DataFrame(X, columns=self._classifier.get_input_columns()))
+      offsets = np.cumsum([len(request.X) for request in batch])[:-1]
+      splits = {column: np.split(np.asarray(values), offsets) for column, values in outputs.items()}
+      replies = [('ok', {column: values[i] for column, values in splits.items()}) for i in range(len(batch))]
+    except Exception as e:
+      print(f'Inference server failed to predict a batch of {rows} rows: {e}')
+      replies = [('error', str(e))] * len(batch)
+    with self._stats_lock:
+      self._stats['requests'] += len(batch)
+      self._stats['batches'] += 1
+      self._stats['rows'] += rows
+    for request, reply in zip(batch, replies):
+      request.reply = reply
+      request.done.set()
+
+
+class InferenceClient(Classifier):
+  """
+  Stands in for the classifier served by an InferenceServer: the rows are sent to the
+  server, which holds the model and encodes them, and the predictions come back.
+  """
+
+  def __init__(self, address: str, authkey: bytes):
+    self._address = address
+    self._authkey = authkey
+    self._lock = threading.Lock()
+    self._connection = None
+    info = self._request(('info',), exceptions.ClassifierInitException)
+    self._TAG = info['tag']
+    self._INPUT_COLUMNS = info['input_columns']
+    self._class_column = info['class_column']
+    self._output_columns = info['output_columns']
+    self._features = info['features']
+    self._batch_size = info['batch_size']
+    self._model_version = info['model_version']
+    self.reset_stats()
+
+  def _close_connection(self):
+    if self._connection is not None:
+      try:
+        self._connection.close()
+      except OSError:
+        pass
+      self._connection = None
+
+  def close(self):
+    with self._lock:
+      self._close_connection()
+
+  def _request(self, message: tuple, exception_class=exceptions.PredictionException):
+    """Sends a request to the server, connecting again once if the connection was lost."""
+    with self._lock:
+      for attempt in range(2):
+        try:
+          if self._connection is None:
+            self._connection = Client(self._address, family=_FAMILY, authkey=self._authkey)
+          self._connection.send(message)
+          status, result = self._connection.recv()
+          break
+        except AuthenticationError as e:
+          self._close_connection()
+          raise exception_class(f'{self._address}: Inference server rejected the key, {e}')
+        except (OSError, EOFError) as e:
+          self._close_connection()
+          if attempt:
+            raise exception_class(f'{self._address}: Inference server unreachable, {e}')
+    if status != 'ok':
+      raise exception_class(result)
+    return result
+
+  def get_class_column(self) -> str:
+    return self._class_column
+
+  def get_output_columns(self) -> list:
+    return list(self._output_columns)
+
+  def get_features(self) -> dict:
+    return dict(self._features)
+
+  def get_input_bytes_per_row(self) -> int:
+    # The model inputs are built in the server process
+    return 0
+
+  def get_batch_size(self) -> int:
+    return self._batch_size
+
+  def get_model_version(self) -> str:
+    return self._model_version
+
+  def get_server_stats(self) -> dict:
+    return self._request(('stats',))
+
+  def get_stats(self) -> dict:
+    """
+    Objective: gets the prediction counters since the last reset
+
+    Output:
+        - stats, dict: total rows predicted, requests sent, the time spent waiting for the server
+          and predicting overall
+    """
+    return dict(self._stats)
+
+  def reset_stats(self):
+    self._stats = {'total_rows': 0, 'requests': 0, 'infer_seconds': 0.0, 'predict_seconds': 0.0}
+
+  def merge_stats(self, stats: dict):
+    for name in self._stats:
+      self._stats[name] += stats.get(name, 0)
+
+  def predict_outputs(self, dataset: DataFrame, encodings: SharedEncodings=None) -> dict:
+    """
+    Objective: predicts the output columns of every row of the dataset on the server
+
+    Inputs:
+        - dataset, DataFrame: must contain the input columns of the served classifier
+        - encodings, SharedEncodings: unused, the server encodes the rows
+    Outputs:
+        - outputs, dict: the values of each row, by output column
+    """
+    started = time.perf_counter()
+    try:
+      X = dataset[self._INPUT_COLUMNS].values.astype(str)
+    except KeyError as e:
+      raise exceptions.PredictionException(str(e))
+    requested = time.perf_counter()
+    outputs = self._request(('predict', X))
+    finished = time.perf_counter()
+    self._stats['total_rows'] += len(X)
+    self._stats['requests'] += 1
+    self._stats['infer_seconds'] += finished - requested
+    self._stats['predict_seconds'] += finished - started
+    return outputs
+
+  def predict_classes(self, dataset: DataFrame, encodings: SharedEncodings=None) -> np.array:
+    return self.predict_outputs(dataset, encodings)[self._class_column]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--address', required=True, help='path of the Unix socket to listen on')
+  parser.add_argument('--classifier', default='gender', help='a registered classifier, or name=package.module:Class')
+  parser.add_argument('--max-batch-rows', type=int, default=8192)
+  parser.add_argument('--max-wait-ms', type=float, default=5.0, help='latency budget to fill a batch')
+  args = parser.parse_args()
+
+  import settings  # Reads the .env file, like the workers
+  name, = registry.parse_classifiers(args.classifier)
+  classifier = registry.get_classifier_class(name)(**registry.get_classifier_args(name))
+  authkey = registry.get_server_authkey(name)
+  InferenceServer(classifier, args.address, authkey, args.max_batch_rows, args.max_wait_ms / 1000).serve_forever()
+
+
+if __name__ == '__main__':
+  main()
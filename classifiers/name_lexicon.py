@@ -0,0 +1,130 @@
+"""
+Lexicon of first names, the cheap first tier of GenderClassifier: the users whose first
+name is in the lexicon with a confident class take its probabilities, and only the others
+go through the model.
+
+The lexicon is distilled from the predictions of the model itself on a dataset: the mean
+class probabilities of the users of each first name seen often enough. Which names are
+confident is decided when loading it (GENDER_CLASSIFIER_LEXICON_THRESHOLD), so the
+threshold can be tuned without building it again.
+
+Usage, from the project's root directory:
+    python -m classifiers.name_lexicon --dataset <csv> --lexicon-directory <directory> [--min-count 20]
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+
+PathLike = os.PathLike
+DataFrame = pd.DataFrame
+
+_SEPARATOR = ';'
+_NAME_COLUMN = 'first_name'
+_FIRST_NAME_PATTERN = r'^\W*([^\W\d_]+)'  # The first run of letters, e.g. "jean" in "Jean-Pierre 🌍"
+
+
+def get_lexicon_file(directory: PathLike, tag: str) -> PathLike:
+  return os.path.join(directory, '{}_name_lexicon.csv'.format(tag))
+
+
+def get_first_names(names: np.array) -> pd.Series:
+  """Returns the case folded first name of each name, NaN when a name has none."""
+  return pd.Series(names, dtype=object).astype(str).str.casefold().str.extract(_FIRST_NAME_PATTERN, expand=False)
+
+
+class NameLexicon:
+  """
+  Class probabilities of the first names resolved without the model, those whose most
+  likely class reaches the threshold.
+  """
+
+  def __init__(self, probas: DataFrame, threshold: float):
+    if not 0 < threshold <= 1:
+      raise ValueError(f'{threshold}: The lexicon threshold must be in ]0, 1].')
+    confident = probas[probas.max(axis=1) >= threshold]
+    self._index = pd.Index(confident.index)
+    self._probas = confident.to_numpy(dtype=np.float32)
+    self._n_classes = probas.shape[1]
+
+  @classmethod
+  def load(cls, file: PathLike, threshold: float) -> 'NameLexicon':
+    """
+    Objective: reads a lexicon written by build_lexicon
+
+    Inputs:
+        - file, PathLike: the lexicon, first_name;proba_0;proba_1...
+        - threshold, float: the minimum probability of the most likely class of a name to resolve it
+    Outputs:
+        - lexicon, NameLexicon: the confident names of the file
+    """
+    lexicon = pd.read_csv(file, sep=_SEPARATOR, index_col=_NAME_COLUMN, keep_default_na=False)
+    if lexicon.index.has_duplicates:
+      raise ValueError(f'{file}: The first names of the lexicon must be unique.')
+    return cls(lexicon, threshold)
+
+  def __len__(self) -> int:
+    return len(self._index)
+
+  def get_n_classes(self) -> int:
+    return self._n_classes
+
+  def lookup(self, names: np.array):
+    """
+    Objective: resolves the users whose first name is confident
+
+    Inputs:
+        - names, np.array: the name of each user
+    Outputs:
+        - resolved, np.array: True for each user found in the lexicon
+        - y_probas, np.array: the class probabilities of the resolved users, float32
+    """
+    positions = self._index.get_indexer(get_first_names(names))
+    resolved = positions >= 0
+    return resolved, self._probas[positions[resolved]]
+
+
+def build_lexicon(names: np.array, y_probas: np.array, min_count: int=20) -> DataFrame:
+  """
+  Objective: averages the class probabilities predicted for the users of each first name
+
+  Inputs:
+      - names, np.array: the name of each user, one user per row
+      - y_probas, np.array: the class probabilities the model predicted for each user
+      - min_count, int: the number of users a first name needs to be kept
+  Outputs:
+      - lexicon, DataFrame: the mean probability of each class by first name, most frequent first
+  """
+  probas = pd.DataFrame(y_probas, columns=['proba_{}'.format(i) for i in range(y_probas.shape[1])])
+  probas[_NAME_COLUMN] = get_first_names(names).values
+  groups = probas.dropna(subset=[_NAME_COLUMN]).groupby(_NAME_COLUMN)
+  counts = groups.size()
+  lexicon = groups.mean()[counts >= min_count]
+  return lexicon.loc[counts[counts >= min_count].sort_values(ascending=False, kind='mergesort').index]
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--dataset', required=True, help='a dataset with the name, username and bio columns')
+  parser.add_argument('--lexicon-directory', required=True, help='where the lexicon is written')
+  parser.add_argument('--classifier', default='gender')
+  parser.add_argument('--min-count', type=int, default=20)
+  args = parser.parse_args()
+
+  import settings  # Reads the .env file, like the workers
+  from . import registry
+  name, = registry.parse_classifiers(args.classifier)
+  # The lexicon is distilled from the model alone
+  classifier_args = dict(registry.get_classifier_args(name), lexicon_directory=None, probabilities=False)
+  classifier = registry.get_classifier_class(name)(**classifier_args)
+  dataset = pd.read_csv(args.dataset, sep=_SEPARATOR, dtype=str, usecols=classifier.get_input_columns())
+  dataset = dataset.drop_duplicates()
+  lexicon = build_lexicon(dataset['name'].values, classifier.predict_probas(dataset), args.min_count)
+  file = get_lexicon_file(args.lexicon_directory, classifier.get_tag())
+  lexicon.to_csv(file, sep=_SEPARATOR)
+  print(f'{len(lexicon)} first names written to {file}.')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,171 @@
+import os
+import time
+import sqlite3
+import hashlib
+import numpy as np
+from typing import List
+
+
+PathLike = os.PathLike
+
+
+class PredictionCache:
+  """
+  On-disk cache of model predictions keyed on user identity, shared by every job
+  (and every worker process) that points to the same cache file.
+
+  Entries are keyed on a hash of the fingerprint of the model and tokenizer files, the
+  model name and the normalized name/username/bio of a user, so processes running other
+  models share the file without reading each other's entries. The entries of a replaced
+  model are no longer read and are evicted least-recently-used like any other once the
+  cache grows past max_entries.
+  """
+
+  _FILE_NAME = 'predictions.sqlite3'
+  _DEFAULT_MAX_ENTRIES = 1000000
+  _QUERY_BATCH_SIZE = 500  # SQLite limits the number of bound variables per query
+  _SEPARATOR = '\x1f'
+
+  def __init__(self, directory: PathLike, model_name: str, model_files: List[PathLike],
+               lower: bool=True, max_entries: int=None):
+    self._path = os.path.join(directory, self._FILE_NAME)
+    self._model_name = model_name
+    self._model_fingerprint = self._get_files_fingerprint(model_files)
+    self._lower = lower
+    self._max_entries = max_entries if max_entries else self._DEFAULT_MAX_ENTRIES
+    self._connection = None
+    self._pid = None
+    self._get_connection()
+
+  def _get_files_fingerprint(self, files: List[PathLike]) -> str:
+    """
+    Objective: hashes the content of the files the predictions depend on, to tell apart models
+
+    Inputs:
+        - files, list: the paths to the files, e.g. the model and the tokenizer
+    Outputs:
+        - fingerprint, str: hex digest of the content of the files
+    """
+    digest = hashlib.sha1()
+    for file in files:
+      with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(1048576), b''):
+          digest.update(block)
+    return digest.hexdigest()
+
+  def _get_connection(self) -> sqlite3.Connection:
+    # SQLite connections must not be shared across forked processes
+    if self._connection is not None and self._pid == os.getpid():
+      return self._connection
+
+    connection = sqlite3.connect(self._path, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # The rows replaced by INSERT OR REPLACE fire the delete trigger too
+    connection.execute('PRAGMA recursive_triggers=ON')
+    with connection:
+      connection.execute(
+        'CREATE TABLE IF NOT EXISTS predictions '
+        '(key TEXT PRIMARY KEY, probas BLOB NOT NULL, last_used REAL NOT NULL)'
+      )
+      connection.execute(
+        'CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)'
+      )
+      self._create_counter(connection)
+    self._connection = connection
+    self._pid = os.getpid()
+    return connection
+
+  def _create_counter(self, connection: sqlite3.Connection):
+    """Keeps the number of entries up to date in the same transactions, so it is never counted again."""
+    connection.execute('CREATE TABLE IF NOT EXISTS entries (total INTEGER NOT NULL)')
+    connection.execute(
+      'INSERT INTO entries (total) SELECT COUNT(*) FROM predictions WHERE NOT EXISTS (SELECT * FROM entries)'
+    )
+    connection.execute(
+      'CREATE TRIGGER IF NOT EXISTS predictions_inserted AFTER INSERT ON predictions '
+      'BEGIN UPDATE entries SET total = total + 1; END'
+    )
+    connection.execute(
+      'CREATE TRIGGER IF NOT EXISTS predictions_deleted AFTER DELETE ON predictions '
+      'BEGIN UPDATE entries SET total = total - 1; END'
+    )
+
+  def make_keys(self, X: np.array) -> List[str]:
+    """
+    Objective: builds the cache key of every user of the features array
+
+    Inputs:
+        - X, np.array: the features array (name, username, bio) as strings
+    Outputs:
+        - keys, list: one key per row of X
+    """
+    keys = []
+    for row in X:
+      identity = self._SEPARATOR.join([self._model_name] + list(row))
+      if self._lower:
+        identity = identity.lower()
+      identity = self._model_fingerprint + self._SEPARATOR + identity
+      keys.append(hashlib.sha1(identity.encode('utf-8', 'surrogatepass')).hexdigest())
+    return keys
+
+  def get(self, keys: List[str]) -> dict:
+    """
+    Objective: looks up the cached probabilities of the given keys and marks them as recently used
+
+    Inputs:
+        - keys, list: cache keys built by make_keys
+    Outputs:
+        - cached, dict: key -> np.array of class probabilities, for the keys found in the cache
+    """
+    connection = self._get_connection()
+    cached = {}
+    for start in range(0, len(keys), self._QUERY_BATCH_SIZE):
+      batch = keys[start:start + self._QUERY_BATCH_SIZE]
+      placeholders = ','.join('?' * len(batch))
+      rows = connection.execute(
+        f'SELECT key, probas FROM predictions WHERE key IN ({placeholders})', batch
+      ).fetchall()
+      for key, probas in rows:
+        cached[key] = np.frombuffer(probas, dtype=np.float32)
+
+    if cached:
+      now = time.time()
+      with connection:
+        connection.executemany(
+          'UPDATE predictions SET last_used = ? WHERE key = ?',
+          [(now, key) for key in cached]
+        )
+    return cached
+
+  def put(self, keys: List[str], probas: np.array):
+    """
+    Objective: stores the probabilities of the given keys, evicting the least recently used entries
+
+    Inputs:
+        - keys, list: cache keys built by make_keys
+        - probas, np.array: class probabilities, one row per key
+    """
+    connection = self._get_connection()
+    now = time.time()
+    probas = np.asarray(probas, dtype=np.float32)
+    with connection:
+      connection.executemany(
+        'INSERT OR REPLACE INTO predictions (key, probas, last_used) VALUES (?, ?, ?)',
+        [(key, row.tobytes(), now) for key, row in zip(keys, probas)]
+      )
+      self._evict(connection)
+
+  def _get_total(self, connection: sqlite3.Connection) -> int:
+    return connection.execute('SELECT total FROM entries').fetchone()[0]
+
+  def _evict(self, connection: sqlite3.Connection):
+    total = self._get_total(connection)
+    excess = total - self._max_entries
+    if excess > 0:
+      connection.execute(
+        'DELETE FROM predictions WHERE key IN '
+        '(SELECT key FROM predictions ORDER BY last_used LIMIT ?)', (excess,)
+      )
+
+  def __len__(self) -> int:
+    return self._get_total(self._get_connection())
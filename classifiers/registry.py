@@ -0,0 +1,142 @@
+"""
+Classifiers UserProfiler can run, by name. The profiler runs those named in
+PROFILER_CLASSIFIERS, in one pass over each dataset.
+
+A classifier is registered in code with register_classifier, or from the setting itself
+as name=package.module:Class, so it is also found by the worker processes. Its class
+implements classifiers.base.Classifier and takes the keyword arguments of GenderClassifier
+(model_directory, tokenizer_directory...), read from the <NAME>_CLASSIFIER_* variables.
+When <NAME>_CLASSIFIER_SERVER_ADDRESS is set, the classifier is instead a client of the
+inference server listening there, see classifiers.inference_server.
+"""
+import os
+import importlib
+
+from settings import get_env_flag
+
+
+_CLASSIFIERS = {
+  'gender': 'classifiers.gender_classifier:GenderClassifier',
+}  # Name: class, or the path of a class to import when it is first used
+
+
+def register_classifier(name: str, classifier_class):
+  """Registers a classifier class, or the package.module:Class path of one, under name."""
+  if not name or '=' in name or ',' in name:
+    raise ValueError(f'{name}: Invalid classifier name.')
+  _CLASSIFIERS[name] = classifier_class
+
+
+def _import_class(path: str):
+  module_name, _, class_name = path.partition(':')
+  if not class_name:
+    raise ValueError(f'{path}: Expected a package.module:Class path.')
+  return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_classifier_class(name: str):
+  if name not in _CLASSIFIERS:
+    raise ValueError(f'{name}: Unknown classifier, expected one of {list(_CLASSIFIERS)}.')
+  classifier_class = _CLASSIFIERS[name]
+  if isinstance(classifier_class, str):
+    classifier_class = _import_class(classifier_class)
+    _CLASSIFIERS[name] = classifier_class
+  return classifier_class
+
+
+def parse_classifiers(setting: str) -> list:
+  """
+  Objective: reads the names of the classifiers to run, registering those given with their class
+
+  Inputs:
+      - setting, str: comma separated names, or name=package.module:Class, e.g. gender,bot=bots.model:BotClassifier
+  Outputs:
+      - names, list: the names of the classifiers, in the order of their class columns
+  """
+  names = []
+  for entry in setting.split(','):
+    entry = entry.strip()
+    if not entry:
+      continue
+    name, _, path = entry.partition('=')
+    name = name.strip()
+    if path:
+      register_classifier(name, path.strip())
+    get_classifier_class(name)
+    if name in names:
+      raise ValueError(f'{name}: Classifier given twice.')
+    names.append(name)
+  if not names:
+    raise ValueError('At least one classifier must be given.')
+  return names
+
+
+def get_classifier_args(name: str) -> dict:
+  """Reads the arguments of a classifier from the <NAME>_CLASSIFIER_* variables, e.g. GENDER_CLASSIFIER_BACKEND."""
+  prefix = f'{name.upper()}_CLASSIFIER_'
+  model_directory = os.getenv(prefix + 'MODEL_DIRECTORY', None)
+  tokenizer_directory = os.getenv(prefix + 'TOKENIZER_DIRECTORY', None)
+  if model_directory is None:
+    raise KeyError(f'Missing environment variable "{prefix}MODEL_DIRECTORY".')
+
+  if tokenizer_directory is None:
+    raise KeyError(f'Missing environment variable "{prefix}TOKENIZER_DIRECTORY".')
+
+  # Optional persistent prediction cache shared across jobs
+  cache_directory = os.getenv(prefix + 'CACHE_DIRECTORY', None)
+  cache_max_entries = os.getenv(prefix + 'CACHE_MAX_ENTRIES', None)
+  if cache_max_entries is not None:
+    cache_max_entries = int(cache_max_entries)
+
+  batch_size = os.getenv(prefix + 'BATCH_SIZE', None)
+  if batch_size is not None:
+    batch_size = int(batch_size)
+
+  # keras (default) or tflite, see classifiers.export
+  backend = os.getenv(prefix + 'BACKEND', None)
+  bucketing = get_env_flag(prefix + 'BUCKETING')
+  # Files mapped by every process instead of copied in each, e.g. /dev/shm
+  shared_directory = os.getenv(prefix + 'SHARED_DIRECTORY', None)
+  # Adds the <tag>_proba_* columns to the reports
+  probabilities = get_env_flag(prefix + 'PROBABILITIES')
+  # Name lexicon resolving the confident users before the model, see classifiers.name_lexicon
+  lexicon_directory = os.getenv(prefix + 'LEXICON_DIRECTORY', None)
+  lexicon_threshold = os.getenv(prefix + 'LEXICON_THRESHOLD', None)
+  if lexicon_threshold is not None:
+    lexicon_threshold = float(lexicon_threshold)
+
+  return {
+    'model_directory': model_directory,
+    'tokenizer_directory': tokenizer_directory,
+    'cache_directory': cache_directory,
+    'cache_max_entries': cache_max_entries,
+    'batch_size': batch_size,
+    'backend': backend,
+    'bucketing': bucketing,
+    'shared_directory': shared_directory,
+    'probabilities': probabilities,
+    'lexicon_directory': lexicon_directory,
+    'lexicon_threshold': lexicon_threshold,
+  }
+
+
+def get_server_authkey(name: str) -> bytes:
+  """Returns the key shared by the inference server of a classifier and its clients."""
+  return os.environ[f'{name.upper()}_CLASSIFIER_SERVER_AUTHKEY'].encode()
+
+
+def get_classifier_spec(name: str) -> tuple:
+  """
+  Objective: gets the class and the arguments to load a classifier with
+
+  Inputs:
+      - name, str: a registered classifier
+  Outputs:
+      - spec, tuple: (class, arguments), an InferenceClient of the server when
+        <NAME>_CLASSIFIER_SERVER_ADDRESS is set
+  """
+  address = os.getenv(f'{name.upper()}_CLASSIFIER_SERVER_ADDRESS', None)
+  if address:
+    from .inference_server import InferenceClient
+    return InferenceClient, {'address': address, 'authkey': get_server_authkey(name)}
+  return get_classifier_class(name), get_classifier_args(name)
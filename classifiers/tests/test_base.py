@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+from unittest import TestCase
+
+from classifiers.base import Classifier, SharedEncodings, predict_all
+from classifiers.char_tokenizer import CharTokenizer
+
+
+class CountingTokenizer(CharTokenizer):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.encoded = 0
+
+  def encode(self, texts, maxlen: int) -> np.array:
+    self.encoded += len(texts)
+    return super().encode(texts, maxlen)
+
+
+class FirstCodeClassifier(Classifier):
+  """Classifies rows by the parity of the last encoded character of their name."""
+
+  _TAG = 'first'
+  _FEATURES = {'name': (0, 4)}
+  _INPUT_COLUMNS = ['name']
+
+  def __init__(self, tokenizer: CharTokenizer, key: str):
+    self._tokenizer = tokenizer
+    self._key = key
+
+  def get_tokenizer_key(self) -> str:
+    return self._key
+
+  def get_batch_size(self) -> int:
+    return 32
+
+  def get_model_version(self) -> str:
+    return 'first'
+
+  def get_stats(self) -> dict:
+    return {}
+
+  def reset_stats(self):
+    pass
+
+  def merge_stats(self, stats: dict):
+    pass
+
+  def predict_classes(self, dataset, encodings=None):
+    if encodings is not None:
+      encoded = encodings.encode(self._key, self._tokenizer.encode, 'name', 4)
+    else:
+      encoded = self._tokenizer.encode(dataset['name'].values.astype(str), 4)
+    return encoded[:, -1] % 2
+
+
+class SecondCodeClassifier(FirstCodeClassifier):
+  _TAG = 'second'
+
+
+class TestClassifier(TestCase):
+  def test_incomplete_classifier(self):
+    class NoStatsClassifier(Classifier):
+      def get_batch_size(self) -> int:
+        return 32
+
+      def get_model_version(self) -> str:
+        return 'none'
+
+      def predict_classes(self, dataset, encodings=None):
+        return np.zeros(len(dataset))
+
+    with self.assertRaises(TypeError):
+      NoStatsClassifier()
+
+
+class TestSharedEncodings(TestCase):
+  def setUp(self):
+    self.tokenizer = CountingTokenizer({'a': 1, 'b': 2, 'c': 3})
+    self.dataset = pd.DataFrame({'name': ['ab', 'ca', 'ab', np.nan, 'ab']}, dtype=object)
+
+  def test_encodes_distinct_values_once(self):
+    encodings = SharedEncodings(self.dataset)
+    expected = self.tokenizer.encode(self.dataset['name'].values.astype(str), 4)
+    self.tokenizer.encoded = 0
+    np.testing.assert_array_equal(encodings.encode('key', self.tokenizer.encode, 'name', 4), expected)
+    np.testing.assert_array_equal(
+      encodings.encode('key', self.tokenizer.encode, 'name', 4, np.array([1, 3])), expected[[1, 3]]
+    )
+    self.assertEqual(self.tokenizer.encoded, 3)  # ab, ca and nan
+
+  def test_predict_all(self):
+    classifiers = [FirstCodeClassifier(self.tokenizer, 'key'), SecondCodeClassifier(self.tokenizer, 'key')]
+    y_preds = predict_all(classifiers, self.dataset)
+    self.assertEqual(list(y_preds), ['first_class', 'second_class'])
+    np.testing.assert_array_equal(y_preds['first_class'], [0, 1, 0, 1, 0])
+    np.testing.assert_array_equal(y_preds['first_class'], y_preds['second_class'])
+    self.assertEqual(self.tokenizer.encoded, 3)
+
+  def test_other_tokenizers_not_shared(self):
+    classifiers = [FirstCodeClassifier(self.tokenizer, 'key'), SecondCodeClassifier(self.tokenizer, 'other')]
+    predict_all(classifiers, self.dataset)
+    self.assertEqual(self.tokenizer.encoded, 10)
+
+  def test_extension_strings(self):
+    tokenizer = CountingTokenizer({'a': 1, 'b': 2, 'c': 3, 'n': 4})  # nan is classified 0, <na> 1
+    classifiers = [FirstCodeClassifier(tokenizer, 'key'), SecondCodeClassifier(tokenizer, 'key')]
+    expected = predict_all(classifiers, self.dataset)
+    # As parsed by memory-bounded profiling, missing values are pd.NA
+    strings = self.dataset.astype('string')
+    y_preds = predict_all(classifiers, strings)
+    for column in expected:
+      np.testing.assert_array_equal(y_preds[column], expected[column])
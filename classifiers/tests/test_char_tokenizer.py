@@ -0,0 +1,115 @@
+import os
+import pickle
+import shutil
+import tempfile
+import pandas as pd
+import numpy as np
+from unittest import TestCase
+from keras.preprocessing.text import Tokenizer
+from keras.preprocessing.sequence import pad_sequences
+
+import settings
+from classifiers.char_tokenizer import CharTokenizer
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+tokenizer_directory = os.getenv('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY')
+dataset = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), sep=';')
+COLUMNS = [('name', 50), ('username', 15), ('bio', 160)]
+
+
+def keras_encode(tokenizer: Tokenizer, X: np.array, maxlen: int) -> np.array:
+  return pad_sequences(tokenizer.texts_to_sequences(X), maxlen=maxlen)
+
+
+class EquivalenceTestCase(TestCase):
+  def assertEquivalent(self, tokenizer: Tokenizer):
+    char_tokenizer = CharTokenizer.from_keras(tokenizer)
+    for column, maxlen in COLUMNS:
+      X = dataset[column].values.astype(str)
+      expected = keras_encode(tokenizer, X, maxlen)
+      encoded = char_tokenizer.encode(X, maxlen)
+      self.assertEqual(encoded.dtype, expected.dtype)
+      self.assertEqual(encoded.shape, (len(X), maxlen))
+      np.testing.assert_array_equal(encoded, expected)
+
+
+class TestEquivalence(EquivalenceTestCase):
+  def test_pickled_tokenizer(self):
+    path = os.path.join(tokenizer_directory, 'tokenizer_char.pkl')
+    tokenizer = pickle.load(open(path, 'rb'))
+    self.assertEquivalent(tokenizer)
+
+  def test_fitted_tokenizer(self):
+    tokenizer = Tokenizer(char_level=True)
+    tokenizer.fit_on_texts(dataset['name'].values.astype(str)[:300])
+    self.assertEquivalent(tokenizer)
+
+  def test_num_words_and_oov_token(self):
+    tokenizer = Tokenizer(char_level=True, num_words=30, oov_token='UNK')
+    tokenizer.fit_on_texts(dataset['name'].values.astype(str)[:300])
+    self.assertEquivalent(tokenizer)
+
+  def test_case_sensitive(self):
+    tokenizer = Tokenizer(char_level=True, lower=False)
+    tokenizer.fit_on_texts(dataset['bio'].values.astype(str)[:300])
+    self.assertEquivalent(tokenizer)
+
+
+class TestEncode(TestCase):
+  def setUp(self):
+    self.tokenizer = CharTokenizer({'a': 1, 'b': 2, 'c': 3})
+
+  def test_padding_and_truncation(self):
+    encoded = self.tokenizer.encode(['ab', 'abcabc', 'a?c', ''], maxlen=4)
+    expected = np.array([
+      [0, 0, 1, 2],
+      [3, 1, 2, 3],
+      [0, 0, 1, 3],
+      [0, 0, 0, 0],
+    ], dtype=np.int32)
+    np.testing.assert_array_equal(encoded, expected)
+
+  def test_long_texts(self):
+    texts = ['ab', 'c' * 10 + 'ab' + '?' * 1000000, 'abc' + '?' * 30 + 'c']
+    encoded = self.tokenizer.encode(texts, maxlen=4)
+    expected = np.array([
+      [0, 0, 1, 2],
+      [3, 3, 1, 2],
+      [1, 2, 3, 3],
+    ], dtype=np.int32)
+    np.testing.assert_array_equal(encoded, expected)
+
+  def test_empty_input(self):
+    encoded = self.tokenizer.encode([], maxlen=4)
+    self.assertEqual(encoded.shape, (0, 4))
+
+  def test_not_char_level(self):
+    with self.assertRaises(ValueError):
+      CharTokenizer.from_keras(Tokenizer(char_level=False))
+
+
+class TestTableFile(TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.table_file = os.path.join(self.directory, 'table.npy')
+    self.tokenizer = Tokenizer(char_level=True, oov_token='UNK')
+    self.tokenizer.fit_on_texts(dataset['name'].values.astype(str)[:300])
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_same_encoding(self):
+    X = dataset['name'].values.astype(str)
+    expected = CharTokenizer.from_keras(self.tokenizer).encode(X, 50)
+    for _ in range(2):  # Written, then mapped as it is
+      char_tokenizer = CharTokenizer.from_keras(self.tokenizer, self.table_file)
+      self.assertIsInstance(char_tokenizer._table, np.memmap)
+      self.assertFalse(char_tokenizer._table.flags.writeable)
+      np.testing.assert_array_equal(char_tokenizer.encode(X, 50), expected)
+    self.assertEqual(os.listdir(self.directory), ['table.npy'])
+
+  def test_invalid_table_file(self):
+    np.save(self.table_file, np.zeros(10, dtype=np.int32))
+    with self.assertRaises(ValueError):
+      CharTokenizer.from_keras(self.tokenizer, self.table_file)
@@ -1,5 +1,8 @@
 import os
+import shutil
+import tempfile
 import pandas as pd
+import numpy as np
 from uuid import uuid1
 from unittest import TestCase
 from keras.preprocessing.text import Tokenizer
@@ -48,6 +51,32 @@ class TestLoadModel(TestCase):
     self.assertIsInstance(model, Model)
 
 
+class TestGetModelVersion(TestCase):
+  def test_method(self):
+    version = classifier.get_model_version()
+    self.assertIsInstance(version, str)
+    self.assertEqual(version, classifier._get_model_version(model_directory, tokenizer_directory))
+
+
+class TestSharedDirectory(TestCase):
+  def setUp(self):
+    self.shared_directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.shared_directory)
+
+  def test_same_predictions(self):
+    dataset = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), sep=';')
+    shared_classifier = GenderClassifier(model_directory, tokenizer_directory, shared_directory=self.shared_directory)
+    self.assertEqual(os.listdir(self.shared_directory), [os.path.basename(shared_classifier._get_table_file(self.shared_directory))])
+    self.assertIsInstance(shared_classifier._char_tokenizer._table, np.memmap)
+    np.testing.assert_array_equal(shared_classifier.predict_classes(dataset), classifier.predict_classes(dataset))
+
+  def test_invalid_directory(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      GenderClassifier(model_directory, tokenizer_directory, shared_directory=str(uuid1()))
+
+
 class TestPredict(TestCase):
   def test_valid_dataset(self):
     path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
@@ -61,3 +90,160 @@ class TestPredict(TestCase):
     df = pd.read_csv(path, sep=';', nrows=100)
     with self.assertRaises(exceptions.PredictionException):
       resultant_df = classifier.predict(df)
+
+
+class TestGetUniqueRows(TestCase):
+  def test_method(self):
+    X = np.array([
+      ['gustavo', 'giusvalde', 'bio'],
+      ['valentina', 'ValentinaEtu', 'nan'],
+      ['gustavo', 'giusvalde', 'bio'],
+    ])
+    first_rows, inverse = classifier._get_unique_rows(X)
+    self.assertEqual(first_rows.tolist(), [0, 1])
+    self.assertTrue((X[first_rows][inverse] == X).all())
+
+
+class TestPredictDuplicates(TestCase):
+  def test_duplicates_share_class(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';', nrows=50)
+    df = pd.concat([df, df], ignore_index=True)
+    classifier.reset_stats()
+    resultant_df = classifier.predict(df)
+    classes = resultant_df['gender_class'].values
+    self.assertTrue((classes[:50] == classes[50:]).all())
+
+    stats = classifier.get_stats()
+    self.assertEqual(stats['total_rows'], 100)
+    self.assertLessEqual(stats['unique_rows'], 50)
+
+
+class TestLengthBuckets(TestCase):
+  def test_method(self):
+    xtest = [
+      np.zeros((3, maxlen), dtype=np.int32) for maxlen in classifier._maxlen
+    ]
+    for _xtest in xtest:
+      _xtest[1, -1] = 5
+      _xtest[2, :] = 5
+    buckets = classifier._get_length_buckets(xtest)
+    self.assertEqual(buckets.shape, (3, len(xtest)))
+    self.assertTrue((buckets[0] == 1).all())
+    self.assertTrue((buckets[1] == 1).all())
+    self.assertTrue((buckets[2] == classifier._LENGTH_BUCKETS).all())
+
+
+class TestPredictBucketed(TestCase):
+  def test_rows_keep_their_order(self):
+    class LastTokenModel:
+      # Only looks at the end of the sequences, so trimming the padding changes nothing
+      def predict(self, inputs, batch_size):
+        last = sum(x[:, -1] for x in inputs).astype(np.float32)
+        return np.stack([last, -last], axis=1)
+
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';', nrows=100)
+    X = df[classifier.get_input_columns()].values.astype(str)
+    xtest = [
+      classifier._preprocess_inputs(X[:, col], maxlen)
+      for col, maxlen in zip(classifier._col_X, classifier._maxlen)
+    ]
+    model = LastTokenModel()
+    original_model = classifier._model
+    classifier._model = model
+    try:
+      y_probas = classifier._predict_bucketed(xtest)
+    finally:
+      classifier._model = original_model
+    np.testing.assert_array_equal(y_probas, model.predict(xtest, batch_size=32))
+
+
+class TestBucketingParity(TestCase):
+  def check_parity(self, model) -> bool:
+    original_model = classifier._model
+    classifier._model = model
+    try:
+      return classifier._check_bucketing_parity()
+    finally:
+      classifier._model = original_model
+
+  def test_padding_ignored(self):
+    class LastTokenModel:
+      def predict(self, inputs, batch_size):
+        last = sum(x[:, -1] for x in inputs).astype(np.float32)
+        return np.stack([last, -last], axis=1)
+
+    self.assertTrue(self.check_parity(LastTokenModel()))
+
+  def test_padding_read(self):
+    class MeanModel:
+      # Averages over the whole sequence, padding included, like a global pooling without masking
+      def predict(self, inputs, batch_size):
+        mean = sum(x.mean(axis=1) for x in inputs).astype(np.float32)
+        return np.stack([mean, -mean], axis=1)
+
+    self.assertFalse(self.check_parity(MeanModel()))
+
+  def test_sample_fills_every_bucket(self):
+    X = classifier._get_parity_sample()
+    xtest = [
+      classifier._preprocess_inputs(X[:, col], maxlen)
+      for col, maxlen in zip(classifier._col_X, classifier._maxlen)
+    ]
+    buckets = classifier._get_length_buckets(xtest)
+    for feature in range(buckets.shape[1]):
+      self.assertEqual(set(buckets[:, feature]), set(range(1, classifier._LENGTH_BUCKETS + 1)))
+
+
+class TestProbabilities(TestCase):
+  def test_output_columns(self):
+    probabilities_classifier = GenderClassifier(model_directory, tokenizer_directory, probabilities=True)
+    columns = probabilities_classifier.get_output_columns()
+    self.assertEqual(columns[:2], ['gender_class', 'gender_proba_0'])
+    self.assertNotEqual(probabilities_classifier.get_model_version(), classifier.get_model_version())
+
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';', nrows=100)
+    outputs = probabilities_classifier.predict_outputs(df)
+    self.assertEqual(list(outputs), columns)
+    y_probas = np.stack([outputs[column] for column in columns[1:]], axis=1)
+    self.assertEqual(y_probas.dtype, np.float16)
+    np.testing.assert_array_equal(outputs['gender_class'], classifier.predict_classes(df))
+    np.testing.assert_allclose(y_probas, classifier.predict_probas(df), atol=1e-3)
+
+
+class TestNameLexiconCascade(TestCase):
+  def setUp(self):
+    self.lexicon_directory = tempfile.mkdtemp()
+    self.df = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), sep=';', nrows=200)
+    n_classes = classifier.predict_probas(self.df.iloc[:1]).shape[1]
+    first_name = self.df['name'].astype(str).str.casefold().str.extract(r'^\W*([^\W\d_]+)', expand=False).iloc[0]
+    # A confident name and an ambiguous one
+    lexicon = pd.DataFrame(
+      [[1.0] + [0.0] * (n_classes - 1), [1.0 / n_classes] * n_classes],
+      index=pd.Index([first_name, 'unknownname'], name='first_name'),
+      columns=['proba_{}'.format(i) for i in range(n_classes)]
+    )
+    lexicon.to_csv(os.path.join(self.lexicon_directory, 'gender_name_lexicon.csv'), sep=';')
+    self.first_name = first_name
+
+  def tearDown(self):
+    shutil.rmtree(self.lexicon_directory)
+
+  def test_confident_names_skip_the_model(self):
+    cascade = GenderClassifier(model_directory, tokenizer_directory, lexicon_directory=self.lexicon_directory)
+    y_probas = cascade.predict_probas(self.df)
+    resolved = (self.df['name'].astype(str).str.casefold()
+                .str.extract(r'^\W*([^\W\d_]+)', expand=False) == self.first_name).values
+    self.assertTrue((y_probas[resolved, 0] == 1.0).all())
+    np.testing.assert_allclose(y_probas[~resolved], classifier.predict_probas(self.df)[~resolved], atol=1e-6)
+
+    stats = cascade.get_stats()
+    self.assertEqual(stats['lexicon_rows'], resolved.sum())
+    self.assertAlmostEqual(stats['tiers']['lexicon'] + stats['tiers']['model'], 1.0)
+
+  def test_invalid_threshold(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      GenderClassifier(model_directory, tokenizer_directory, lexicon_directory=self.lexicon_directory,
+                       lexicon_threshold=1.5)
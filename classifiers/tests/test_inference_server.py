@@ -0,0 +1,88 @@
+import os
+import stat
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+from unittest import TestCase
+
+import settings
+from classifiers.gender_classifier import GenderClassifier
+from classifiers.inference_server import InferenceServer, InferenceClient, exceptions
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+model_directory = os.getenv('GENDER_CLASSIFIER_MODEL_DIRECTORY')
+tokenizer_directory = os.getenv('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY')
+classifier = GenderClassifier(model_directory, tokenizer_directory)
+AUTHKEY = b'test-key'
+
+
+class ServerTestCase(TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.address = os.path.join(self.directory.name, 'gender.sock')
+    self.server = InferenceServer(classifier, self.address, AUTHKEY, max_batch_rows=256, max_wait_seconds=0.05).start()
+    self.dataset = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), sep=';', dtype=str, nrows=200)
+
+  def tearDown(self):
+    self.server.close()
+    self.directory.cleanup()
+
+
+class TestInferenceClient(ServerTestCase):
+  def test_stands_in_for_classifier(self):
+    client = InferenceClient(self.address, AUTHKEY)
+    self.assertEqual(client.get_class_column(), 'gender_class')
+    self.assertEqual(client.get_input_columns(), classifier.get_input_columns())
+    self.assertEqual(client.get_model_version(), classifier.get_model_version())
+    np.testing.assert_array_equal(client.predict_classes(self.dataset), classifier.predict_classes(self.dataset))
+    self.assertEqual(client.get_stats()['total_rows'], len(self.dataset))
+
+  def test_concurrent_requests_are_batched(self):
+    expected = classifier.predict_classes(self.dataset)
+    chunks = [self.dataset.iloc[start:start + 20] for start in range(0, len(self.dataset), 20)]
+    results = [None] * len(chunks)
+
+    def predict(index):
+      results[index] = InferenceClient(self.address, AUTHKEY).predict_classes(chunks[index])
+
+    threads = [threading.Thread(target=predict, args=(index,)) for index in range(len(chunks))]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    np.testing.assert_array_equal(np.concatenate(results), expected)
+    stats = self.server.get_stats()
+    self.assertEqual(stats['requests'], len(chunks))
+    self.assertLess(stats['batches'], len(chunks))
+
+  def test_invalid_dataset(self):
+    client = InferenceClient(self.address, AUTHKEY)
+    with self.assertRaises(exceptions.PredictionException):
+      client.predict_classes(self.dataset[['name']])
+
+
+class TestServerSocket(ServerTestCase):
+  def test_single_server(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      InferenceServer(classifier, self.address, AUTHKEY).start()
+
+  def test_closed_server(self):
+    self.server.close()
+    self.assertFalse(os.path.exists(self.address))
+    with self.assertRaises(exceptions.ClassifierInitException):
+      InferenceClient(self.address, AUTHKEY)
+
+  def test_socket_mode(self):
+    self.assertEqual(stat.S_IMODE(os.stat(self.address).st_mode), 0o600)
+
+  def test_wrong_key(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      InferenceClient(self.address, b'other-key')
+    # The server still serves the clients holding the key
+    self.assertEqual(InferenceClient(self.address, AUTHKEY).get_class_column(), 'gender_class')
+
+  def test_missing_key(self):
+    with self.assertRaises(ValueError):
+      InferenceServer(classifier, self.address, b'')
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from unittest import TestCase
+
+from classifiers.name_lexicon import NameLexicon, build_lexicon, get_first_names, get_lexicon_file
+
+
+class TestGetFirstNames(TestCase):
+  def test_method(self):
+    names = np.array(['Jean-Pierre Dupont', '  🌍 Marie', 'ÉLODIE', '1234', 'dr.who'], dtype=object)
+    first_names = get_first_names(names)
+    self.assertEqual(first_names.iloc[:3].tolist(), ['jean', 'marie', 'élodie'])
+    self.assertTrue(pd.isna(first_names.iloc[3]))
+    self.assertEqual(first_names.iloc[4], 'dr')
+
+
+class TestBuildLexicon(TestCase):
+  def test_method(self):
+    names = np.array(['Ana Silva', 'ana', 'ANA P', 'Luis', 'Luis M', 'Kim'], dtype=object)
+    y_probas = np.array([[0.9, 0.1], [1.0, 0.0], [0.8, 0.2], [0.2, 0.8], [0.0, 1.0], [0.5, 0.5]], dtype=np.float32)
+    lexicon = build_lexicon(names, y_probas, min_count=2)
+    self.assertEqual(lexicon.index.tolist(), ['ana', 'luis'])
+    np.testing.assert_allclose(lexicon.loc['ana'].values, [0.9, 0.1], rtol=1e-6)
+
+
+class TestNameLexicon(TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.file = get_lexicon_file(self.directory.name, 'gender')
+    lexicon = pd.DataFrame(
+      {'proba_0': [0.99, 0.02, 0.6], 'proba_1': [0.01, 0.98, 0.4]},
+      index=pd.Index(['ana', 'luis', 'kim'], name='first_name')
+    )
+    lexicon.to_csv(self.file, sep=';')
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_lookup(self):
+    lexicon = NameLexicon.load(self.file, 0.95)
+    self.assertEqual((len(lexicon), lexicon.get_n_classes()), (2, 2))
+    resolved, y_probas = lexicon.lookup(np.array(['Luis Ramos', 'Kim', 'ana', 'nan'], dtype=object))
+    np.testing.assert_array_equal(resolved, [True, False, True, False])
+    np.testing.assert_allclose(y_probas, [[0.02, 0.98], [0.99, 0.01]], rtol=1e-6)
+
+  def test_threshold(self):
+    self.assertEqual(len(NameLexicon.load(self.file, 0.5)), 3)
+    with self.assertRaises(ValueError):
+      NameLexicon.load(self.file, 0)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+from unittest import TestCase
+
+from classifiers.prediction_cache import PredictionCache
+
+
+USERS = np.array([
+  ['gustavo', 'giusvalde', 'necesitamos a todos'],
+  ['Valentina', 'ValentinaEtu', 'nan'],
+])
+PROBAS = np.array([[0.9, 0.1], [0.2, 0.8]], dtype=np.float32)
+
+
+class CacheTestCase(TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.model_file = os.path.join(self.directory, 'model.h5')
+    with open(self.model_file, 'wb') as f:
+      f.write(b'model weights')
+    self.tokenizer_file = os.path.join(self.directory, 'tokenizer_char.pkl')
+    with open(self.tokenizer_file, 'wb') as f:
+      f.write(b'tokenizer')
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def get_cache(self, max_entries=None):
+    return PredictionCache(self.directory, 'gender_model', [self.model_file, self.tokenizer_file],
+                           max_entries=max_entries)
+
+
+class TestMakeKeys(CacheTestCase):
+  def test_normalized_keys(self):
+    cache = self.get_cache()
+    keys = cache.make_keys(np.array([['Gustavo', 'GiusValde', 'bio'], ['gustavo', 'giusvalde', 'bio']]))
+    self.assertEqual(keys[0], keys[1])
+
+  def test_model_name_in_key(self):
+    cache = self.get_cache()
+    other_cache = PredictionCache(self.directory, 'other_model', [self.model_file, self.tokenizer_file])
+    self.assertNotEqual(cache.make_keys(USERS), other_cache.make_keys(USERS))
+
+
+class TestGetPut(CacheTestCase):
+  def test_round_trip(self):
+    cache = self.get_cache()
+    keys = cache.make_keys(USERS)
+    self.assertEqual(cache.get(keys), {})
+
+    cache.put(keys, PROBAS)
+    cached = cache.get(keys)
+    self.assertEqual(len(cached), 2)
+    np.testing.assert_allclose(cached[keys[1]], PROBAS[1])
+
+  def test_persistence(self):
+    keys = self.get_cache().make_keys(USERS)
+    self.get_cache().put(keys, PROBAS)
+    self.assertEqual(len(self.get_cache().get(keys)), 2)
+
+
+class TestEviction(CacheTestCase):
+  def test_least_recently_used_evicted(self):
+    cache = self.get_cache(max_entries=2)
+    keys = cache.make_keys(USERS)
+    cache.put(keys[:1], PROBAS[:1])
+    cache.put(keys[1:], PROBAS[1:])
+    cache.get(keys[:1])  # first user is now the most recently used
+
+    new_keys = cache.make_keys(np.array([['new', 'user', 'bio']]))
+    cache.put(new_keys, PROBAS[:1])
+    self.assertEqual(len(cache), 2)
+    self.assertIn(keys[0], cache.get(keys))
+    self.assertNotIn(keys[1], cache.get(keys))
+
+  def test_replaced_entries_counted_once(self):
+    cache = self.get_cache(max_entries=2)
+    keys = cache.make_keys(USERS)
+    cache.put(keys, PROBAS)
+    cache.put(keys, PROBAS[::-1])
+    self.assertEqual(len(cache), 2)
+    self.assertEqual(len(cache.get(keys)), 2)
+
+
+class TestInvalidation(CacheTestCase):
+  def test_model_change_misses_cache(self):
+    cache = self.get_cache()
+    cache.put(cache.make_keys(USERS), PROBAS)
+
+    with open(self.model_file, 'wb') as f:
+      f.write(b'retrained model weights')
+    new_cache = self.get_cache()
+    self.assertEqual(new_cache.get(new_cache.make_keys(USERS)), {})
+
+  def test_tokenizer_change_misses_cache(self):
+    cache = self.get_cache()
+    cache.put(cache.make_keys(USERS), PROBAS)
+
+    with open(self.tokenizer_file, 'wb') as f:
+      f.write(b'new tokenizer')
+    new_cache = self.get_cache()
+    self.assertEqual(new_cache.get(new_cache.make_keys(USERS)), {})
+
+  def test_models_share_cache(self):
+    other_model_file = os.path.join(self.directory, 'other_model.tflite')
+    with open(other_model_file, 'wb') as f:
+      f.write(b'other model weights')
+    cache = self.get_cache()
+    other_cache = PredictionCache(self.directory, 'gender_model', [other_model_file, self.tokenizer_file])
+    cache.put(cache.make_keys(USERS), PROBAS)
+    other_cache.put(other_cache.make_keys(USERS), PROBAS[::-1])
+
+    cached = cache.get(cache.make_keys(USERS))
+    np.testing.assert_allclose(cached[cache.make_keys(USERS)[0]], PROBAS[0])
+    self.assertEqual(len(cache), 4)
@@ -0,0 +1,65 @@
+import os
+from unittest import TestCase, mock
+
+from classifiers import registry
+from classifiers.gender_classifier import GenderClassifier
+from classifiers.inference_server import InferenceClient
+
+
+class BotClassifier(GenderClassifier):
+  _TAG = 'bot'
+
+
+class TestParseClassifiers(TestCase):
+  def tearDown(self):
+    registry._CLASSIFIERS.pop('bot', None)
+
+  def test_default(self):
+    self.assertEqual(registry.parse_classifiers('gender'), ['gender'])
+    self.assertIs(registry.get_classifier_class('gender'), GenderClassifier)
+
+  def test_class_path(self):
+    names = registry.parse_classifiers(f'gender, bot={__name__}:BotClassifier')
+    self.assertEqual(names, ['gender', 'bot'])
+    self.assertIs(registry.get_classifier_class('bot'), BotClassifier)
+
+  def test_register_classifier(self):
+    registry.register_classifier('bot', BotClassifier)
+    self.assertEqual(registry.parse_classifiers('bot,gender'), ['bot', 'gender'])
+
+  def test_unknown_classifier(self):
+    with self.assertRaises(ValueError):
+      registry.parse_classifiers('gender,age')
+
+  def test_invalid_settings(self):
+    for setting in ('', 'gender,gender', f'bot={__name__}.BotClassifier'):
+      with self.assertRaises(ValueError):
+        registry.parse_classifiers(setting)
+
+
+class TestGetClassifierSpec(TestCase):
+  def test_classifier_args(self):
+    variables = {'BOT_CLASSIFIER_MODEL_DIRECTORY': 'models', 'BOT_CLASSIFIER_TOKENIZER_DIRECTORY': 'tokenizers',
+                 'BOT_CLASSIFIER_BATCH_SIZE': '64', 'BOT_CLASSIFIER_BUCKETING': 'true'}
+    with mock.patch.dict(os.environ, variables):
+      registry.register_classifier('bot', BotClassifier)
+      classifier_class, args = registry.get_classifier_spec('bot')
+    registry._CLASSIFIERS.pop('bot')
+    self.assertIs(classifier_class, BotClassifier)
+    self.assertEqual((args['model_directory'], args['batch_size'], args['bucketing']), ('models', 64, True))
+
+  def test_missing_directory(self):
+    with mock.patch.dict(os.environ, {'BOT_CLASSIFIER_TOKENIZER_DIRECTORY': 'tokenizers'}):
+      with self.assertRaises(KeyError):
+        registry.get_classifier_args('bot')
+
+  def test_server_address(self):
+    variables = {'GENDER_CLASSIFIER_SERVER_ADDRESS': '/tmp/gender.sock', 'GENDER_CLASSIFIER_SERVER_AUTHKEY': 'key'}
+    with mock.patch.dict(os.environ, variables):
+      self.assertEqual(registry.get_classifier_spec('gender'),
+                       (InferenceClient, {'address': '/tmp/gender.sock', 'authkey': b'key'}))
+
+  def test_server_without_key(self):
+    with mock.patch.dict(os.environ, {'GENDER_CLASSIFIER_SERVER_ADDRESS': '/tmp/gender.sock'}):
+      with self.assertRaises(KeyError):
+        registry.get_classifier_spec('gender')
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from unittest import TestCase
+
+import settings
+from classifiers.gender_classifier import GenderClassifier, exceptions
+from classifiers.export import export_tflite
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+model_directory = os.getenv('GENDER_CLASSIFIER_MODEL_DIRECTORY')
+tokenizer_directory = os.getenv('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY')
+export_directory = tempfile.mkdtemp()
+export_tflite(model_directory, export_directory)
+export_tflite(model_directory, export_directory, quantize=True)
+keras_classifier = GenderClassifier(model_directory, tokenizer_directory)
+tflite_classifier = GenderClassifier(export_directory, tokenizer_directory, backend='tflite')
+int8_classifier = GenderClassifier(export_directory, tokenizer_directory, backend='tflite_int8')
+
+
+class TestParity(TestCase):
+  def setUp(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';', nrows=200)
+    self.X = df[GenderClassifier._INPUT_COLUMNS].values.astype(str)
+
+  def test_probabilities(self):
+    expected = keras_classifier._infer(self.X)
+    np.testing.assert_allclose(tflite_classifier._infer(self.X), expected, atol=1e-5)
+
+  def test_classes(self):
+    df = pd.DataFrame(self.X, columns=GenderClassifier._INPUT_COLUMNS)
+    np.testing.assert_array_equal(
+      tflite_classifier.predict_classes(df), keras_classifier.predict_classes(df)
+    )
+
+  def test_batch_sizes(self):
+    expected = tflite_classifier._infer(self.X)
+    for batch_size in (1, 7, 64, 500):
+      xtest = [
+        tflite_classifier._preprocess_inputs(self.X[:, col], maxlen)
+        for col, maxlen in zip(tflite_classifier._col_X, tflite_classifier._maxlen)
+      ]
+      y_probas = tflite_classifier._model.predict(xtest, batch_size=batch_size)
+      np.testing.assert_allclose(y_probas, expected, atol=1e-6)
+
+
+class TestQuantized(TestCase):
+  def setUp(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';', nrows=200)
+    self.X = df[GenderClassifier._INPUT_COLUMNS].values.astype(str)
+
+  def test_model_is_smaller(self):
+    size = os.path.getsize(GenderClassifier._get_model_file(export_directory, 'tflite'))
+    int8_size = os.path.getsize(GenderClassifier._get_model_file(export_directory, 'tflite_int8'))
+    self.assertLess(int8_size, size)
+
+  def test_drift(self):
+    expected = keras_classifier._infer(self.X)
+    y_probas = int8_classifier._infer(self.X)
+    self.assertLess(np.abs(y_probas - expected).mean(), 0.05)
+    agreement = (y_probas.argmax(axis=1) == expected.argmax(axis=1)).mean()
+    self.assertGreaterEqual(agreement, 0.95)
+
+
+class TestBackend(TestCase):
+  def test_get_backend(self):
+    self.assertEqual(keras_classifier.get_backend(), 'keras')
+    self.assertEqual(tflite_classifier.get_backend(), 'tflite')
+    self.assertEqual(int8_classifier.get_backend(), 'tflite_int8')
+
+  def test_unknown_backend(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      GenderClassifier(model_directory, tokenizer_directory, backend='unknown')
+
+  def test_missing_model(self):
+    with self.assertRaises(exceptions.ClassifierInitException):
+      GenderClassifier(tempfile.mkdtemp(), tokenizer_directory, backend='tflite')
@@ -0,0 +1,85 @@
+import numpy as np
+from typing import List
+
+
+def _get_interpreter_class():
+  # The standalone runtime is a few MB, fall back to the one bundled with TensorFlow
+  try:
+    from tflite_runtime.interpreter import Interpreter
+  except ImportError:
+    import tensorflow as tf
+    Interpreter = tf.lite.Interpreter
+  return Interpreter
+
+
+class TFLiteModel:
+  """
+  Runs a model exported by classifiers.export with the TensorFlow Lite interpreter,
+  behind the same predict(inputs, batch_size) call as the Keras model.
+
+  The inputs of the TFLite model are matched to the features by their length, as the
+  converter does not keep the order of the Keras inputs, or by their name when their
+  length is variable.
+  """
+
+  def __init__(self, model_file: str, maxlen: List[int], names: List[str]=None):
+    self._interpreter = _get_interpreter_class()(model_path=model_file)
+    self._inputs = self._match_inputs(self._interpreter.get_input_details(), maxlen, names)
+    self._output = self._interpreter.get_output_details()[0]
+    self._shape = None
+
+  @staticmethod
+  def _match_inputs(inputs: List[dict], maxlen: List[int], names: List[str]=None) -> List[dict]:
+    lengths = [int(details['shape'][-1]) for details in inputs]
+    if sorted(lengths) == sorted(maxlen) and len(set(maxlen)) == len(maxlen):
+      return [inputs[lengths.index(length)] for length in maxlen]
+
+    # e.g. serving_default_name:0 for the Keras input "name"
+    input_names = [details['name'].split(':')[0].replace('serving_default_', '') for details in inputs]
+    if names is not None and sorted(input_names) == sorted(names):
+      return [inputs[input_names.index(name)] for name in names]
+    raise ValueError(f'Inputs {input_names} of lengths {lengths} do not match the features {maxlen}.')
+
+  def get_output_size(self) -> int:
+    """Number of class probabilities of each row."""
+    return int(self._output['shape'][-1])
+
+  def supports_variable_length(self) -> bool:
+    """True when the sequence length of every input was left undefined at export."""
+    # shape_signature is only reported by recent interpreters, assume fixed lengths otherwise
+    signatures = [details.get('shape_signature') for details in self._inputs]
+    return all(signature is not None and signature[-1] == -1 for signature in signatures)
+
+  def _resize(self, batch_size: int, lengths: List[int]):
+    shape = (batch_size, *lengths)
+    if shape == self._shape:
+      return
+    for details, length in zip(self._inputs, lengths):
+      self._interpreter.resize_tensor_input(details['index'], [batch_size, length])
+    self._interpreter.allocate_tensors()
+    self._shape = shape
+
+  def predict(self, inputs: List[np.array], batch_size: int=32) -> np.array:
+    """
+    Objective: runs the model on the padded sequences of every feature
+
+    Inputs:
+        - inputs, list: one array of shape (rows, length) per feature, in the order of the features
+        - batch_size, int: number of rows per invocation of the interpreter
+    Outputs:
+        - y_probas, np.array: the class probabilities of each row
+    """
+    rows = len(inputs[0])
+    self._resize(batch_size, [X.shape[1] for X in inputs])
+    y_probas = np.empty((rows, self.get_output_size()), dtype=self._output['dtype'])
+    for start in range(0, rows, batch_size):
+      end = min(start + batch_size, rows)
+      for details, X in zip(self._inputs, inputs):
+        batch = X[start:end].astype(details['dtype'], copy=False)
+        if end - start < batch_size:
+          # The last batch is padded instead of resizing the tensors twice per call
+          batch = np.pad(batch, ((0, batch_size - (end - start)), (0, 0)))
+        self._interpreter.set_tensor(details['index'], batch)
+      self._interpreter.invoke()
+      y_probas[start:end] = self._interpreter.get_tensor(self._output['index'])[:end - start]
+    return y_probas
@@ -1,4 +1,10 @@
+import os
 from dotenv import load_dotenv
 
 
 load_dotenv()
+
+
+def get_env_flag(name: str) -> bool:
+  """Reads a boolean environment variable, false unless set to 1, true or yes."""
+  return os.getenv(name, 'false').lower() in ('1', 'true', 'yes')
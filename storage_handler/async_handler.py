@@ -0,0 +1,53 @@
+import os
+import asyncio
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from .handler import Handler
+
+
+_IO_THREADS = int(os.getenv('ASYNC_IO_THREADS', 16))
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+  """
+  Returns the thread pool of this process running the blocking AWS calls. It is shared
+  by every job, so the calls of many jobs can be in flight at once.
+  """
+  global _executor
+  if _executor is None:
+    _executor = ThreadPoolExecutor(max_workers=_IO_THREADS, thread_name_prefix='async-io')
+  return _executor
+
+
+async def run_blocking(function: Callable, *args, **kwargs):
+  """Runs a blocking call in the shared thread pool and waits for it without blocking the loop."""
+  loop = asyncio.get_running_loop()
+  return await loop.run_in_executor(get_executor(), lambda: function(*args, **kwargs))
+
+
+class AsyncHandler:
+  """
+  Asyncio version of the control-plane calls of Handler (existence checks, ETags, presigned
+  URLs and manifests), so independent calls run concurrently. The calls go through the boto3 client of
+  the handler, which is thread safe and keeps its connection pool across jobs.
+  """
+
+  def __init__(self, handler: Handler=None):
+    self._handler = handler if handler is not None else Handler()
+
+  async def file_exists(self, key: str) -> bool:
+    return await run_blocking(self._handler.file_exists, key)
+
+  async def get_presigned_url(self, key: str, expiration: int) -> str:
+    return await run_blocking(self._handler.get_presigned_url, key, expiration)
+
+  async def get_etag(self, key: str) -> str:
+    return await run_blocking(self._handler.get_etag, key)
+
+  async def read_json(self, key: str):
+    return await run_blocking(self._handler.read_json, key)
+
+  async def write_json(self, key: str, data):
+    return await run_blocking(self._handler.write_json, key, data)
@@ -0,0 +1,32 @@
+class StreamException(Exception):
+  """
+  Should be raised when handler fails to open an object as a stream.
+  """
+  def __init__(self, *args):
+    if args:
+      self.message = args[0]
+    else:
+      self.message = None
+  
+  def __str__(self):
+    if self.message:
+      return f'StreamException, {self.message}'
+    else:
+      return 'StreamException: Failed to open the object as a stream.'
+
+
+class MultipartUploadException(Exception):
+  """
+  Should be raised when handler fails to upload a stream in parts.
+  """
+  def __init__(self, *args):
+    if args:
+      self.message = args[0]
+    else:
+      self.message = None
+  
+  def __str__(self):
+    if self.message:
+      return f'MultipartUploadException, {self.message}'
+    else:
+      return 'MultipartUploadException: Failed to upload the stream.'
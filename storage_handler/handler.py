@@ -1,24 +1,113 @@
 import os
+import json
+import time
+import shutil
+import boto3
 from uuid import uuid1
-from s3_wrapper import S3Utils
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from s3_wrapper import s3_exceptions
+
+from . import exceptions
+from .upload_stream import UploadStream
 
 
 PathLike = os.PathLike
 
+_MISSING_CODES = ('404', 'NoSuchKey', 'NotFound')
+
+
+def _is_missing(error: ClientError) -> bool:
+  return error.response['Error']['Code'] in _MISSING_CODES
+
+
+class DownloadStream:
+  """Readable stream over an S3 object body, counting the bytes read and the time spent reading."""
+
+  def __init__(self, body):
+    self._body = body
+    self.bytes_read = 0
+    self.read_seconds = 0.0
+
+  def read(self, size: int=-1) -> bytes:
+    started = time.perf_counter()
+    data = self._body.read() if size is None or size < 0 else self._body.read(size)
+    self.read_seconds += time.perf_counter() - started
+    self.bytes_read += len(data)
+    return data
+
+  def readable(self) -> bool:
+    return True
+
+  def seekable(self) -> bool:
+    # Read by the decompressors of compressed datasets, which only seek on seekable inputs
+    return False
+
+  def close(self):
+    self._body.close()
+
 
 class Handler:
+
+  _MAX_POOL_CONNECTIONS = 32  # Concurrent requests of the streams and of AsyncHandler
+
   def __init__(self):
-    self._s3 = S3Utils()
+    self._client = self._get_client()
+    self._bucket_name = os.getenv('S3_BUCKET_NAME')
+
+  def _get_client(self):
+    # Every operation goes through this client, S3_ENDPOINT_URL points it to a local S3 stand-in (e.g. moto server)
+    try:
+      session = boto3.Session(profile_name=os.getenv('AWS_PROFILE_NAME'))
+      return session.client(
+        's3', endpoint_url=os.getenv('S3_ENDPOINT_URL'),
+        config=Config(max_pool_connections=self._MAX_POOL_CONNECTIONS)
+      )
+    except Exception as e:
+      raise s3_exceptions.SessionInitException(str(e))
 
   def file_exists(self, key: str) -> bool:
-    return self._s3.file_exists(key)
+    """Returns whether the object exists, the errors other than a missing object are raised."""
+    try:
+      self._client.head_object(Bucket=self._bucket_name, Key=key)
+      return True
+    except ClientError as e:
+      if _is_missing(e):
+        return False
+      raise e
   
   def get_presigned_url(self, key: str, expiration: int) -> str:
-    return self._s3.generate_presigned_url(key, expiration)
+    try:
+      return self._client.generate_presigned_url(
+        'get_object', Params={'Bucket': self._bucket_name, 'Key': key}, ExpiresIn=expiration
+      )
+    except Exception as e:
+      raise s3_exceptions.PresignedUrlGenerationException(str(e))
   
-  def download_file(self, key: str) -> PathLike:
-    file_path = f'/tmp/{uuid1()}.csv'
-    self._s3.download_file(key, file_path)
+  def _get_object(self, key: str, etag: str=None, **kwargs) -> dict:
+    # With an ETag, only that content of the object is read, a newer upload fails with 412
+    if etag is not None:
+      kwargs['IfMatch'] = etag
+    return self._client.get_object(Bucket=self._bucket_name, Key=key, **kwargs)
+
+  def download_file(self, key: str, etag: str=None) -> PathLike:
+    """Downloads the object to /tmp, the content of the given ETag only when there is one."""
+    # The extensions of the key are kept, e.g. .csv.gz for the readers to decompress it
+    name = key.split('/')[-1]
+    extension = name[name.index('.'):] if '.' in name else '.csv'
+    file_path = f'/tmp/{uuid1()}{extension}'
+    try:
+      if etag is None:
+        self._client.download_file(self._bucket_name, key, file_path)
+      else:
+        # The transfer manager cannot make conditional requests
+        body = self._get_object(key, etag)['Body']
+        with open(file_path, 'wb') as f:
+          shutil.copyfileobj(body, f, 1048576)
+    except Exception as e:
+      if os.path.exists(file_path):
+        os.remove(file_path)
+      raise s3_exceptions.DownloadFileException(str(e))
     return file_path
   
   def delete_local_file(self, file: str):
@@ -30,4 +119,58 @@ class Handler:
   def upload_file(self, key: str, file: PathLike):
     if not os.path.exists(file):
       raise FileNotFoundError
-    self._s3.upload_file(key, file)
+    try:
+      self._client.upload_file(file, self._bucket_name, key)
+    except Exception as e:
+      raise s3_exceptions.UploadFileException(str(e))
+
+  def open_stream(self, key: str, etag: str=None):
+    """Returns a readable file-like object streaming the content of the object (of the given ETag)."""
+    try:
+      response = self._get_object(key, etag)
+      return DownloadStream(response['Body'])
+    except Exception as e:
+      raise exceptions.StreamException(str(e))
+
+  def read_head(self, key: str, size: int, etag: str=None) -> bytes:
+    """Returns the first size bytes of the object (of the given ETag)."""
+    try:
+      response = self._get_object(key, etag, Range=f'bytes=0-{size - 1}')
+      return response['Body'].read()
+    except Exception as e:
+      raise exceptions.StreamException(str(e))
+
+  def open_upload_stream(self, key: str, part_size: int=None) -> UploadStream:
+    """Returns a writable file-like object uploading what is written to it in parts."""
+    return UploadStream(self._client, self._bucket_name, key, part_size=part_size)
+
+  def get_etag(self, key: str) -> str:
+    """Returns the ETag of the object, None if it does not exist."""
+    try:
+      response = self._client.head_object(Bucket=self._bucket_name, Key=key)
+      return response['ETag']
+    except ClientError as e:
+      if _is_missing(e):
+        return None
+      raise e
+
+  def copy_file(self, source_key: str, key: str):
+    """Copies an object within the bucket, without downloading it."""
+    source = {'Bucket': self._bucket_name, 'Key': source_key}
+    self._client.copy(source, self._bucket_name, key)
+
+  def read_json(self, key: str):
+    """Returns the JSON document stored in the object, None if it does not exist."""
+    try:
+      response = self._client.get_object(Bucket=self._bucket_name, Key=key)
+    except ClientError as e:
+      if _is_missing(e):
+        return None
+      raise e
+    return json.loads(response['Body'].read())
+
+  def write_json(self, key: str, data):
+    body = json.dumps(data).encode('utf-8')
+    self._client.put_object(
+      Bucket=self._bucket_name, Key=key, Body=body, ContentType='application/json'
+    )
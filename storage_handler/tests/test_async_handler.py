@@ -0,0 +1,75 @@
+"""Unit tests for AsyncHandler class"""
+
+import asyncio
+from unittest import TestCase, mock
+from botocore.exceptions import ClientError
+import settings
+
+from storage_handler.handler import Handler
+from storage_handler.async_handler import AsyncHandler, get_executor, run_blocking
+
+S3_BASE_DIRECTORY = 'tests'
+
+
+class TestFileExists(TestCase):
+  def setUp(self):
+    self.handler = AsyncHandler(Handler())
+
+  def test_exists(self):
+    file_path = f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.csv'
+    exists = asyncio.run(self.handler.file_exists(file_path))
+    self.assertIsInstance(exists, bool)
+    self.assertTrue(exists)
+
+  def test_does_not_exist(self):
+    exists = asyncio.run(self.handler.file_exists('invalid_test_path.csv'))
+    self.assertIsInstance(exists, bool)
+    self.assertFalse(exists)
+
+  def test_same_result_as_handler(self):
+    handler = Handler()
+    keys = [f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.csv', 'invalid_test_path.csv']
+    for key in keys:
+      self.assertEqual(asyncio.run(self.handler.file_exists(key)), handler.file_exists(key))
+
+  def test_other_errors_raised(self):
+    # e.g. expired credentials must not read as a missing object
+    error = ClientError({'Error': {'Code': '403', 'Message': 'Forbidden'}}, 'HeadObject')
+    with mock.patch.object(self.handler._handler._client, 'head_object', side_effect=error):
+      with self.assertRaises(ClientError):
+        asyncio.run(self.handler.file_exists('invalid_test_path.csv'))
+
+
+class TestGetEtag(TestCase):
+  def test_same_result_as_handler(self):
+    handler = Handler()
+    async_handler = AsyncHandler(handler)
+    for key in (f'{S3_BASE_DIRECTORY}/download_test.csv', 'invalid_test_path.csv'):
+      self.assertEqual(asyncio.run(async_handler.get_etag(key)), handler.get_etag(key))
+
+
+class TestJson(TestCase):
+  def test_write_read(self):
+    handler = AsyncHandler(Handler())
+    key = f'{S3_BASE_DIRECTORY}/user_profiling/async_handler_test.json'
+    asyncio.run(handler.write_json(key, {'report_key': 'report.csv'}))
+    self.assertEqual(asyncio.run(handler.read_json(key)), {'report_key': 'report.csv'})
+    handler._handler._client.delete_object(Bucket=handler._handler._bucket_name, Key=key)
+
+
+class TestGetPresignedUrl(TestCase):
+  def test_method(self):
+    handler = AsyncHandler(Handler())
+    file_path = 'orgX/handler_test_data/response_twitter1.json'
+    url = asyncio.run(handler.get_presigned_url(file_path, 3600))
+    self.assertIsInstance(url, str)
+
+
+class TestRunBlocking(TestCase):
+  def test_shared_executor(self):
+    self.assertIs(get_executor(), get_executor())
+
+  def test_concurrent_calls(self):
+    async def run():
+      return await asyncio.gather(*[run_blocking(pow, i, 2) for i in range(10)])
+    self.assertEqual(asyncio.run(run()), [i ** 2 for i in range(10)])
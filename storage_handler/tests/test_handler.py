@@ -1,6 +1,7 @@
 """Unit tests for StorageHandlerBase class"""
 
-from unittest import TestCase
+from unittest import TestCase, mock
+from botocore.exceptions import ClientError
 import os
 import shutil
 import uuid
@@ -27,6 +28,13 @@ class TestMethodsExistence(TestCase):
     self.assertTrue(hasattr(self.handler, 'upload_file'))
     self.assertTrue(hasattr(self.handler, 'delete_local_file'))
     self.assertTrue(hasattr(self.handler, 'get_presigned_url'))
+    self.assertTrue(hasattr(self.handler, 'open_stream'))
+    self.assertTrue(hasattr(self.handler, 'read_head'))
+    self.assertTrue(hasattr(self.handler, 'open_upload_stream'))
+    self.assertTrue(hasattr(self.handler, 'get_etag'))
+    self.assertTrue(hasattr(self.handler, 'copy_file'))
+    self.assertTrue(hasattr(self.handler, 'read_json'))
+    self.assertTrue(hasattr(self.handler, 'write_json'))
 
 
 class TestFileExists(TestCase):
@@ -45,6 +53,12 @@ class TestFileExists(TestCase):
     self.assertIsInstance(exists, bool)
     self.assertFalse(exists)
 
+  def test_other_errors_raised(self):
+    error = ClientError({'Error': {'Code': 'SlowDown', 'Message': 'Reduce your request rate.'}}, 'HeadObject')
+    with mock.patch.object(self.handler._client, 'head_object', side_effect=error):
+      with self.assertRaises(ClientError):
+        self.handler.file_exists('invalid_test_path.csv')
+
 
 class TestDownloadFile(TestCase):
   def setUp(self):
@@ -61,6 +75,17 @@ class TestDownloadFile(TestCase):
     with self.assertRaises(s3_exceptions.DownloadFileException):
       self.handler.download_file(file_path)
 
+  def test_download_etag(self):
+    file_path = f'{S3_BASE_DIRECTORY}/download_test.csv'
+    downloaded_file = self.handler.download_file(file_path, self.handler.get_etag(file_path))
+    with open(downloaded_file, 'rb') as f:
+      self.assertEqual(f.read(), self.handler.open_stream(file_path).read())
+    os.remove(downloaded_file)
+
+  def test_other_etag(self):
+    with self.assertRaises(s3_exceptions.DownloadFileException):
+      self.handler.download_file(f'{S3_BASE_DIRECTORY}/download_test.csv', '"0"')
+
 
 class TestUploadFile(TestCase):
   def setUp(self):
@@ -88,6 +113,11 @@ class TestGetPresignedUrl(TestCase):
     url = self.handler.get_presigned_url(file_path, 2000)
     self.assertIsInstance(url, str)
 
+  def test_endpoint_url(self):
+    with mock.patch.dict(os.environ, {'S3_ENDPOINT_URL': 'http://localhost:5000'}):
+      handler = Handler()
+    self.assertTrue(handler.get_presigned_url('test_path.csv', 2000).startswith('http://localhost:5000/'))
+
 
 class TestDeleteLocalFile(TestCase):
   def setUp(self):
@@ -110,4 +140,119 @@ class TestDeleteLocalFile(TestCase):
   
   def test_deleting_non_existing_file(self):
     with self.assertRaises(FileNotFoundError):
-      self.handler.delete_local_file('invalid_file.csv')
\ No newline at end of file
+      self.handler.delete_local_file('invalid_file.csv')
+
+class TestOpenStream(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+
+  def test_read_stream(self):
+    file_path = f'{S3_BASE_DIRECTORY}/download_test.csv'
+    stream = self.handler.open_stream(file_path)
+    content = stream.read()
+    stream.close()
+    self.assertIsInstance(content, bytes)
+    self.assertGreater(len(content), 0)
+
+  def test_does_not_exist_on_s3(self):
+    with self.assertRaises(exceptions.StreamException):
+      self.handler.open_stream('invalid_test_path.csv')
+
+  def test_other_etag(self):
+    with self.assertRaises(exceptions.StreamException):
+      self.handler.open_stream(f'{S3_BASE_DIRECTORY}/download_test.csv', '"0"')
+
+
+class TestReadHead(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+
+  def test_read_head(self):
+    file_path = f'{S3_BASE_DIRECTORY}/download_test.csv'
+    head = self.handler.read_head(file_path, 10)
+    self.assertEqual(len(head), 10)
+
+
+class TestOpenUploadStream(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+    self.key = f'{S3_BASE_DIRECTORY}/uploaded_stream.csv'
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'upload_me.csv'), 'rb') as f:
+      self.content = f.read()
+
+  def tearDown(self):
+    try:
+      s3.delete_object(self.key)
+    except:
+      pass
+
+  def test_small_upload(self):
+    with self.handler.open_upload_stream(self.key) as stream:
+      stream.write(self.content)
+    uploaded = self.handler.open_stream(self.key).read()
+    self.assertEqual(uploaded, self.content)
+
+  def test_multipart_upload(self):
+    # Enough content for two parts of the minimum part size
+    repeat = 2 * 5242880 // len(self.content) + 1
+    with self.handler.open_upload_stream(self.key) as stream:
+      for _ in range(repeat):
+        stream.write(self.content.decode('utf-8'))
+    uploaded = self.handler.open_stream(self.key).read()
+    self.assertEqual(uploaded, self.content * repeat)
+
+  def test_abort_on_error(self):
+    with self.assertRaises(RuntimeError):
+      with self.handler.open_upload_stream(self.key) as stream:
+        stream.write(self.content)
+        raise RuntimeError('Failed while writing.')
+    self.assertFalse(s3.file_exists(self.key))
+
+
+class TestGetEtag(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+
+  def test_exists(self):
+    etag = self.handler.get_etag(f'{S3_BASE_DIRECTORY}/download_test.csv')
+    self.assertIsInstance(etag, str)
+
+  def test_does_not_exist(self):
+    self.assertIsNone(self.handler.get_etag('invalid_test_path.csv'))
+
+
+class TestCopyFile(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+    self.source_key = f'{S3_BASE_DIRECTORY}/download_test.csv'
+    self.key = f'{S3_BASE_DIRECTORY}/copied_file.csv'
+
+  def tearDown(self):
+    try:
+      s3.delete_object(self.key)
+    except:
+      pass
+
+  def test_copy(self):
+    self.handler.copy_file(self.source_key, self.key)
+    self.assertEqual(self.handler.open_stream(self.key).read(), self.handler.open_stream(self.source_key).read())
+
+
+class TestJson(TestCase):
+  def setUp(self):
+    self.handler = Handler()
+    self.key = f'{S3_BASE_DIRECTORY}/manifest_test.json'
+
+  def tearDown(self):
+    try:
+      s3.delete_object(self.key)
+    except:
+      pass
+
+  def test_round_trip(self):
+    data = {'report_key': 'tests/user_profiling/report.csv', 'rows': 3}
+    self.handler.write_json(self.key, data)
+    self.assertEqual(self.handler.read_json(self.key), data)
+
+  def test_does_not_exist(self):
+    self.assertIsNone(self.handler.read_json('invalid_test_path.json'))
@@ -0,0 +1,117 @@
+import time
+from typing import Union
+
+from . import exceptions
+
+
+class UploadStream:
+  """
+  Writable file-like object uploading everything written to it to an S3 object.
+
+  Data is buffered and sent in parts of part_size bytes through a multipart upload
+  as soon as a part is full, so the object is uploaded while it is being produced.
+  Objects smaller than a part are sent with a single put_object on close. The object
+  only becomes visible once the stream is closed; abort discards everything.
+  """
+
+  _MIN_PART_SIZE = 5242880  # 5 MB, S3 minimum for every part but the last
+
+  def __init__(self, client, bucket: str, key: str, part_size: int=None, encoding: str='utf-8'):
+    self._client = client
+    self._bucket = bucket
+    self._key = key
+    self._part_size = max(part_size or self._MIN_PART_SIZE, self._MIN_PART_SIZE)
+    self._encoding = encoding
+    self._buffer = bytearray()
+    self._upload_id = None
+    self._parts = []
+    self.bytes_written = 0
+    self.upload_seconds = 0.0
+    self.closed = False
+
+  def writable(self) -> bool:
+    return True
+
+  def write(self, data: Union[str, bytes]) -> int:
+    if self.closed:
+      raise ValueError('I/O operation on closed stream.')
+    if isinstance(data, str):
+      data = data.encode(self._encoding)
+    self._buffer.extend(data)
+    self.bytes_written += len(data)
+    while len(self._buffer) >= self._part_size:
+      self._upload_part(bytes(self._buffer[:self._part_size]))
+      del self._buffer[:self._part_size]
+    return len(data)
+
+  def flush(self):
+    pass
+
+  def _upload_part(self, body: bytes):
+    started = time.perf_counter()
+    try:
+      if self._upload_id is None:
+        response = self._client.create_multipart_upload(Bucket=self._bucket, Key=self._key)
+        self._upload_id = response['UploadId']
+      part_number = len(self._parts) + 1
+      response = self._client.upload_part(
+        Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+        PartNumber=part_number, Body=body
+      )
+      self._parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+    except Exception as e:
+      self.abort()
+      raise exceptions.MultipartUploadException(str(e))
+    finally:
+      self.upload_seconds += time.perf_counter() - started
+
+  def close(self):
+    if self.closed:
+      return
+    started = time.perf_counter()
+    if self._upload_id is None:
+      try:
+        self._client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer))
+      except Exception as e:
+        raise exceptions.MultipartUploadException(str(e))
+      finally:
+        self.closed = True
+        self.upload_seconds += time.perf_counter() - started
+      return
+
+    if self._buffer:
+      self._upload_part(bytes(self._buffer))
+      started = time.perf_counter()
+    try:
+      self._client.complete_multipart_upload(
+        Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+        MultipartUpload={'Parts': self._parts}
+      )
+    except Exception as e:
+      self.abort()
+      raise exceptions.MultipartUploadException(str(e))
+    finally:
+      self.upload_seconds += time.perf_counter() - started
+    self.closed = True
+    self._buffer = bytearray()
+
+  def abort(self):
+    if self._upload_id is not None:
+      try:
+        self._client.abort_multipart_upload(
+          Bucket=self._bucket, Key=self._key, UploadId=self._upload_id
+        )
+      except Exception:
+        pass  # The upload expires with the bucket lifecycle rules
+      self._upload_id = None
+    self._buffer = bytearray()
+    self.closed = True
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.close()
+    else:
+      self.abort()
@@ -1,20 +1,98 @@
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 import settings
 import os
-
-from storage_handler import Handler
-from user_profiler import UserProfiler
+import time
+import threading
 
 
 app = Celery('user_profiler', broker=os.getenv('CELERY_BROKER_ENDPOINT'))
-handler = Handler()
-profiler = UserProfiler(handler)
+_profiler = None
+_metrics = None
+# A UserProfiler holds the state of the job it runs, so the tasks of a process share it one
+# at a time. Jobs run in parallel across the processes of the default prefork pool only.
+_profiler_lock = threading.Lock()
+
+
+def get_profiler():
+  """
+  Returns the profiler of this process, creating it on first use.
+  Producers only importing this module to call .delay never load the model.
+  """
+  global _profiler
+  if _profiler is None:
+    started = time.perf_counter()
+    from storage_handler import Handler
+    from user_profiler import UserProfiler
+    profiler = UserProfiler(Handler())
+    profiler.warm_up()
+    _profiler = profiler
+    print(f'Profiler initialized in {time.perf_counter() - started:.2f} seconds.')
+  return _profiler
+
+
+def get_metrics():
+  global _metrics
+  if _metrics is None:
+    from user_profiler.instrumentation import Metrics
+    _metrics = Metrics()
+  return _metrics
+
+
+def record_metrics(profiler, succeeded: bool):
+  """
+  Accumulates the job measures of this process and, if PROMETHEUS_TEXTFILE_DIRECTORY
+  is set, exports them there for the node exporter textfile collector.
+  """
+  metrics = get_metrics()
+  metrics.record(profiler.get_job_stats() if succeeded else None, succeeded=succeeded)
+  directory = os.getenv('PROMETHEUS_TEXTFILE_DIRECTORY', None)
+  if directory:
+    try:
+      metrics.write_textfile(directory)
+    except OSError as e:
+      print(f'Failed to export metrics: {e}')
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+  # Load the model in every worker process before it receives its first task
+  get_profiler()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+  # The metrics file is named after the pid, a recycled process would leave it exported forever
+  directory = os.getenv('PROMETHEUS_TEXTFILE_DIRECTORY', None)
+  if directory and _metrics is not None:
+    try:
+      _metrics.remove_textfile(directory)
+    except OSError as e:
+      print(f'Failed to remove the metrics file: {e}')
+
+
+@app.task
+def profile_users(s3_key: str, email: str, previous_report_key: str=None, output_format: str=None):
+  profiler = get_profiler()
+  with _profiler_lock:
+    try:
+      profiler.profile(s3_key, email, previous_report_key, output_format)
+      record_metrics(profiler, succeeded=True)
+    except Exception as e:
+      record_metrics(profiler, succeeded=False)
+      print('Failed to complete this operation.')
+      raise e
 
 
 @app.task
-def profile_users(s3_key: str, email: str):
-  try:
-    profiler.profile(s3_key, email)
-  except Exception as e:
-    print('Failed to complete this operation.')
-    raise e
+def profile_users_batch(jobs: list, output_format: str=None):
+  """Profiles a list of (s3_key, email) pairs in one pass of the model."""
+  profiler = get_profiler()
+  with _profiler_lock:
+    try:
+      profiler.profile_batch([tuple(job) for job in jobs], output_format)
+      record_metrics(profiler, succeeded=True)
+    except Exception as e:
+      record_metrics(profiler, succeeded=False)
+      print('Failed to complete this operation.')
+      raise e
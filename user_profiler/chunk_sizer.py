@@ -0,0 +1,138 @@
+import math
+import pandas as pd
+
+from .compression import open_input
+
+
+class ChunkSizer:
+  """
+  Chooses the number of rows per chunk while profiling a dataset.
+
+  The first size is estimated from a sample of the dataset: its pandas memory per row
+  (scaled up for the longest rows of the sample and for the copy made while processing),
+  plus the padded input tensors of the classifier. Sizes are multiples of the inference
+  batch size so no batch is left half empty, and are adjusted after every chunk from its
+  measured processing time and from a decaying average of the memory measured per row,
+  which follows the rows getting longer or shorter along the dataset. Under memory pressure the size is shrunk and never
+  grows back past the shrunk size.
+  """
+
+  _SAMPLE_ROWS = 1000
+  _TAIL_QUANTILE = 0.95  # Chunks are sized for rows this long, not for the average row
+  _COPY_FACTOR = 2  # The chunk is copied before its predictions are added
+  _MEASURE_WEIGHT = 0.5  # Weight of the last chunk in the measured memory per row, the older ones decay
+
+  def __init__(self, target_bytes: int, batch_size: int=32, tensor_bytes_per_row: int=0,
+               target_seconds: float=None, separator: str=',', copy_factor: float=None):
+    self._target_bytes = target_bytes
+    self._batch_size = batch_size
+    self._tensor_bytes_per_row = tensor_bytes_per_row
+    self._target_seconds = target_seconds
+    self._separator = separator
+    self._copy_factor = copy_factor if copy_factor else self._COPY_FACTOR
+    self._size = 1
+    self._max_size = None
+    self._estimated_bytes_per_row = None
+    self._measured_bytes_per_row = None
+    self.sizes = []
+
+  def estimate(self, *files, complete: bool=True) -> int:
+    """
+    Estimates the first chunk size from a sample of the files, paths (compressed ones are
+    decompressed) or readable buffers.
+    Several files are sampled one after another, for chunks spanning several datasets.
+    complete is False when the files are only the first records of the datasets (e.g. the
+    head of a streamed dataset), so fewer rows than sampled do not make the whole dataset.
+    """
+    samples = []
+    rows = 0
+    for file in files:
+      if rows >= self._SAMPLE_ROWS:
+        break
+      try:
+        source = open_input(file)
+        try:
+          samples.append(pd.read_csv(source, nrows=self._SAMPLE_ROWS - rows, sep=self._separator))
+        finally:
+          if source is not file:
+            source.close()
+      except (ValueError, OSError):
+        if len(files) == 1:
+          raise
+        continue  # This dataset fails when it is read, the others can still be sampled
+      rows += len(samples[-1])
+    df = pd.concat(samples, ignore_index=True, sort=False) if samples else pd.DataFrame()
+    if rows == 0:
+      # Nothing to sample, the chunks are sized from the memory they are measured to take
+      self._size = 1 if complete else self._batch_size
+      return self._size
+
+    frame_bytes_per_row = df.memory_usage(deep=True, index=False).sum() / rows
+    lengths = sum(df[column].astype(str).str.len() for column in df.columns)
+    tail_factor = max(1.0, lengths.quantile(self._TAIL_QUANTILE) / max(lengths.mean(), 1))
+    self._estimated_bytes_per_row = float(
+      frame_bytes_per_row * tail_factor * self._copy_factor + self._tensor_bytes_per_row
+    )
+    if complete and rows < self._SAMPLE_ROWS:
+      # The whole dataset fits in the sample, process it in one chunk
+      self._size = rows
+    else:
+      self._size = self._align(self._target_bytes / self._estimated_bytes_per_row)
+    return self._size
+
+  def next_size(self) -> int:
+    """Returns the size of the next chunk to read."""
+    self.sizes.append(self._size)
+    return self._size
+
+  def update(self, rows: int, seconds: float, memory_bytes: int=0, frame_bytes: int=0):
+    """
+    Adjusts the next chunk size after processing a chunk of rows in seconds, which
+    grew the resident memory by memory_bytes (0 if unknown, or when the memory freed by
+    the previous chunks was enough). frame_bytes is the measured pandas memory of the chunk
+    (0 if not measured), counted with its copy and input tensors. The size at most doubles
+    or halves from one chunk to the next.
+    """
+    if rows <= 0:
+      return
+
+    if frame_bytes > 0:
+      memory_bytes = max(memory_bytes, frame_bytes * self._copy_factor + self._tensor_bytes_per_row * rows)
+    if memory_bytes > 0:
+      sample = memory_bytes / rows
+      if self._measured_bytes_per_row is None:
+        self._measured_bytes_per_row = sample
+      else:
+        self._measured_bytes_per_row += self._MEASURE_WEIGHT * (sample - self._measured_bytes_per_row)
+    bytes_per_row = self._measured_bytes_per_row or self._estimated_bytes_per_row
+    candidates = [self._size * 2]
+    if bytes_per_row:
+      candidates.append(self._target_bytes / bytes_per_row)
+    if self._target_seconds and seconds > 0:
+      candidates.append(rows * self._target_seconds / seconds)
+    self._size = self._align(max(self._size / 2, min(candidates)))
+
+  def shrink(self) -> bool:
+    """
+    Halves the next chunk size, which no later chunk exceeds. Returns False when the
+    chunks are already a single batch.
+    """
+    if self._size <= self._batch_size:
+      return False
+    self._size = self._align(self._size / 2)
+    self._max_size = self._size
+    return True
+
+  def _align(self, rows: float) -> int:
+    if self._max_size is not None:
+      rows = min(rows, self._max_size)
+    batches = max(1, math.floor(rows / self._batch_size))
+    return int(batches * self._batch_size)
+
+  def get_stats(self) -> dict:
+    return {
+      'chunk_sizes': list(self.sizes),
+      'estimated_bytes_per_row': self._estimated_bytes_per_row,
+      'measured_bytes_per_row': self._measured_bytes_per_row,
+      'max_size': self._max_size,
+    }
@@ -0,0 +1,118 @@
+"""
+Streaming (de)compression of the datasets and CSV reports: .csv.gz, .csv.bz2 and .csv.zst.
+Data is decompressed as the CSV reader consumes it and compressed as the writer produces
+it, so no uncompressed copy of a dataset or report is ever staged.
+
+gzip and bz2 come with Python; zstd needs zstandard (pip install zstandard).
+"""
+import io
+import bz2
+import gzip
+import zlib
+
+
+COMPRESSIONS = {
+  'gzip': 'gz',
+  'bz2': 'bz2',
+  'zstd': 'zst',
+}  # Compression: extension of the compressed file
+
+
+def _import_zstandard():
+  try:
+    import zstandard
+  except ImportError:
+    raise ImportError('The zstd compression needs zstandard: pip install zstandard')
+  return zstandard
+
+
+def get_compression(name: str) -> str:
+  """Returns the compression of a file or key from its extension, None if it is not compressed."""
+  extension = name.split('/')[-1].split('.')[-1]
+  for compression, compressed_extension in COMPRESSIONS.items():
+    if extension == compressed_extension:
+      return compression
+  return None
+
+
+def strip_extension(name: str) -> str:
+  """Removes the compression extension of a file or key, e.g. dataset.csv.gz gives dataset.csv."""
+  if get_compression(name) is None:
+    return name
+  return name[:name.rindex('.')]
+
+
+def get_extension(compression: str) -> str:
+  if compression not in COMPRESSIONS:
+    raise ValueError(f'{compression}: Unknown compression, expected one of {list(COMPRESSIONS)}.')
+  return COMPRESSIONS[compression]
+
+
+def open_input(file, compression: str='infer'):
+  """
+  Objective: opens a dataset for reading, decompressing it as it is read
+
+  Inputs:
+      - file, str or stream: a local file path, or a readable binary stream (e.g. an S3 body)
+      - compression, str: gzip, bz2, zstd or None, inferred from the extension of a path by default
+  Outputs:
+      - file, str or stream: file itself when it is not compressed, else a binary stream of its
+        decompressed content. A stream given as file is not closed with it.
+  """
+  if compression == 'infer':
+    compression = get_compression(file) if isinstance(file, str) else None
+  if compression is None:
+    return file
+  if compression == 'gzip':
+    return gzip.open(file, 'rb') if isinstance(file, str) else gzip.GzipFile(fileobj=file, mode='rb')
+  if compression == 'bz2':
+    return bz2.BZ2File(file, 'rb')
+  if compression == 'zstd':
+    decompressor = _import_zstandard().ZstdDecompressor()
+    if isinstance(file, str):
+      return decompressor.stream_reader(open(file, 'rb'), closefd=True)
+    return decompressor.stream_reader(file, closefd=False)
+  raise ValueError(f'{compression}: Unknown compression, expected one of {list(COMPRESSIONS)}.')
+
+
+def decompress_head(data: bytes, compression: str=None) -> bytes:
+  """
+  Decompresses what can be of the first bytes of a compressed file, e.g. a sample of it.
+  bz2 and zstd only decompress whole blocks, of up to 900 and 128 kB of data each.
+  """
+  if compression is None:
+    return data
+  if compression == 'gzip':
+    return zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress(data)
+  if compression == 'bz2':
+    return bz2.BZ2Decompressor().decompress(data)
+  if compression == 'zstd':
+    return _import_zstandard().ZstdDecompressor().decompressobj().decompress(data)
+  raise ValueError(f'{compression}: Unknown compression, expected one of {list(COMPRESSIONS)}.')
+
+
+def open_output(output, compression: str, encoding: str='utf-8') -> io.TextIOWrapper:
+  """
+  Objective: opens a CSV report for writing text, compressing it as it is written
+
+  Inputs:
+      - output, str or stream: a local file path, or a writable binary stream (e.g. an UploadStream)
+      - compression, str: gzip, bz2 or zstd
+      - encoding, str: encoding of the text
+  Outputs:
+      - file, io.TextIOWrapper: text file to close once the report is written, which writes the
+        end of the compressed data. A stream given as output is not closed with it.
+  """
+  if compression == 'gzip':
+    binary = gzip.open(output, 'wb') if isinstance(output, str) else gzip.GzipFile(fileobj=output, mode='wb')
+  elif compression == 'bz2':
+    binary = bz2.BZ2File(output, 'wb')
+  elif compression == 'zstd':
+    compressor = _import_zstandard().ZstdCompressor()
+    if isinstance(output, str):
+      binary = compressor.stream_writer(open(output, 'wb'), closefd=True)
+    else:
+      binary = compressor.stream_writer(output, closefd=False)
+  else:
+    raise ValueError(f'{compression}: Unknown compression, expected one of {list(COMPRESSIONS)}.')
+  return io.TextIOWrapper(binary, encoding=encoding, newline='')
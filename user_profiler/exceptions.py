@@ -98,3 +98,57 @@ class SESClientException(Exception):
       return f'SESException, {self.message}'
     else:
       return 'SESException: Failed to setup SES client.'
+
+
+class RecordAlignmentException(Exception):
+  """
+  Should be raised when raw records of a dataset do not line up with its parsed rows.
+  """
+  def __init__(self, *args):
+    if args:
+      self.message = args[0]
+    else:
+      self.message = None
+  
+  def __str__(self):
+    if self.message:
+      return f'RecordAlignmentException, {self.message}'
+    else:
+      return 'RecordAlignmentException: Raw records do not match the parsed rows.'
+
+
+class BatchProfilingException(Exception):
+  """
+  Should be raised when some datasets of a batch could not be profiled.
+  failures maps the s3 key of each failed dataset to its error.
+  """
+  def __init__(self, *args, failures: dict=None):
+    if args:
+      self.message = args[0]
+    else:
+      self.message = None
+    self.failures = failures if failures is not None else {}
+
+  def __str__(self):
+    if self.message:
+      return f'BatchProfilingException, {self.message}'
+    else:
+      return 'BatchProfilingException: Failed to profile some datasets of the batch.'
+
+
+class MemoryLimitExceededException(Exception):
+  """
+  Should be raised when profiling a dataset needs more resident memory than the ceiling
+  it was given (PROFILER_MAX_RSS_BYTES), before the process is killed for running out of memory.
+  """
+  def __init__(self, *args):
+    if args:
+      self.message = args[0]
+    else:
+      self.message = None
+
+  def __str__(self):
+    if self.message:
+      return f'MemoryLimitExceededException, {self.message}'
+    else:
+      return 'MemoryLimitExceededException: The resident memory exceeded its ceiling.'
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from . import resources
+
+
+class JobStats:
+  """
+  Collects the measures of one profiling job: wall time per stage (download, parse,
+  tokenize, infer, write, upload, email...), bytes moved, rows processed and peak memory.
+  The peak memory is the largest resident memory sampled during the job (around every
+  chunk and at the end), not ru_maxrss, which is the peak of the whole process lifetime.
+  Stages may run concurrently (pipelined mode), so their times can add up to more than
+  the job wall time. Safe to update from several threads.
+  """
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._started = time.perf_counter()
+    self._stages = {}
+    self._bytes = {}
+    self._rows = 0
+    self._details = {}
+    self._peak_rss = resources.current_rss()
+
+  @contextmanager
+  def stage(self, name: str):
+    started = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.add_time(name, time.perf_counter() - started)
+
+  def add_time(self, name: str, seconds: float):
+    with self._lock:
+      self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+  def add_bytes(self, name: str, count: int):
+    with self._lock:
+      self._bytes[name] = self._bytes.get(name, 0) + count
+
+  def add_rows(self, count: int):
+    with self._lock:
+      self._rows += count
+
+  def sample_rss(self, rss: int=None):
+    """Takes the current resident memory, or rss if measured already, into the job peak."""
+    rss = resources.current_rss() if rss is None else rss
+    with self._lock:
+      self._peak_rss = max(self._peak_rss, rss)
+
+  def set_detail(self, name: str, value):
+    with self._lock:
+      self._details[name] = value
+
+  def to_dict(self) -> dict:
+    self.sample_rss()
+    with self._lock:
+      wall_seconds = time.perf_counter() - self._started
+      summary = {
+        'wall_seconds': wall_seconds,
+        'rows': self._rows,
+        'rows_per_second': self._rows / wall_seconds if wall_seconds > 0 else 0.0,
+        'stage_seconds': dict(self._stages),
+        'bytes': dict(self._bytes),
+        'peak_rss_bytes': self._peak_rss,
+      }
+      summary.update(self._details)
+      return summary
+
+  def to_json(self) -> str:
+    return json.dumps(self.to_dict(), default=float)
+
+
+class Metrics:
+  """
+  Accumulates the summaries of the jobs run by a process and renders them in the
+  Prometheus text exposition format, e.g. for the node exporter textfile collector.
+  """
+
+  _PREFIX = 'user_profiler'
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._jobs = {'succeeded': 0, 'failed': 0}
+    self._rows = 0
+    self._stage_seconds = {}
+    self._bytes = {}
+    self._last_peak_rss_bytes = 0
+    self._last_rows_per_second = 0.0
+
+  def record(self, summary: dict=None, succeeded: bool=True):
+    with self._lock:
+      self._jobs['succeeded' if succeeded else 'failed'] += 1
+      if summary is None:
+        return
+      self._rows += summary['rows']
+      for name, seconds in summary['stage_seconds'].items():
+        self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + seconds
+      for name, count in summary['bytes'].items():
+        self._bytes[name] = self._bytes.get(name, 0) + count
+      self._last_peak_rss_bytes = summary['peak_rss_bytes']
+      self._last_rows_per_second = summary['rows_per_second']
+
+  def to_prometheus(self) -> str:
+    p = self._PREFIX
+    # Every worker process writes its own file, the pid label keeps their series apart
+    pid = f'pid="{os.getpid()}"'
+    with self._lock:
+      lines = [
+        f'# TYPE {p}_jobs_total counter',
+        *[f'{p}_jobs_total{{{pid},status="{status}"}} {count}' for status, count in self._jobs.items()],
+        f'# TYPE {p}_rows_total counter',
+        f'{p}_rows_total{{{pid}}} {self._rows}',
+        f'# TYPE {p}_stage_seconds_total counter',
+        *[f'{p}_stage_seconds_total{{{pid},stage="{name}"}} {seconds:.6f}'
+          for name, seconds in sorted(self._stage_seconds.items())],
+        f'# TYPE {p}_bytes_total counter',
+        *[f'{p}_bytes_total{{{pid},transfer="{name}"}} {count}'
+          for name, count in sorted(self._bytes.items())],
+        f'# TYPE {p}_last_job_peak_rss_bytes gauge',
+        f'{p}_last_job_peak_rss_bytes{{{pid}}} {self._last_peak_rss_bytes}',
+        f'# TYPE {p}_last_job_rows_per_second gauge',
+        f'{p}_last_job_rows_per_second{{{pid}}} {self._last_rows_per_second:.3f}',
+      ]
+    return '\n'.join(lines) + '\n'
+
+  def write_textfile(self, directory: str):
+    """Atomically writes the metrics of this process to <directory>/user_profiler_<pid>.prom."""
+    path = self._get_textfile(directory)
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'w') as f:
+      f.write(self.to_prometheus())
+    os.replace(temporary_path, path)
+
+  def remove_textfile(self, directory: str):
+    """Removes the metrics file of this process, so its frozen values are not exported once it exits."""
+    try:
+      os.remove(self._get_textfile(directory))
+    except FileNotFoundError:
+      pass
+
+  def _get_textfile(self, directory: str) -> str:
+    return os.path.join(directory, f'{self._PREFIX}_{os.getpid()}.prom')
@@ -1,30 +1,61 @@
+import io
 import os
+import json
+import asyncio
+import hashlib
 import boto3
 import re
 import math
+import queue
 import random
+import time
+import threading
+import multiprocessing
 import pandas as pd
-from typing import List
+from collections import deque
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, List, Tuple
 from uuid import uuid1
 from datetime import datetime
 from botocore.exceptions import ClientError
 
 import settings
 from storage_handler.handler import Handler
+from storage_handler.async_handler import AsyncHandler, run_blocking
 from classifiers.gender_classifier import GenderClassifier
+from classifiers.base import predict_all
+from classifiers import registry
 from . import exceptions
+from . import workers
+from . import resources
+from . import writers
+from . import compression
+from .chunk_sizer import ChunkSizer
+from .records import RecordReader, append_column, drop_last_record
+from .instrumentation import JobStats
 
 
 PathLike = os.PathLike
+_END_OF_CHUNKS = object()  # Marks the end of the chunks flowing through the pipeline
 
 
 class UserProfiler:
 
   _EXTENSION = 'csv'
   _FORMAT = "%Y-%m-%d"
-  _CHUNK_SIZE_IN_BYTES = 10485760  # 10 MB
+  _CHUNK_SIZE_IN_BYTES = 33554432  # 32 MB of memory to process a chunk
+  _TARGET_CHUNK_SECONDS = 30
   _DEFAULT_SEPARATOR = ';'
   _EMAIL_CHARSET = 'UTF-8'
+  _STREAM_SAMPLE_SIZE_IN_BYTES = 1048576  # 1 MB, read to size the chunks of a streamed dataset
+  _PIPELINE_QUEUE_SIZE = 2  # Chunks buffered between two pipeline stages
+  _PIPELINE_POLL_INTERVAL = 0.1  # In seconds
+  _MANIFEST_PREFIX = 'user_profiling/manifests/'  # Where the manifests of the reports are stored
+  _PREFIX_CHUNK_ROWS = 10000  # Rows compared at once when looking for the profiled prefix of a dataset
+  _RSS_PRESSURE_RATIO = 0.8  # Share of PROFILER_MAX_RSS_BYTES past which the chunks are shrunk
+  _string_dtype = None  # Dtype of the columns in the memory-bounded mode, found on first use
   _EMAIL_SUBJECT = 'Citibeats - Your User Profile Report Is Ready'
 
   _EMAIL_TEXT = """Hello,
@@ -48,20 +79,94 @@ Note: This link will expire in 7 days.
     expiration_in_days = int(expiration_in_days)
     self._expiration = expiration_in_days * 86400  # In seconds
     self._ses = self._get_SES_client()
-    self._gender_classifier = self._get_gender_classifier()
+    self._pipeline = settings.get_env_flag('PROFILER_PIPELINE')
+    self._streaming = settings.get_env_flag('PROFILER_STREAMING')
+    self._passthrough = settings.get_env_flag('PROFILER_PASSTHROUGH')
+    self._default_output_format = os.getenv('PROFILER_OUTPUT_FORMAT', 'csv').lower()
+    writers.get_extension(self._default_output_format)
+    self._output_format = self._default_output_format
+    self._output_compression = os.getenv('PROFILER_OUTPUT_COMPRESSION', None)
+    if self._output_compression is not None:
+      compression.get_extension(self._output_compression)
+    self._writers = {}
+    self._manifest_prefix = os.getenv('PROFILER_MANIFEST_PREFIX', self._MANIFEST_PREFIX)
+    self._incremental = settings.get_env_flag('PROFILER_INCREMENTAL')
+    self._header_written = False
+    self._records = None
+    self._workers = int(os.getenv('PROFILER_WORKERS', 1))
+    self._chunk_size_in_bytes = int(os.getenv('PROFILER_CHUNK_SIZE_IN_BYTES', self._CHUNK_SIZE_IN_BYTES))
+    self._target_chunk_seconds = float(os.getenv('PROFILER_TARGET_CHUNK_SECONDS', self._TARGET_CHUNK_SECONDS))
+    # Resident memory ceiling of the profiling process, enables the memory-bounded mode
+    max_rss_bytes = os.getenv('PROFILER_MAX_RSS_BYTES', None)
+    self._max_rss_bytes = int(max_rss_bytes) if max_rss_bytes else None
+    if self._max_rss_bytes is not None and self._max_rss_bytes <= 0:
+      raise ValueError(f'{self._max_rss_bytes}: PROFILER_MAX_RSS_BYTES must be positive.')
+    self._chunk_sizer = None
+    self._stats = JobStats()
+    self._pool = None
+    self._classifiers = self._get_classifiers()
+    self._gender_classifier = self._classifiers.get('gender')
   
   def _get_gender_classifier(self) -> GenderClassifier:
-    model_directory = os.getenv('GENDER_CLASSIFIER_MODEL_DIRECTORY', None)
-    tokenizer_directory = os.getenv('GENDER_CLASSIFIER_TOKENIZER_DIRECTORY', None)
-    if model_directory is None:
-      raise KeyError('Missing environment variable "GENDER_CLASSIFIER_MODEL_DIRECTORY".')
+    classifier = GenderClassifier(**self._get_gender_classifier_args())
+    return classifier
 
-    if tokenizer_directory is None:
-      raise KeyError('Missing environment variable "GENDER_CLASSIFIER_TOKENIZER_DIRECTORY".')
+  def _get_classifiers(self) -> dict:
+    """Loads the classifiers of PROFILER_CLASSIFIERS (default: gender), by name in the order of their output columns."""
+    classifiers = {}
+    for name, (classifier_class, args) in self._get_classifier_specs().items():
+      classifiers[name] = classifier_class(**args)
+    output_columns = [column for classifier in classifiers.values() for column in classifier.get_output_columns()]
+    if len(set(output_columns)) != len(output_columns):
+      raise ValueError(f'The classifiers {list(classifiers)} write the same column: {output_columns}.')
+    return classifiers
+
+  def _get_classifier_specs(self) -> dict:
+    """Returns the class and the arguments of each classifier to load, by name."""
+    names = registry.parse_classifiers(os.getenv('PROFILER_CLASSIFIERS', 'gender'))
+    return {name: registry.get_classifier_spec(name) for name in names}
+
+  def _get_gender_classifier_args(self) -> dict:
+    return self._get_classifier_args('gender')
+
+  def _get_classifier_args(self, name: str) -> dict:
+    return registry.get_classifier_args(name)
+
+  def _get_pool(self) -> ProcessPoolExecutor:
+    # Worker processes are spawned, not forked, as TensorFlow does not survive a fork.
+    # The pool is kept across jobs so each worker loads the model only once.
+    if self._pool is None:
+      context = multiprocessing.get_context('spawn')
+      ready = context.Queue()
+      pool = ProcessPoolExecutor(
+        max_workers=self._workers,
+        mp_context=context,
+        initializer=workers.init_worker,
+        initargs=(self._get_classifier_specs(), ready)
+      )
+      self._wait_for_workers(pool, ready)
+      self._pool = pool
+    return self._pool
+
+  def _wait_for_workers(self, pool: ProcessPoolExecutor, ready):
+    """
+    Starts the workers of a new pool and waits until they loaded their classifiers, so the
+    memory they hold is counted when the chunks are sized (see _get_job_rss).
+    """
+    # Tasks submitted while no worker is idle start a worker each
+    futures = [pool.submit(workers.get_pid) for _ in range(self._workers)]
+    loaded = 0
+    while loaded < self._workers:
+      try:
+        ready.get(timeout=self._PIPELINE_POLL_INTERVAL)
+        loaded += 1
+      except queue.Empty:
+        for future in futures:
+          if future.done():
+            future.result()  # Raises BrokenProcessPool when a worker failed to load
+        if all(future.done() for future in futures) and ready.empty():
+          break  # Fewer workers were started, they start with the chunks
 
-    classifier = GenderClassifier(model_directory, tokenizer_directory)
-    return classifier
-  
   def _get_SES_client(self):
     try:
       region_name = os.getenv('AWS_REGION_NAME')
@@ -79,17 +184,76 @@ Note: This link will expire in 7 days.
     if not isinstance(handler, Handler):
       raise TypeError('"handler" must be of type Handler.')
     self.handler = handler
+    self._async_handler = AsyncHandler(handler)
   
-  def profile(self, s3_key: str, email: str):
-    self._validate(s3_key, email)
-    exists = self._check_report_exists(s3_key)
+  def warm_up(self):
+    for classifier in self._classifiers.values():
+      classifier.warm_up()
+
+  def _get_input_columns(self) -> list:
+    """Returns the input columns of all the classifiers, each once."""
+    columns = []
+    for classifier in self._classifiers.values():
+      columns += [column for column in classifier.get_input_columns() if column not in columns]
+    return columns
+
+  def _get_output_columns(self) -> list:
+    """Returns the columns the classifiers add to the dataset, e.g. gender_class."""
+    return [column for classifier in self._classifiers.values() for column in classifier.get_output_columns()]
+
+  def _get_model_version(self) -> str:
+    """Returns the version of the only classifier, or a digest of the versions of all of them."""
+    versions = [[name, classifier.get_model_version()] for name, classifier in self._classifiers.items()]
+    if len(versions) == 1:
+      return versions[0][1]
+    return hashlib.sha1(json.dumps(versions).encode()).hexdigest()
+
+  def _reset_classifier_stats(self):
+    for classifier in self._classifiers.values():
+      classifier.reset_stats()
+
+  def _predict_outputs(self, features: pd.DataFrame) -> dict:
+    """Runs every classifier on the chunk, returns the values of each row by output column."""
+    return predict_all(list(self._classifiers.values()), features)
+
+  def _predict(self, chunk: pd.DataFrame) -> pd.DataFrame:
+    """Adds the output columns of every classifier to the chunk."""
+    for column, values in self._predict_outputs(chunk).items():
+      chunk.loc[:, column] = values
+    return chunk
+
+  def profile(self, s3_key: str, email: str, previous_report_key: str=None, output_format: str=None):
+    """
+    Profiles the dataset and emails the link of its report, written in output_format
+    (csv, parquet or feather, PROFILER_OUTPUT_FORMAT by default). Given the key of a previous
+    report (or the current report of the dataset with PROFILER_INCREMENTAL), the leading
+    rows of the dataset found in that report keep their class and only the rows after
+    them are classified.
+    """
+    self._stats = JobStats()
+    self._set_output_format(output_format)
+    with self._stats.stage('validate'):
+      etag, manifest, previous_report_key = asyncio.run(
+        self._prepare_async(s3_key, email, previous_report_key)
+      )
     processed_file_key = self._generate_processed_file_key(s3_key)
-    if not exists:
+    reused = manifest is not None
+    content_ids = []
+    if reused:
+      self._reuse_report(manifest, processed_file_key)
+    elif self._streaming:
+      self._profile_stream(s3_key, processed_file_key, previous_report_key, etag)
+    else:
       files_to_delete = []
       try:
-        downloaded_file = self._download_dataset(s3_key)
+        downloaded_file = self._download_dataset(s3_key, etag)
         files_to_delete.append(downloaded_file)
-        processed_file = self._profile_users(downloaded_file)
+        content_ids.append(self._get_content_id(downloaded_file))
+        previous_file = None
+        if previous_report_key is not None:
+          previous_file = self._download_dataset(previous_report_key)
+          files_to_delete.append(previous_file)
+        processed_file = self._profile_users(downloaded_file, previous_file)
         files_to_delete.append(processed_file)
         processed_file_key = self._generate_processed_file_key(s3_key)
         self._upload_processed_dataset(processed_file_key, processed_file)
@@ -98,26 +262,303 @@ Note: This link will expire in 7 days.
         raise e
       finally:
         self._delete_files(files_to_delete)
+    if not reused:
+      asyncio.run(self._write_manifest_async(s3_key, etag, processed_file_key, content_ids))
+
+    with self._stats.stage('presign'):
+      url = self._get_presigned_url(processed_file_key)
+    with self._stats.stage('email'):
+      sent = self._send_email(email, url)
+    self._stats.set_detail('report_reused', reused)
+    print(f'Job summary: {self._stats.to_json()}')
 
-    url = self._get_presigned_url(processed_file_key)
-    sent = self._send_email(email, url)
+  def profile_batch(self, jobs: List[Tuple[str, str]], output_format: str=None) -> dict:
+    """
+    Profiles several datasets in one pass of the classifier: the datasets are read one
+    after another into chunks of full size, a chunk may span several datasets, so small
+    datasets share inference batches and users appearing in several of them are inferred
+    once per chunk. Each output is uploaded to the user_profiling/ key of its dataset
+    and emailed to its own address. Datasets whose content was profiled before reuse
+    that report.
 
-  def _validate(self, key, email):
-    self._validate_key(key)
+    A dataset failing does not stop the others; BatchProfilingException is raised at the
+    end with the error of each failed dataset. Returns the status of every s3 key.
+    """
+    self._stats = JobStats()
+    self._set_output_format(output_format)
+    statuses = {}
+    failures = {}
+    pending = []  # (s3_key, email, processed_file_key) of the datasets to profile
+    ready = []  # Same, for the datasets whose report can be sent
+    etags = {}
+    with self._stats.stage('validate'):
+      validations = asyncio.run(self._gather(
+        [self._validate_async(s3_key, email) for s3_key, email in jobs]
+      ))
+    for (s3_key, email), validation in zip(jobs, validations):
+      if isinstance(validation, Exception):
+        failures[s3_key] = validation
+        continue
+      etags[s3_key], manifest = validation
+      job = (s3_key, email, self._generate_processed_file_key(s3_key))
+      if manifest is None:
+        pending.append(job)
+        continue
+      try:
+        self._reuse_report(manifest, job[2])
+        ready.append(job)
+      except Exception as e:
+        failures[s3_key] = e
+
+    files_to_delete = []
+    try:
+      files = []
+      content_ids = {}
+      for s3_key, email, processed_file_key in list(pending):
+        file = None
+        try:
+          file = self._download_dataset(s3_key, etags[s3_key])
+          content_id = self._get_content_id(file)
+        except Exception as e:
+          failures[s3_key] = e
+          pending.remove((s3_key, email, processed_file_key))
+          if file is not None:
+            files_to_delete.append(file)
+          continue
+        # Only appended once read, files[index] is the dataset of pending[index]
+        files.append(file)
+        content_ids[s3_key] = [content_id]
+      files_to_delete.extend(files)
+
+      processed_files = self._profile_users_batch(files, failures, [job[0] for job in pending])
+      files_to_delete.extend(processed_files.values())
+      uploaded = []
+      for index, (s3_key, email, processed_file_key) in enumerate(pending):
+        if s3_key in failures:
+          continue
+        try:
+          self._upload_processed_dataset(processed_file_key, processed_files[index])
+          uploaded.append((s3_key, email, processed_file_key))
+        except Exception as e:
+          failures[s3_key] = e
+    finally:
+      self._delete_files(files_to_delete)
+    # The manifests of all the profiled datasets are written concurrently
+    asyncio.run(self._gather([
+      self._write_manifest_async(s3_key, etags[s3_key], processed_file_key, content_ids[s3_key])
+      for s3_key, _, processed_file_key in uploaded
+    ]))
+    ready.extend(uploaded)
+    statuses.update({s3_key: 'profiled' for s3_key, _, _ in uploaded})
+
+    notifications = asyncio.run(self._gather(
+      [self._notify_async(email, processed_file_key) for _, email, processed_file_key in ready]
+    ))
+    for (s3_key, _, _), error in zip(ready, notifications):
+      if isinstance(error, Exception):
+        statuses.pop(s3_key, None)
+        failures[s3_key] = error
+      else:
+        statuses.setdefault(s3_key, 'reused')
+
+    statuses.update({s3_key: 'failed' for s3_key in failures})
+    self._stats.set_detail('datasets', statuses)
+    print(f'Job summary: {self._stats.to_json()}')
+    if failures:
+      raise exceptions.BatchProfilingException(
+        f'{len(failures)} of {len(jobs)} datasets failed: ' +
+        ', '.join(f'{s3_key} ({e!r})' for s3_key, e in failures.items()),
+        failures=failures
+      )
+    return statuses
+
+  def _set_output_format(self, output_format: str=None):
+    output_format = output_format.lower() if output_format else self._default_output_format
+    writers.get_extension(output_format)
+    self._output_format = output_format
+
+  def _get_output_extension(self) -> str:
+    return writers.get_extension(self._output_format)
+
+  def _get_output_compression(self) -> str:
+    """Compression of the CSV reports, the columnar formats compress their own columns."""
+    return self._output_compression if self._output_format == 'csv' else None
+
+  def _uses_records(self) -> bool:
+    """Whether the raw records are written back (passthrough), which only CSV reports can do."""
+    return self._passthrough and self._output_format == 'csv'
+
+  async def _gather(self, coroutines: list) -> list:
+    """Runs the coroutines concurrently, returning the exception of those which failed."""
+    return await asyncio.gather(*coroutines, return_exceptions=True)
+
+  async def _validate_async(self, s3_key: str, email: str) -> Tuple[str, dict]:
+    """
+    Validates the job and looks up a report of the same content. Returns the ETag of the
+    dataset, the content then downloaded, and the manifest of the report to reuse, None if
+    there is none.
+    """
+    self._validate_key_format(s3_key)
     self._validate_email(email)
-  
-  def _validate_key(self, key: str):
+    return await self._find_content_async(s3_key)
+
+  async def _prepare_async(self, s3_key: str, email: str, previous_report_key: str=None) -> Tuple[str, dict, str]:
+    """
+    Validates the job, then looks up concurrently a report of the same content and the
+    previous report to profile the dataset incrementally from. Returns the ETag of the
+    dataset, the manifest of the report to reuse and the key of the previous report, None
+    when there is no such report.
+    """
+    self._validate_key_format(s3_key)
+    self._validate_email(email)
+    processed_file_key = self._generate_processed_file_key(s3_key)
+    (etag, manifest), previous_report_key = await asyncio.gather(
+      self._find_content_async(s3_key),
+      self._get_previous_report_async(processed_file_key, previous_report_key),
+    )
+    return etag, manifest, previous_report_key
+
+  async def _find_content_async(self, s3_key: str) -> Tuple[str, dict]:
+    """Returns the ETag of the dataset and the manifest of the report of that content, if any."""
+    etag = await self._async_handler.get_etag(s3_key)
+    if etag is None:
+      raise FileNotFoundError
+    return etag, await self._find_manifest_async(etag)
+
+  async def _find_manifest_async(self, etag: str) -> dict:
+    """Returns the manifest of the report of this content and model, if the report is intact."""
+    try:
+      manifest = await self._async_handler.read_json(self._get_manifest_key(etag))
+      if manifest is None:
+        return None
+      # The report may have been overwritten (e.g. by the report of a newer upload) or deleted
+      report_etag = await self._async_handler.get_etag(manifest['report_key'])
+      if report_etag != manifest['report_etag']:
+        return None
+      return manifest
+    except Exception as e:
+      print(f'Failed to read the manifest of {etag}, the dataset will be profiled: {e!r}')
+      return None
+
+  def _get_output_version(self) -> dict:
+    """What the content of a report depends on, besides the content of its dataset."""
+    return {
+      'model_version': self._get_model_version(),
+      'passthrough': self._uses_records(),
+      'output_format': self._output_format,
+      'output_compression': self._get_output_compression(),
+    }
+
+  def _get_manifest_key(self, etag: str) -> str:
+    version = json.dumps([etag, self._get_output_version()], sort_keys=True)
+    digest = hashlib.sha1(version.encode('utf-8')).hexdigest()
+    return f'{self._manifest_prefix}{digest}.json'
+
+  def _get_content_id(self, file: PathLike) -> str:
+    """
+    The ETag S3 gives to the content of the file when uploaded in a single part. The ETag of
+    a multipart upload depends on the part size, so the same content gets another ETag
+    when uploaded or copied differently.
+    """
+    digest = hashlib.md5()
+    with open(file, 'rb') as f:
+      for block in iter(lambda: f.read(1048576), b''):
+        digest.update(block)
+    return f'"{digest.hexdigest()}"'
+
+  async def _write_manifest_async(self, s3_key: str, etag: str, processed_file_key: str,
+                                  content_ids: List[str]=()):
+    """
+    Records the report of the content of the dataset, under its ETag and the single part
+    ETag of its content when known, so later jobs on the same content reuse it. Not
+    recording it only costs reprocessing, so failures are not raised.
+    """
+    try:
+      source_etag, report_etag = await asyncio.gather(
+        self._async_handler.get_etag(s3_key), self._async_handler.get_etag(processed_file_key)
+      )
+      if source_etag != etag:
+        print(f'{s3_key} changed while it was profiled, its report will not be reused.')
+        return
+      manifest = {
+        'etag': etag,
+        **self._get_output_version(),
+        'source_key': s3_key,
+        'report_key': processed_file_key,
+        'report_etag': report_etag,
+        'created': datetime.utcnow().isoformat(),
+      }
+      keys = [self._get_manifest_key(content_id) for content_id in {etag, *content_ids}]
+      keys.append(self._get_report_manifest_key(processed_file_key))
+      await asyncio.gather(*[self._async_handler.write_json(key, manifest) for key in keys])
+    except Exception as e:
+      print(f'Failed to write the manifest of {s3_key}, its report will not be reused: {e!r}')
+
+  def _get_report_manifest_key(self, report_key: str) -> str:
+    """Key of the manifest of a report looked up by the key of the report, for incremental profiling."""
+    digest = hashlib.sha1(report_key.encode('utf-8')).hexdigest()
+    return f'{self._manifest_prefix}reports/{digest}.json'
+
+  def _reuse_report(self, manifest: dict, processed_file_key: str):
+    """Copies the report of the same content to the report key of the dataset, if it lies elsewhere."""
+    if manifest['report_key'] == processed_file_key:
+      return
+    with self._stats.stage('copy'):
+      self.handler.copy_file(manifest['report_key'], processed_file_key)
+    try:
+      copy_manifest = dict(manifest, report_key=processed_file_key)
+      copy_manifest['report_etag'] = self.handler.get_etag(processed_file_key)
+      self.handler.write_json(self._get_report_manifest_key(processed_file_key), copy_manifest)
+    except Exception as e:
+      print(f'Failed to write the manifest of {processed_file_key}: {e!r}')
+
+  async def _get_previous_report_async(self, processed_file_key: str, previous_report_key: str=None) -> str:
+    """
+    Returns the key of the report to profile the dataset incrementally from: the given one
+    or, with PROFILER_INCREMENTAL, the current report of the dataset. None when there is
+    none, or when it was not made by this model and output format, as its classes would differ.
+    """
+    if previous_report_key is None and self._incremental:
+      previous_report_key = processed_file_key
+    if previous_report_key is None:
+      return None
+    if self._output_format != 'csv':
+      print('Incremental profiling needs CSV reports, profiling from scratch.')
+      return None
+    try:
+      manifest, report_etag = await asyncio.gather(
+        self._async_handler.read_json(self._get_report_manifest_key(previous_report_key)),
+        self._async_handler.get_etag(previous_report_key),
+      )
+      if manifest is None or manifest['report_etag'] != report_etag:
+        return None
+      version = self._get_output_version()
+      if any(manifest.get(name) != value for name, value in version.items()):
+        print(f'{previous_report_key} was made by another model or output format, profiling from scratch.')
+        return None
+      return previous_report_key
+    except Exception as e:
+      print(f'Failed to read the manifest of {previous_report_key}, profiling from scratch: {e!r}')
+      return None
+
+  async def _notify_async(self, email: str, processed_file_key: str):
+    """Sends the presigned URL of the report by email, without blocking the event loop."""
+    with self._stats.stage('presign'):
+      url = await self._async_handler.get_presigned_url(processed_file_key, self._expiration)
+    with self._stats.stage('email'):
+      await run_blocking(self._send_email, email, url)
+
+  def _validate_key_format(self, key: str):
     if key is None:
       raise ValueError('"key" cannot be None.')
     if not isinstance(key, str):
       raise TypeError('"key" must be of type str.')
     if len(key) == 0:
       raise ValueError('"key" cannot be empty.')
-    extension = key.split('.')[-1]
+    # Compressed datasets (e.g. .csv.gz) are decompressed while they are read
+    extension = compression.strip_extension(key).split('.')[-1]
     if extension != self._EXTENSION:
       raise exceptions.BadExtensionException
-    if not self.handler.file_exists(key):
-      raise FileNotFoundError
 
   def _validate_date_range(self, start_date: str, end_date: str):
     self._validate_date_format(start_date)
@@ -139,11 +580,6 @@ Note: This link will expire in 7 days.
     except Exception as e:
       raise exceptions.InvalidDateFormatException
 
-  def _check_report_exists(self, s3_key: str) -> bool:
-    processed_key = self._generate_processed_file_key(s3_key)
-    exists = self.handler.file_exists(processed_key)
-    return exists
-  
   def _generate_processed_file_key(self, s3_key: str) -> str:
     if s3_key is None:
       raise ValueError('"s3_key" cannot be None.')
@@ -152,7 +588,13 @@ Note: This link will expire in 7 days.
     elif len(s3_key) == 0:
       raise ValueError('"s3_key" cannot be empty.')
     tokens = s3_key.split('/')
-    tokens[-1] = 'user_profiling/' + tokens[-1]
+    name = compression.strip_extension(tokens[-1])
+    extension = self._get_output_extension()
+    if extension != self._EXTENSION and name.endswith('.' + self._EXTENSION):
+      name = name[:-len(self._EXTENSION)] + extension
+    if self._get_output_compression() is not None:
+      name += '.' + compression.get_extension(self._get_output_compression())
+    tokens[-1] = 'user_profiling/' + name
     processed_key = '/'.join(tokens)
     return processed_key
 
@@ -192,53 +634,695 @@ Note: This link will expire in 7 days.
     except:
         raise exceptions.EmailException
 
-  def _download_dataset(self, s3_key: str) -> str:
-    file_path = self.handler.download_file(s3_key)
+  def _download_dataset(self, s3_key: str, etag: str=None) -> str:
+    with self._stats.stage('download'):
+      file_path = self.handler.download_file(s3_key, etag)
+    self._stats.add_bytes('download', os.path.getsize(file_path))
     return file_path
 
-  def _profile_users(self, file: str) -> str:
+  def _profile_users(self, file: str, previous_file: str=None) -> str:
     print('Profiling started...')
     chunk_size = self._get_chunk_size(file)
-    df = pd.read_csv(file, chunksize=chunk_size, sep=self._DEFAULT_SEPARATOR)
-    processed_file = f'/tmp/{uuid1()}.csv'
-    include_header = True
+    print(f'Initial chunk size: {chunk_size} rows.')
+    processed_file = f'/tmp/{uuid1()}.{self._get_output_extension()}'
+    records = None
     try:
-      for chunk in df:
-        print('Processing chunk...')
-        processed_chunk = self._process_chunk(chunk)
-        headers = processed_chunk.columns.tolist() if include_header else False
-        print('Writing chunk...')
-        processed_chunk.to_csv(
-          path_or_buf=processed_file, sep=self._DEFAULT_SEPARATOR,
-          mode='a', header=headers, index=False
-        )
-        include_header = False
+      prefix_rows = self._find_profiled_prefix(file, previous_file) if previous_file else 0
+      if prefix_rows:
+        self._write_profiled_prefix(previous_file, processed_file, prefix_rows)
+      df = self._skip_rows(self._read_chunks(file), prefix_rows)
+      records = self._get_records(file, prefix_rows) if self._uses_records() else None
+      self._run_profiling(df, processed_file, records, header_written=prefix_rows > 0)
     except Exception as e:
+      self._discard_writers()
       if os.path.exists(processed_file):
         self.handler.delete_local_file(processed_file)  # Clean up
       raise e
+    finally:
+      if records is not None:
+        records.close()
     return processed_file
-      
+
+  def _profile_users_batch(self, files: List[str], failures: dict, keys: List[str]) -> dict:
+    """
+    Profiles the local datasets through combined chunks into one output file each.
+    The error of a dataset that cannot be read is stored in failures under its key in
+    keys; an error of the classifier fails the whole batch. Returns the output file of
+    each dataset, by index.
+    """
+    print('Batch profiling started...')
+    extension = self._get_output_extension()
+    processed_files = {index: f'/tmp/{uuid1()}.{extension}' for index in range(len(files))}
+    if not files:
+      return processed_files
+    chunk_size = self._get_chunk_size(*files)
+    print(f'Initial chunk size: {chunk_size} rows.')
+    input_columns = self._get_input_columns()
+    records = []
+    for index, file in enumerate(files):
+      try:
+        records.append(RecordReader(file, self._DEFAULT_SEPARATOR) if self._uses_records() else None)
+      except OSError as e:
+        failures[keys[index]] = e
+        records.append(None)
+    written = set()
+    self._reset_classifier_stats()
+    try:
+      for pieces in self._read_combined_chunks(files, failures, keys):
+        print(f'Processing chunk of {len(pieces)} datasets...')
+        features = pd.concat([piece[input_columns] for _, piece in pieces], ignore_index=True)
+        with self._measure_chunk(len(features), sum(self._get_frame_bytes(piece) for _, piece in pieces)):
+          outputs = self._predict_outputs(features)
+        offset = 0
+        for index, piece in pieces:
+          for column, values in outputs.items():
+            piece.loc[:, column] = values[offset:offset + len(piece)]
+          offset += len(piece)
+          self._records = records[index]
+          self._write_chunk(piece, processed_files[index], index not in written)
+          written.add(index)
+
+      for index in range(len(files)):
+        if index not in written and keys[index] not in failures:
+          failures[keys[index]] = ValueError('The dataset has no rows.')
+      for index, reader in enumerate(records):
+        if reader is not None and keys[index] not in failures and next(reader, None) is not None:
+          failures[keys[index]] = exceptions.RecordAlignmentException(
+            'The dataset has more records than parsed rows.'
+          )
+      self._close_writers()
+    except Exception as e:
+      self._close_writers()
+      self._delete_files([file for file in processed_files.values() if os.path.exists(file)])
+      raise e
+    finally:
+      self._records = None
+      for reader in records:
+        if reader is not None:
+          reader.close()
+    self._record_prediction_stats()
+    return {index: file for index, file in processed_files.items() if os.path.exists(file)}
+
+  def _read_combined_chunks(self, files: List[str], failures: dict,
+                            keys: List[str]) -> Iterable[List[Tuple[int, pd.DataFrame]]]:
+    """
+    Reads the datasets one after another into chunks of the size currently chosen by the
+    chunk sizer, each chunk being a list of (dataset index, rows of that dataset).
+    A dataset failing to parse is recorded in failures and its pending rows are dropped.
+    """
+    pieces = []
+    rows = 0
+    size = None
+    for index, file in enumerate(files):
+      if keys[index] in failures:
+        continue
+      stack = ExitStack()
+      reader = None
+      try:
+        source = stack.enter_context(self._open_input(file))
+        reader = pd.read_csv(source, iterator=True, **self._get_read_options())
+        while True:
+          size = size or self._chunk_sizer.next_size()
+          try:
+            with self._stats.stage('parse'):
+              piece = reader.get_chunk(size - rows)
+          except StopIteration:
+            break
+          if len(piece) == 0:
+            break
+          pieces.append((index, piece))
+          rows += len(piece)
+          if rows >= size:
+            yield pieces
+            pieces, rows, size = [], 0, None
+      except Exception as e:
+        failures[keys[index]] = e
+        pieces = [(i, piece) for i, piece in pieces if i != index]
+        rows = sum(len(piece) for _, piece in pieces)
+      finally:
+        if reader is not None:
+          reader.close()
+        stack.close()
+    if pieces:
+      yield pieces
+
+  def _profile_stream(self, s3_key: str, processed_file_key: str, previous_report_key: str=None,
+                      etag: str=None):
+    """
+    Streams the dataset (the content of etag when given) from S3 through the classifier and
+    uploads the processed chunks as they are produced, without staging either file on the local disk.
+    """
+    print('Profiling started...')
+    chunk_size = self._get_stream_chunk_size(s3_key, etag)
+    print(f'Initial chunk size: {chunk_size} rows.')
+    streams = []
+    records = None
+
+    def open_stream(key: str):
+      # Decompressed as it is read when the key is compressed
+      streams.append(self.handler.open_stream(key, etag if key == s3_key else None))
+      return compression.open_input(streams[-1], compression.get_compression(key))
+
+    try:
+      prefix_rows = 0
+      if previous_report_key is not None:
+        prefix_rows = self._find_profiled_prefix(open_stream(s3_key), open_stream(previous_report_key))
+      df = self._skip_rows(self._read_chunks(open_stream(s3_key)), prefix_rows)
+      if self._uses_records():
+        records = self._get_records(open_stream(s3_key), prefix_rows)
+      with self.handler.open_upload_stream(processed_file_key) as processed_stream:
+        try:
+          if prefix_rows:
+            self._write_profiled_prefix(open_stream(previous_report_key), processed_stream, prefix_rows)
+          self._run_profiling(df, processed_stream, records, header_written=prefix_rows > 0)
+        except Exception as e:
+          self._discard_writers()  # Before the upload is aborted
+          raise e
+    finally:
+      for stream in streams:
+        stream.close()
+    for stream in streams:
+      self._stats.add_time('download', stream.read_seconds)
+      self._stats.add_bytes('download', stream.bytes_read)
+    self._stats.add_time('upload', processed_stream.upload_seconds)
+    self._stats.add_bytes('upload', processed_stream.bytes_written)
+
+  def _run_profiling(self, chunks: Iterable[pd.DataFrame], output, records: RecordReader=None,
+                     header_written: bool=False):
+    """
+    Profiles the chunks into output, a local file path or a writable stream.
+    When the raw records of the dataset are given, the chunks only hold the classifier
+    input columns and the output is made of the raw records with the classes appended.
+    When the header was already written to output (with a profiled prefix), it is not repeated.
+    """
+    self._reset_classifier_stats()
+    self._records = records
+    self._header_written = header_written
+    try:
+      if self._workers > 1:
+        self._profile_chunks_parallel(chunks, output)
+      elif self._pipeline:
+        self._profile_chunks_pipelined(chunks, output)
+      else:
+        self._profile_chunks(chunks, output)
+      if records is not None and next(records, None) is not None:
+        raise exceptions.RecordAlignmentException('The dataset has more records than parsed rows.')
+    finally:
+      self._close_writers()
+      self._records = None
+      self._header_written = False
+    self._record_prediction_stats()
+
+  def _find_profiled_prefix(self, file, previous_file) -> int:
+    """
+    Objective: counts the leading rows of the dataset already classified in a previous report,
+    i.e. the rows equal to the rows of the report in every dataset column, as the report
+    records of these rows are copied untouched. Compared as text, so values the report wrote
+    differently from the dataset only shorten the prefix.
+
+    Inputs:
+        - file, PathLike or stream: the dataset
+        - previous_file, PathLike or stream: the previous report
+    Outputs:
+        - rows, int: the number of rows whose class can be taken from the report
+    """
+    output_columns = self._get_output_columns()
+    options = dict(sep=self._DEFAULT_SEPARATOR, dtype=str, keep_default_na=False,
+                   chunksize=self._PREFIX_CHUNK_ROWS)
+    rows = 0
+    with self._stats.stage('compare'), self._open_input(file) as source, \
+         self._open_input(previous_file) as previous_source:
+      readers = [pd.read_csv(source, **options), pd.read_csv(previous_source, **options)]
+      try:
+        for chunk, previous_chunk in zip(*readers):
+          if rows == 0 and list(previous_chunk.columns) != list(chunk.columns) + output_columns:
+            print('The columns of the previous report do not match the dataset, profiling from scratch.')
+            return 0
+          columns = list(chunk.columns)
+          length = min(len(chunk), len(previous_chunk))
+          matches = (
+            pd.util.hash_pandas_object(chunk[columns].iloc[:length], index=False).values ==
+            pd.util.hash_pandas_object(previous_chunk[columns].iloc[:length], index=False).values
+          )
+          if not matches.all():
+            return rows + int(matches.argmin())
+          rows += length
+          if len(chunk) != len(previous_chunk):
+            break
+      finally:
+        for reader in readers:
+          reader.close()
+    print(f'{rows} rows were already profiled in the previous report.')
+    return rows
+
+  def _write_profiled_prefix(self, previous_file, output, rows: int):
+    """Copies the header and the first rows records of the previous report to output, untouched."""
+    records = RecordReader(previous_file, self._DEFAULT_SEPARATOR)
+    try:
+      with self._stats.stage('write'):
+        lines = [next(records)]
+        for _ in range(rows):
+          lines.append(next(records))
+          if len(lines) >= self._PREFIX_CHUNK_ROWS:
+            self._write_text(output, ''.join(lines))
+            lines = []
+        self._write_text(output, ''.join(lines))
+    finally:
+      records.close()
+    self._stats.set_detail('reused_rows', rows)
+
+  def _skip_rows(self, chunks: Iterable[pd.DataFrame], rows: int) -> Iterable[pd.DataFrame]:
+    """Drops the first rows of the chunks, e.g. those of a profiled prefix."""
+    for chunk in chunks:
+      if rows >= len(chunk):
+        rows -= len(chunk)
+        continue
+      yield chunk.iloc[rows:] if rows else chunk
+      rows = 0
+
+  def _get_records(self, file, skipped_rows: int=0) -> RecordReader:
+    """Returns the raw records of the dataset, past the header and the skipped rows when rows are skipped."""
+    records = RecordReader(file, self._DEFAULT_SEPARATOR)
+    for _ in range(skipped_rows + 1 if skipped_rows else 0):
+      next(records)
+    return records
+
+  def _record_prediction_stats(self):
+    stats = {name: classifier.get_stats() for name, classifier in self._classifiers.items()}
+    for name, classifier_stats in stats.items():
+      if 'requests' in classifier_stats:
+        # Predicted by an inference server, see classifiers.inference_server
+        print(f'{name}: Predicted {classifier_stats["total_rows"]} rows in {classifier_stats["requests"]} requests to the inference server.')
+        continue
+      print(f'{name}: Inferred {classifier_stats.get("unique_rows")} unique users out of '
+            f'{classifier_stats.get("total_rows")} rows ({classifier_stats.get("cached_rows")} found in the prediction cache).')
+      if classifier_stats.get('lexicon_rows'):
+        tiers = classifier_stats['tiers']
+        print(f'{name}: {tiers["lexicon"]:.1%} of the rows resolved by the name lexicon, {tiers["model"]:.1%} by the model.')
+    first_stats = next(iter(stats.values()))
+    self._stats.add_rows(first_stats['total_rows'])
+    self._stats.add_time('tokenize', sum(s.get('tokenize_seconds', 0.0) for s in stats.values()))
+    self._stats.add_time('infer', sum(s.get('infer_seconds', 0.0) for s in stats.values()))
+    self._stats.set_detail('prediction', first_stats)
+    # Counters and timings of each classifier, e.g. stats['classifiers']['gender']['predict_seconds']
+    self._stats.set_detail('classifiers', stats)
+    self._stats.set_detail('chunks', self._chunk_sizer.get_stats() if self._chunk_sizer else {})
+
+  def get_job_stats(self) -> dict:
+    """Returns the measures of the last job: time per stage, rows, bytes moved, peak memory..."""
+    return self._stats.to_dict()
+
+  def _profile_chunks(self, chunks: Iterable[pd.DataFrame], processed_file):
+    include_header = True
+    for chunk in chunks:
+      print('Processing chunk...')
+      processed_chunk = self._process_chunk_measured(chunk)
+      print('Writing chunk...')
+      self._write_chunk(processed_chunk, processed_file, include_header)
+      include_header = False
+
+  def _profile_chunks_pipelined(self, chunks: Iterable[pd.DataFrame], processed_file):
+    """
+    Overlaps parsing, prediction and writing: a reader thread parses the next chunks
+    and a writer thread writes the previous ones while this thread runs the classifier.
+    Bounded queues keep at most a few chunks in memory and preserve the chunk order.
+    The first error raised by any stage stops the others and is re-raised here.
+    """
+    read_queue = queue.Queue(maxsize=self._PIPELINE_QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=self._PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    errors = []
+
+    def put(q: queue.Queue, item) -> bool:
+      while not stop.is_set():
+        try:
+          q.put(item, timeout=self._PIPELINE_POLL_INTERVAL)
+          return True
+        except queue.Full:
+          continue
+      return False
+
+    def get(q: queue.Queue):
+      while not stop.is_set():
+        try:
+          return q.get(timeout=self._PIPELINE_POLL_INTERVAL)
+        except queue.Empty:
+          continue
+      return _END_OF_CHUNKS
+
+    def fail(e: Exception):
+      errors.append(e)
+      stop.set()
+
+    def read():
+      try:
+        for chunk in chunks:
+          if not put(read_queue, chunk):
+            return
+        put(read_queue, _END_OF_CHUNKS)
+      except Exception as e:
+        fail(e)
+
+    def write():
+      try:
+        include_header = True
+        while True:
+          processed_chunk = get(write_queue)
+          if processed_chunk is _END_OF_CHUNKS:
+            return
+          print('Writing chunk...')
+          self._write_chunk(processed_chunk, processed_file, include_header)
+          include_header = False
+      except Exception as e:
+        fail(e)
+
+    reader = threading.Thread(target=read, name='profiler-reader', daemon=True)
+    writer = threading.Thread(target=write, name='profiler-writer', daemon=True)
+    reader.start()
+    writer.start()
+    try:
+      while True:
+        chunk = get(read_queue)
+        if chunk is _END_OF_CHUNKS:
+          break
+        print('Processing chunk...')
+        if not put(write_queue, self._process_chunk_measured(chunk)):
+          break
+      put(write_queue, _END_OF_CHUNKS)
+    except Exception as e:
+      fail(e)
+    finally:
+      reader.join()
+      writer.join()
+
+    if errors:
+      raise errors[0]
+
+  def _profile_chunks_parallel(self, chunks: Iterable[pd.DataFrame], processed_file):
+    """
+    Classifies chunks in a pool of worker processes, each holding its own model. Only the
+    classifier input columns are sent to the workers; results are written in input order
+    while at most two chunks per worker are in flight.
+    """
+    pool = self._get_pool()
+    input_columns = self._get_input_columns()
+    in_flight = deque()
+    include_header = True
+
+    def write_oldest():
+      chunk, future = in_flight.popleft()
+      with self._measure_chunk(len(chunk), self._get_frame_bytes(chunk)) as worker_measure:
+        outputs, stats, measure = future.result()
+        worker_measure.update(measure)
+      for name, classifier_stats in stats.items():
+        self._classifiers[name].merge_stats(classifier_stats)
+      for column, values in outputs.items():
+        chunk.loc[:, column] = values
+      print('Writing chunk...')
+      self._write_chunk(chunk, processed_file, include_header)
+
+    try:
+      for chunk in chunks:
+        print('Processing chunk...')
+        future = pool.submit(workers.predict_outputs, chunk[input_columns])
+        in_flight.append((chunk, future))
+        self._check_memory()
+        if len(in_flight) >= 2 * self._workers:
+          write_oldest()
+          include_header = False
+      while in_flight:
+        write_oldest()
+        include_header = False
+    except BrokenProcessPool:
+      self._pool = None  # A worker died, start a new pool for the next job
+      raise
+    finally:
+      for chunk, future in in_flight:
+        future.cancel()
+
+  def _write_chunk(self, processed_chunk: pd.DataFrame, processed_file, include_header: bool):
+    include_header = include_header and not self._header_written
+    with self._stats.stage('write'):
+      if self._records is not None:
+        self._write_records(processed_chunk, processed_file, include_header)
+        return
+      if self._output_format != 'csv':
+        self._get_writer(processed_file).write(processed_chunk)
+        return
+
+      headers = processed_chunk.columns.tolist() if include_header else False
+      processed_chunk.to_csv(
+        path_or_buf=self._get_csv_output(processed_file), sep=self._DEFAULT_SEPARATOR,
+        mode='a', header=headers, index=False
+      )
+
+  def _get_writer(self, processed_file) -> writers.ColumnarWriter:
+    """Returns the writer of the columnar output, opened with its first chunk and kept until the end of the job."""
+    if processed_file not in self._writers:
+      self._writers[processed_file] = writers.get_writer(self._output_format, processed_file)
+    return self._writers[processed_file]
+
+  def _get_csv_output(self, processed_file):
+    """Returns where the CSV text of the report is written: processed_file, or its compressor."""
+    output_compression = self._get_output_compression()
+    if output_compression is None:
+      return processed_file
+    if processed_file not in self._writers:
+      self._writers[processed_file] = compression.open_output(processed_file, output_compression)
+    return self._writers[processed_file]
+
+  def _write_text(self, processed_file, text: str):
+    output = self._get_csv_output(processed_file)
+    if isinstance(output, str):
+      with open(output, 'a', newline='', encoding='utf-8') as f:
+        f.write(text)
+    else:
+      output.write(text)
+
+  def _close_writers(self):
+    with self._stats.stage('write'):
+      try:
+        for writer in self._writers.values():
+          writer.close()
+      finally:
+        self._writers = {}
+
+  def _discard_writers(self):
+    """Closes the writers left open by a failed job, whose output is deleted."""
+    for writer in self._writers.values():
+      try:
+        writer.close()
+      except Exception as e:
+        print(f'Failed to close a writer of the discarded output: {e!r}')
+    self._writers = {}
+
+  def _write_records(self, processed_chunk: pd.DataFrame, processed_file, include_header: bool):
+    """Writes the raw records matching the chunk rows, with their classes (and other output columns) appended."""
+    output_columns = self._get_output_columns()
+    lines = []
+    if include_header:
+      lines.append(append_column(next(self._records), self._DEFAULT_SEPARATOR.join(output_columns), self._DEFAULT_SEPARATOR))
+    values = processed_chunk[output_columns[0]].astype(str)
+    for column in output_columns[1:]:
+      values = values + self._DEFAULT_SEPARATOR + processed_chunk[column].astype(str)
+    for value in values.values:
+      record = next(self._records, None)
+      if record is None:
+        raise exceptions.RecordAlignmentException('The dataset has less records than parsed rows.')
+      lines.append(append_column(record, value, self._DEFAULT_SEPARATOR))
+
+    self._write_text(processed_file, ''.join(lines))
+
   def _process_chunk(self, df: pd.DataFrame):
+    if self._max_rss_bytes:
+      # Memory-bounded mode: the predictions are added to the chunk itself
+      return self._predict(df)
     df_copy = df.copy(deep=True)
-    df_copy = self._gender_classifier.predict(df_copy)
+    df_copy = self._predict(df_copy)
     return df_copy
   
-  def _get_chunk_size(self, file) -> int:
-    '''Returns number of rows per chunk'''
-    total_sample_rows = 10
-    df = pd.read_csv(file, nrows=total_sample_rows, sep=self._DEFAULT_SEPARATOR)
-    rows, cols = df.shape
-    if rows < total_sample_rows:
-      return rows if rows > 0 else 1
-
-    bytes_in_sample = df.memory_usage(deep=True).sum()
-    bytes_per_row = math.ceil(bytes_in_sample / rows)
-    rows_per_chunk = math.ceil(self._CHUNK_SIZE_IN_BYTES / bytes_per_row)
-    return rows_per_chunk
+  def _process_chunk_measured(self, chunk: pd.DataFrame) -> pd.DataFrame:
+    """Processes the chunk and reports its time and memory to the chunk sizer."""
+    with self._measure_chunk(len(chunk), self._get_frame_bytes(chunk)):
+      if self._records is not None:
+        # The chunk only holds the parsed input columns, no need to copy it
+        processed_chunk = self._predict(chunk)
+      else:
+        processed_chunk = self._process_chunk(chunk)
+    return processed_chunk
+
+  @contextmanager
+  def _measure_chunk(self, rows: int, frame_bytes: int=0):
+    """
+    Reports the time and memory taken to process a chunk of rows to the chunk sizer: the
+    growth of the resident memory sampled around the chunk, and frame_bytes, the measured
+    memory of the parsed chunk. A chunk processed by a worker process is measured there:
+    its seconds and memory_bytes are added to the dict yielded.
+    """
+    job_rss_before = self._check_memory()
+    rss_before = resources.current_rss()
+    started = time.perf_counter()
+    worker_measure = {}
+    yield worker_measure
+    seconds = worker_measure.get('seconds', time.perf_counter() - started)
+    rss = resources.current_rss()
+    self._stats.sample_rss(rss)
+    memory_bytes = max(rss - rss_before, 0) + worker_measure.get('memory_bytes', 0)
+    if self._chunk_sizer is not None:
+      self._chunk_sizer.update(rows, seconds, memory_bytes, frame_bytes)
+    self._check_memory(job_rss_before)
+
+  def _get_frame_bytes(self, chunk: pd.DataFrame) -> int:
+    """Returns the pandas memory of the chunk, strings included."""
+    return int(chunk.memory_usage(deep=True, index=False).sum())
+
+  def _check_memory(self, rss_before: int=None) -> int:
+    """
+    Objective: in the memory-bounded mode, fails before the job runs out of memory and
+    shrinks the next chunks when the memory grows close to the ceiling
+
+    Inputs:
+        - rss_before, int: the resident memory before the chunk, the chunks are only shrunk if it grew since
+    Outputs:
+        - rss, int: the resident memory of the job (the process and its workers) in the
+          memory-bounded mode, of the process otherwise, in bytes
+    """
+    if not self._max_rss_bytes:
+      return resources.current_rss()
+    rss = self._get_job_rss()
+    sizes = self._chunk_sizer.sizes if self._chunk_sizer is not None else []
+    if rss > self._max_rss_bytes:
+      raise exceptions.MemoryLimitExceededException(
+        f'{rss} bytes resident (with the workers), over the ceiling of {self._max_rss_bytes} bytes '
+        f'(last chunk of {sizes[-1] if sizes else None} rows). '
+        'Raise PROFILER_MAX_RSS_BYTES or lower PROFILER_CHUNK_SIZE_IN_BYTES.'
+      )
+    grew = rss_before is None or rss > rss_before
+    if rss > self._max_rss_bytes * self._RSS_PRESSURE_RATIO and grew and self._chunk_sizer is not None:
+      if self._chunk_sizer.shrink():
+        print(f'Memory pressure: {rss} bytes resident, the next chunks are shrunk to {self._chunk_sizer.get_stats()["max_size"]} rows.')
+    return rss
+
+  def _get_job_rss(self) -> int:
+    """Returns the resident memory of the process and, with PROFILER_WORKERS, of its worker processes."""
+    rss = resources.current_rss()
+    if self._workers > 1:
+      # The workers hold their own model and the chunks sent to them
+      rss += resources.children_rss()
+    return rss
+
+  def _get_memory_budget(self) -> int:
+    """Returns the memory each chunk held at once may take under the ceiling, given what the job holds already."""
+    rss = self._get_job_rss()
+    headroom = self._max_rss_bytes * self._RSS_PRESSURE_RATIO - rss
+    if headroom <= 0:
+      raise exceptions.MemoryLimitExceededException(
+        f'{rss} bytes resident before profiling, over {self._RSS_PRESSURE_RATIO:.0%} of the ceiling '
+        f'of {self._max_rss_bytes} bytes. Raise PROFILER_MAX_RSS_BYTES.'
+      )
+    return int(headroom / self._get_chunks_in_memory())
+
+  def _get_chunks_in_memory(self) -> int:
+    """Returns the number of chunks the profiling mode holds at once."""
+    if self._workers > 1:
+      return 2 * self._workers + 1  # In flight, and the one being parsed
+    if self._pipeline:
+      return 2 * self._PIPELINE_QUEUE_SIZE + 3  # Queued, and the ones being parsed, classified and written
+    return 1
+
+  def _get_stream_chunk_size(self, s3_key: str, etag: str=None) -> int:
+    '''Returns number of rows of the first chunk of a streamed dataset, sized from its head'''
+    head = self.handler.read_head(s3_key, self._STREAM_SAMPLE_SIZE_IN_BYTES, etag)
+    complete = len(head) < self._STREAM_SAMPLE_SIZE_IN_BYTES  # The dataset ends within its head
+    sample = compression.decompress_head(head, compression.get_compression(s3_key))
+    if not complete:
+      # The head may end inside a record, even inside a quoted field
+      sample = drop_last_record(sample, self._DEFAULT_SEPARATOR)
+    return self._get_chunk_size(io.BytesIO(sample), complete=complete)
+
+  def _get_chunk_size(self, *files, complete: bool=True) -> int:
+    '''
+    Returns number of rows of the first chunk, and sets up the chunk sizer of the datasets.
+    complete is False when the files are only the first records of the datasets.
+    '''
+    if self._workers > 1:
+      self._get_pool()  # The memory budget counts the classifiers loaded by the workers
+    target_bytes = self._chunk_size_in_bytes
+    copy_factor = None
+    if self._max_rss_bytes:
+      target_bytes = min(target_bytes, self._get_memory_budget())
+      copy_factor = 1  # The chunks are not copied
+    self._chunk_sizer = ChunkSizer(
+      target_bytes,
+      batch_size=max(classifier.get_batch_size() for classifier in self._classifiers.values()),
+      tensor_bytes_per_row=sum(classifier.get_input_bytes_per_row() for classifier in self._classifiers.values()),
+      target_seconds=self._target_chunk_seconds,
+      separator=self._DEFAULT_SEPARATOR,
+      copy_factor=copy_factor,
+    )
+    return self._chunk_sizer.estimate(*files, complete=complete)
+
+  def _get_read_options(self) -> dict:
+    options = {'sep': self._DEFAULT_SEPARATOR}
+    if self._uses_records():
+      # In passthrough mode only the classifier input columns are parsed
+      options['usecols'] = self._get_input_columns()
+    if self._output_format != 'csv':
+      # Columnar reports need the same column types in every chunk
+      options['dtype'] = str
+    if self._max_rss_bytes:
+      # Memory-bounded mode: no type inference over the whole chunk, compact strings
+      options['dtype'] = self._get_string_dtype()
+    return options
+
+  @classmethod
+  def _get_string_dtype(cls):
+    """
+    Returns the string dtype backed by Arrow arrays, which needs pandas 1.3 or later and
+    pyarrow. Older versions (e.g. the pandas 1.0 of requirements.txt) parse str objects instead.
+    """
+    if cls._string_dtype is None:
+      try:
+        cls._string_dtype = pd.StringDtype('pyarrow')
+      except (TypeError, ImportError):
+        print(f'Arrow strings need pandas 1.3 or later and pyarrow (pandas {pd.__version__}), parsing str objects.')
+        cls._string_dtype = str
+    return cls._string_dtype
+
+  @contextmanager
+  def _open_input(self, file):
+    """Opens a local dataset decompressing it as it is read, when its extension shows it is compressed."""
+    source = compression.open_input(file)
+    try:
+      yield source
+    finally:
+      if source is not file:
+        source.close()
+
+  def _read_chunks(self, file) -> Iterable[pd.DataFrame]:
+    """Reads the dataset in chunks of the size currently chosen by the chunk sizer."""
+    with self._open_input(file) as source:
+      yield from self._read_source_chunks(source)
+
+  def _read_source_chunks(self, source) -> Iterable[pd.DataFrame]:
+    reader = pd.read_csv(source, iterator=True, **self._get_read_options())
+    try:
+      while True:
+        try:
+          with self._stats.stage('parse'):
+            chunk = reader.get_chunk(self._chunk_sizer.next_size())
+        except StopIteration:
+          return
+        if len(chunk) == 0:
+          return
+        yield chunk
+    finally:
+      reader.close()
 
   def _upload_processed_dataset(self, s3_key: str, file: str):
-    self.handler.upload_file(s3_key, file)
+    with self._stats.stage('upload'):
+      self.handler.upload_file(s3_key, file)
+    self._stats.add_bytes('upload', os.path.getsize(file))
 
   def _delete_files(self, files: List[PathLike]):
     for file in files:
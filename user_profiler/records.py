@@ -0,0 +1,85 @@
+import io
+import csv
+import sys
+from typing import Iterator
+
+from .compression import get_compression, open_input
+
+
+csv.field_size_limit(min(sys.maxsize, 2147483647))  # Tweets' text can exceed the default 128 KB
+
+
+class _ReadableStream(io.RawIOBase):
+  """Adapts an object with only a read method (e.g. an S3 body) to the io interface."""
+
+  def __init__(self, stream):
+    self._stream = stream
+
+  def readable(self) -> bool:
+    return True
+
+  def readinto(self, buffer) -> int:
+    data = self._stream.read(len(buffer))
+    buffer[:len(data)] = data
+    return len(data)
+
+
+class RecordReader:
+  """
+  Iterates the raw text of the records of a CSV file, untouched, so they can be written
+  back with extra columns without parsing and re-serializing their fields.
+
+  Record boundaries follow the CSV quoting rules (a record may span several lines when a
+  quoted field holds line breaks) and blank lines are skipped, like pandas does. A path to
+  a compressed file (.csv.gz, .csv.bz2, .csv.zst) is decompressed as it is read.
+  """
+
+  def __init__(self, file, separator: str=',', encoding: str='utf-8'):
+    if isinstance(file, str) and get_compression(file) is None:
+      self._file = open(file, 'r', newline='', encoding=encoding)
+    elif isinstance(file, str):
+      self._file = io.TextIOWrapper(open_input(file), encoding=encoding, newline='')
+    else:
+      self._file = io.TextIOWrapper(
+        io.BufferedReader(_ReadableStream(file)), encoding=encoding, newline=''
+      )
+    self._lines = []
+    self._rows = csv.reader(self._read_lines(), delimiter=separator)
+
+  def _read_lines(self) -> Iterator[str]:
+    for line in self._file:
+      self._lines.append(line)
+      yield line
+
+  def __iter__(self):
+    return self
+
+  def __next__(self) -> str:
+    while True:
+      row = next(self._rows)
+      record = ''.join(self._lines)
+      self._lines = []
+      if row:
+        return record
+
+  def close(self):
+    self._file.close()
+
+
+def append_column(record: str, value: str, separator: str) -> str:
+  """Appends a field to the raw text of a record, keeping its line ending."""
+  if record.endswith('\r\n'):
+    return record[:-2] + separator + value + '\r\n'
+  if record.endswith('\n') or record.endswith('\r'):
+    return record[:-1] + separator + value + record[-1]
+  return record + separator + value + '\n'
+
+
+def drop_last_record(head: bytes, separator: str=',', encoding: str='utf-8') -> bytes:
+  """
+  Returns the first bytes of a CSV file (e.g. a sample of it) without their last record,
+  which may be cut, possibly inside a quoted field.
+  """
+  head = head[:head.rfind(b'\n') + 1]  # No multi-byte character is cut past a line break
+  records = list(RecordReader(io.BytesIO(head), separator, encoding))
+  return ''.join(records[:-1]).encode(encoding)
@@ -0,0 +1,68 @@
+"""
+Memory measures of the current process and its children, from the standard library only.
+"""
+import os
+import sys
+import resource
+
+
+def peak_rss() -> int:
+  """Returns the peak resident set size of this process, in bytes."""
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+  return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss() -> int:
+  """Returns the current resident set size of this process, in bytes."""
+  try:
+    with open('/proc/self/statm') as f:
+      resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+  except (OSError, ValueError, IndexError):
+    return peak_rss()
+
+
+def children_rss() -> int:
+  """
+  Returns the resident set size of the child processes of this process (e.g. the workers
+  of PROFILER_WORKERS) in bytes, 0 where /proc is not available.
+  """
+  parent = os.getpid()
+  total = 0
+  try:
+    pids = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+  except OSError:
+    return 0
+  for pid in pids:
+    try:
+      with open(f'/proc/{pid}/stat') as f:
+        stat = f.read()
+      # The fields after the command name, which may hold spaces and parentheses
+      if int(stat[stat.rindex(')') + 2:].split()[1]) != parent:
+        continue
+      with open(f'/proc/{pid}/statm') as f:
+        total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+      continue  # e.g. the process exited meanwhile
+  return total
+
+
+def memory_usage() -> dict:
+  """
+  Returns the resident memory of this process in bytes: rss counts the pages it shares
+  with other processes (e.g. files mapped by all the Celery children) in full, pss
+  counts a share of them, and uss only its private pages. pss and uss are None when
+  /proc/self/smaps_rollup is not available (Linux before 4.14, macOS).
+  """
+  usage = {'rss': current_rss(), 'pss': None, 'uss': None}
+  try:
+    with open('/proc/self/smaps_rollup') as f:
+      fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+  except OSError:
+    return usage
+  kilobytes = {name: int(value.split()[0]) for name, value in fields.items() if value.strip().endswith('kB')}
+  usage['rss'] = kilobytes.get('Rss', 0) * 1024
+  usage['pss'] = kilobytes.get('Pss', 0) * 1024
+  usage['uss'] = (kilobytes.get('Private_Clean', 0) + kilobytes.get('Private_Dirty', 0)) * 1024
+  return usage
@@ -0,0 +1,116 @@
+import os
+from unittest import TestCase
+
+from user_profiler.chunk_sizer import ChunkSizer
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+BATCH_SIZE = 32
+
+
+class SmallSampleChunkSizer(ChunkSizer):
+  _SAMPLE_ROWS = 50
+
+
+def get_sizer(target_bytes=1048576, target_seconds=None):
+  sizer = SmallSampleChunkSizer(
+    target_bytes, batch_size=BATCH_SIZE, tensor_bytes_per_row=900,
+    target_seconds=target_seconds, separator=';'
+  )
+  sizer.estimate(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'))
+  return sizer
+
+
+class TestEstimate(TestCase):
+  def test_aligned_to_batch_size(self):
+    size = get_sizer().next_size()
+    self.assertIsInstance(size, int)
+    self.assertEqual(size % BATCH_SIZE, 0)
+
+  def test_accounts_for_tensors(self):
+    sizer = SmallSampleChunkSizer(1048576, batch_size=1, tensor_bytes_per_row=0, separator=';')
+    size_without_tensors = sizer.estimate(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'))
+    self.assertGreater(size_without_tensors, get_sizer().next_size())
+
+  def test_minimum_one_batch(self):
+    self.assertEqual(get_sizer(target_bytes=1).next_size(), BATCH_SIZE)
+
+  def test_whole_small_dataset(self):
+    sizer = ChunkSizer(1048576, batch_size=BATCH_SIZE, separator=';')
+    size = sizer.estimate(os.path.join(TEST_DATA_DIRECTORY, 'single_row.csv'))
+    self.assertEqual(size, 1)
+
+
+  def test_head_of_dataset(self):
+    # Fewer rows than sampled, but only the head of a longer dataset
+    sizer = ChunkSizer(1048576, batch_size=BATCH_SIZE, separator=';')
+    size = sizer.estimate(os.path.join(TEST_DATA_DIRECTORY, 'single_row.csv'), complete=False)
+    self.assertEqual(size % BATCH_SIZE, 0)
+    self.assertIsNotNone(sizer.get_stats()['estimated_bytes_per_row'])
+    sizer.update(sizer.next_size(), 0.1, frame_bytes=size * 100000)
+    self.assertLess(sizer.next_size(), size)
+
+
+class TestUpdate(TestCase):
+  def test_shrinks_on_memory_pressure(self):
+    sizer = get_sizer()
+    size = sizer.next_size()
+    sizer.update(size, 1.0, memory_bytes=10 * 1048576)
+    new_size = sizer.next_size()
+    self.assertLess(new_size, size)
+    self.assertGreaterEqual(new_size, size // 2)
+
+  def test_shrinks_on_slow_chunks(self):
+    sizer = get_sizer(target_seconds=1)
+    size = sizer.next_size()
+    sizer.update(size, 1.5)
+    self.assertLess(sizer.next_size(), size)
+
+  def test_stays_within_memory_estimate(self):
+    sizer = get_sizer(target_seconds=60)
+    size = sizer.next_size()
+    sizer.update(size, 0.1)
+    self.assertEqual(sizer.next_size(), size)
+
+  def test_measured_frame(self):
+    sizer = get_sizer()
+    size = sizer.next_size()
+    sizer.update(size, 0.1, frame_bytes=10 * 1048576)
+    self.assertLess(sizer.next_size(), size)
+
+  def test_follows_shorter_rows(self):
+    sizer = get_sizer(target_bytes=32 * 1048576)
+    size = sizer.next_size()
+    sizer.update(size, 0.1, frame_bytes=size * 20000)
+    shrunk = sizer.next_size()
+    self.assertLess(shrunk, size)
+    # Once the rows get short again the measured memory decays and the chunks grow back
+    for _ in range(10):
+      sizer.update(sizer.next_size(), 0.1, frame_bytes=sizer.sizes[-1] * 100)
+    self.assertGreater(sizer.next_size(), shrunk)
+    self.assertLess(sizer.get_stats()['measured_bytes_per_row'], 20000)
+
+  def test_stats(self):
+    sizer = get_sizer()
+    sizer.next_size()
+    sizer.next_size()
+    stats = sizer.get_stats()
+    self.assertEqual(len(stats['chunk_sizes']), 2)
+    self.assertIsNotNone(stats['estimated_bytes_per_row'])
+
+
+class TestShrink(TestCase):
+  def test_never_grows_back(self):
+    sizer = get_sizer(target_bytes=8 * 1048576)
+    size = sizer.next_size()
+    self.assertTrue(sizer.shrink())
+    shrunk = sizer.next_size()
+    self.assertLessEqual(shrunk, size // 2)
+    self.assertEqual(shrunk % BATCH_SIZE, 0)
+    sizer.update(shrunk, 0.1)
+    self.assertEqual(sizer.next_size(), shrunk)
+
+  def test_one_batch(self):
+    sizer = get_sizer(target_bytes=1)
+    self.assertFalse(sizer.shrink())
+    self.assertEqual(sizer.next_size(), BATCH_SIZE)
@@ -0,0 +1,99 @@
+import io
+import os
+import bz2
+import gzip
+import shutil
+import tempfile
+import importlib.util
+from unittest import TestCase, skipIf
+
+from user_profiler import compression
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+HAS_ZSTANDARD = importlib.util.find_spec('zstandard') is not None  # zstd is optional
+
+
+class TestGetCompression(TestCase):
+  def test_extensions(self):
+    self.assertEqual(compression.get_compression('tests/dataset.csv.gz'), 'gzip')
+    self.assertEqual(compression.get_compression('tests/dataset.csv.bz2'), 'bz2')
+    self.assertEqual(compression.get_compression('tests/dataset.csv.zst'), 'zstd')
+    self.assertIsNone(compression.get_compression('tests/dataset.csv'))
+    self.assertIsNone(compression.get_compression('tests.gz/dataset'))
+
+  def test_strip_extension(self):
+    self.assertEqual(compression.strip_extension('tests/dataset.csv.gz'), 'tests/dataset.csv')
+    self.assertEqual(compression.strip_extension('tests/dataset.csv'), 'tests/dataset.csv')
+
+  def test_unknown_compression(self):
+    with self.assertRaises(ValueError):
+      compression.get_extension('lzma')
+
+
+class TestCompression(TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), 'rb') as f:
+      self.content = f.read()
+    self.compressions = ['gzip', 'bz2'] + (['zstd'] if HAS_ZSTANDARD else [])
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def _compress(self, data: bytes, name: str) -> bytes:
+    if name == 'gzip':
+      return gzip.compress(data)
+    if name == 'bz2':
+      return bz2.compress(data)
+    import zstandard
+    return zstandard.ZstdCompressor().compress(data)
+
+  def test_open_path(self):
+    for name in self.compressions:
+      path = os.path.join(self.directory, 'dataset.csv.' + compression.get_extension(name))
+      with open(path, 'wb') as f:
+        f.write(self._compress(self.content, name))
+      with compression.open_input(path) as f:
+        self.assertEqual(f.read(), self.content, name)
+
+  def test_open_stream(self):
+    for name in self.compressions:
+      stream = io.BytesIO(self._compress(self.content, name))
+      f = compression.open_input(stream, name)
+      self.assertEqual(f.read(), self.content, name)
+      f.close()
+
+  def test_uncompressed(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.assertIs(compression.open_input(path), path)
+
+  def test_decompress_head(self):
+    for name in self.compressions:
+      compressed = self._compress(self.content, name)
+      # gzip decompresses as it goes, bz2 and zstd whole blocks only (of up to 900 and 128 kB of data)
+      head = compressed[:2048] if name == 'gzip' else compressed[:-8]
+      data = compression.decompress_head(head, name)
+      self.assertGreater(len(data), 0, name)
+      self.assertTrue(self.content.startswith(data), name)
+
+  def test_open_output(self):
+    text = self.content.decode('utf-8')
+    for name in self.compressions:
+      path = os.path.join(self.directory, 'report.csv.' + compression.get_extension(name))
+      f = compression.open_output(path, name)
+      f.write(text[:100])
+      f.write(text[100:])
+      f.close()
+      with compression.open_input(path) as f:
+        self.assertEqual(f.read(), self.content, name)
+
+  def test_open_output_stream(self):
+    for name in self.compressions:
+      stream = io.BytesIO()
+      f = compression.open_output(stream, name)
+      f.write(self.content.decode('utf-8'))
+      f.close()
+      self.assertFalse(stream.closed, name)  # Left open for the upload to complete
+      stream.seek(0)
+      self.assertEqual(compression.open_input(stream, name).read(), self.content, name)
@@ -0,0 +1,95 @@
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+
+from user_profiler.instrumentation import JobStats, Metrics
+
+
+class TestJobStats(TestCase):
+  def test_stages(self):
+    stats = JobStats()
+    with stats.stage('parse'):
+      pass
+    stats.add_time('parse', 1.0)
+    stats.add_time('infer', 2.0)
+    summary = stats.to_dict()
+    self.assertGreaterEqual(summary['stage_seconds']['parse'], 1.0)
+    self.assertEqual(summary['stage_seconds']['infer'], 2.0)
+
+  def test_counters(self):
+    stats = JobStats()
+    stats.add_rows(10)
+    stats.add_rows(5)
+    stats.add_bytes('download', 100)
+    stats.set_detail('chunks', {'chunk_sizes': [10, 5]})
+    summary = stats.to_dict()
+    self.assertEqual(summary['rows'], 15)
+    self.assertGreater(summary['rows_per_second'], 0)
+    self.assertEqual(summary['bytes'], {'download': 100})
+    self.assertEqual(summary['chunks'], {'chunk_sizes': [10, 5]})
+    self.assertGreater(summary['peak_rss_bytes'], 0)
+
+  def test_peak_rss_sampled(self):
+    stats = JobStats()
+    stats.sample_rss(1 << 50)
+    self.assertEqual(stats.to_dict()['peak_rss_bytes'], 1 << 50)
+    self.assertLess(JobStats().to_dict()['peak_rss_bytes'], 1 << 50)
+
+  def test_json(self):
+    stats = JobStats()
+    stats.add_rows(1)
+    self.assertEqual(json.loads(stats.to_json())['rows'], 1)
+
+
+class TestMetrics(TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def get_summary(self):
+    stats = JobStats()
+    stats.add_rows(10)
+    stats.add_time('infer', 2.0)
+    stats.add_bytes('upload', 50)
+    return stats.to_dict()
+
+  def test_prometheus(self):
+    metrics = Metrics()
+    metrics.record(self.get_summary())
+    metrics.record(self.get_summary())
+    metrics.record(succeeded=False)
+    text = metrics.to_prometheus()
+    pid = os.getpid()
+    self.assertIn(f'user_profiler_jobs_total{{pid="{pid}",status="succeeded"}} 2', text)
+    self.assertIn(f'user_profiler_jobs_total{{pid="{pid}",status="failed"}} 1', text)
+    self.assertIn(f'user_profiler_rows_total{{pid="{pid}"}} 20', text)
+    self.assertIn(f'user_profiler_stage_seconds_total{{pid="{pid}",stage="infer"}} 4.000000', text)
+    self.assertIn(f'user_profiler_bytes_total{{pid="{pid}",transfer="upload"}} 100', text)
+
+  def test_last_job_peak_rss(self):
+    metrics = Metrics()
+    first, second = self.get_summary(), self.get_summary()
+    first['peak_rss_bytes'], second['peak_rss_bytes'] = 200, 100
+    metrics.record(first)
+    metrics.record(second)
+    self.assertIn(f'user_profiler_last_job_peak_rss_bytes{{pid="{os.getpid()}"}} 100', metrics.to_prometheus())
+
+  def test_write_textfile(self):
+    metrics = Metrics()
+    metrics.record(self.get_summary())
+    metrics.write_textfile(self.directory)
+    path = os.path.join(self.directory, f'user_profiler_{os.getpid()}.prom')
+    with open(path) as f:
+      self.assertEqual(f.read(), metrics.to_prometheus())
+
+  def test_remove_textfile(self):
+    metrics = Metrics()
+    metrics.record(self.get_summary())
+    metrics.write_textfile(self.directory)
+    metrics.remove_textfile(self.directory)
+    self.assertEqual(os.listdir(self.directory), [])
+    metrics.remove_textfile(self.directory)  # Already removed
@@ -1,14 +1,19 @@
 import os
+import gzip
+import asyncio
+import importlib.util
 import shutil
 import pandas as pd
 import numpy as np
-from unittest import TestCase
+from unittest import TestCase, skipIf, mock
 from datetime import datetime, timedelta
 
 import settings
 from classifiers.gender_classifier import GenderClassifier
+from classifiers import registry
 from user_profiler.profiler import UserProfiler
 from user_profiler import exceptions
+from user_profiler import resources
 from storage_handler.handler import Handler
 from storage_handler import exceptions as storage_exceptions
 from s3_wrapper import exceptions as s3_exceptions
@@ -18,6 +23,10 @@ from s3_wrapper import S3Utils
 TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
 S3_BASE_DIRECTORY = 'tests'
 
+
+class BotClassifier(GenderClassifier):
+  _TAG = 'bot'  # The gender model under another class column, as a second classifier
+
 s3 = S3Utils()
 
 
@@ -31,12 +40,11 @@ class TestMethodsExistence(TestCase):
     self.assertTrue(hasattr(self.profiler, '_get_SES_client'))
     self.assertTrue(hasattr(self.profiler, '_get_gender_classifier'))
     self.assertTrue(hasattr(self.profiler, 'profile'))
-    self.assertTrue(hasattr(self.profiler, '_validate'))
-    self.assertTrue(hasattr(self.profiler, '_validate_key'))
+    self.assertTrue(hasattr(self.profiler, '_validate_async'))
+    self.assertTrue(hasattr(self.profiler, '_validate_key_format'))
     self.assertTrue(hasattr(self.profiler, '_validate_date_range'))
     self.assertTrue(hasattr(self.profiler, '_validate_date_format'))
     self.assertTrue(hasattr(self.profiler, '_validate_email'))
-    self.assertTrue(hasattr(self.profiler, '_check_report_exists'))
     self.assertTrue(hasattr(self.profiler, '_generate_processed_file_key'))
     self.assertTrue(hasattr(self.profiler, '_download_dataset'))
     self.assertTrue(hasattr(self.profiler, '_get_chunk_size'))
@@ -46,6 +54,8 @@ class TestMethodsExistence(TestCase):
     self.assertTrue(hasattr(self.profiler, '_delete_files'))
     self.assertTrue(hasattr(self.profiler, '_get_presigned_url'))
     self.assertTrue(hasattr(self.profiler, '_send_email'))  # TODO
+    self.assertTrue(hasattr(self.profiler, 'get_job_stats'))
+    self.assertTrue(hasattr(self.profiler, 'profile_batch'))
 
 
 class TestSetHandler(TestCase):
@@ -75,25 +85,29 @@ class TestSetup(TestCase):
 
     self.assertIsNotNone(getattr(profiler, '_ses', None))
 
-class TestValidateKey(TestCase):
+class TestValidateAsync(TestCase):
   def setUp(self):
     handler = Handler()
     self.profiler = UserProfiler(handler)
-  
-  def test_valid_key(self):
-    file_path = f'{S3_BASE_DIRECTORY}/validate_key.csv'
-    result = self.profiler._validate_key(file_path)
-    self.assertEqual(result, None)
 
-  def test_invalid_extension(self):
-    file_path = 'invalid.doc'
-    with self.assertRaises(exceptions.BadExtensionException):
-      self.profiler._validate_key(file_path)
-  
+  def test_etag(self):
+    key = f'{S3_BASE_DIRECTORY}/test_profile_method.csv'
+    etag, manifest = asyncio.run(self.profiler._validate_async(key, 'labs@citibeats.net'))
+    self.assertEqual(etag, self.profiler.handler.get_etag(key))
+
   def test_file_not_found(self):
-    file_path = f'{S3_BASE_DIRECTORY}/non_existing_key.csv'
+    key = f'{S3_BASE_DIRECTORY}/non_existing_dataset.csv'
     with self.assertRaises(FileNotFoundError):
-      result = self.profiler._validate_key(file_path)
+      asyncio.run(self.profiler._validate_async(key, 'labs@citibeats.net'))
+
+  def test_invalid_extension(self):
+    with self.assertRaises(exceptions.BadExtensionException):
+      asyncio.run(self.profiler._validate_async('dataset.txt', 'labs@citibeats.net'))
+
+  def test_invalid_email(self):
+    key = f'{S3_BASE_DIRECTORY}/validate_key.csv'
+    with self.assertRaises(exceptions.InvalidEmailException):
+      asyncio.run(self.profiler._validate_async(key, 'hello.com'))
 
 
 class TestValidateDateRange(TestCase):
@@ -140,29 +154,6 @@ class TestValidateEmail(TestCase):
       self.profiler._validate_email(email)
 
 
-class TestValidate(TestCase):
-  def setUp(self):
-    handler = Handler()
-    self.profiler = UserProfiler(handler)
-  
-  def test_valid_input(self):
-    key = f'{S3_BASE_DIRECTORY}/validate_key.csv'
-    email = 'hello@citibeats.com'
-    self.profiler._validate(key, email)
-
-  def test_invalid_extension(self):
-    key = 'test.doc'
-    email = 'hello@citibeats.com'
-    with self.assertRaises(exceptions.BadExtensionException):
-      self.profiler._validate(key, email)
-
-  def test_invalid_email(self):
-    key = f'{S3_BASE_DIRECTORY}/validate_key.csv'
-    email = 'hello.com'
-    with self.assertRaises(exceptions.InvalidEmailException):
-      self.profiler._validate(key, email)
-
-
 class TestGetGenderClassifier(TestCase):
   def setUp(self):
     self.profiler = UserProfiler()
@@ -171,24 +162,6 @@ class TestGetGenderClassifier(TestCase):
     classifier = self.profiler._get_gender_classifier()
     self.assertIsInstance(classifier, GenderClassifier)
 
-class TestCheckReportExists(TestCase):
-  def setUp(self):
-    handler = Handler()
-    self.profiler = UserProfiler(handler)
-
-  def test_existing_key(self):
-    file_path = f'{S3_BASE_DIRECTORY}/report_exists.csv'
-    exists = self.profiler._check_report_exists(file_path)
-    self.assertIsInstance(exists, bool)
-    self.assertTrue(exists)
-  
-  def test_invalid_key(self):
-    file_path = 'invalid_file.csv'
-    exists = self.profiler._check_report_exists(file_path)
-    self.assertIsInstance(exists, bool)
-    self.assertFalse(exists)
-
-
 class TestGenerateProcessedFileKey(TestCase):
   def setUp(self):
     self.profiler = UserProfiler()
@@ -200,6 +173,30 @@ class TestGenerateProcessedFileKey(TestCase):
     self.assertIsInstance(processed_file_key, str)
     self.assertEqual(processed_file_key, expected_file_path)
   
+  def test_output_format(self):
+    file_path = f'{S3_BASE_DIRECTORY}/report_exists.csv'
+    self.profiler._set_output_format('parquet')
+    processed_file_key = self.profiler._generate_processed_file_key(file_path)
+    self.assertEqual(processed_file_key, f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.parquet')
+
+  def test_unknown_output_format(self):
+    with self.assertRaises(ValueError):
+      self.profiler._set_output_format('xlsx')
+
+  def test_compressed_dataset(self):
+    file_path = f'{S3_BASE_DIRECTORY}/report_exists.csv.gz'
+    processed_file_key = self.profiler._generate_processed_file_key(file_path)
+    self.assertEqual(processed_file_key, f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.csv')
+
+  def test_output_compression(self):
+    file_path = f'{S3_BASE_DIRECTORY}/report_exists.csv.bz2'
+    self.profiler._output_compression = 'zstd'
+    processed_file_key = self.profiler._generate_processed_file_key(file_path)
+    self.assertEqual(processed_file_key, f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.csv.zst')
+    self.profiler._set_output_format('parquet')  # Compressed by the format itself
+    processed_file_key = self.profiler._generate_processed_file_key(file_path)
+    self.assertEqual(processed_file_key, f'{S3_BASE_DIRECTORY}/user_profiling/report_exists.parquet')
+
   def test_none_file(self):
     with self.assertRaises(ValueError):
       self.profiler._generate_processed_file_key(None)
@@ -235,6 +232,17 @@ class TestDownloadDataset(TestCase):
       downloaded_file_path = self.profiler._download_dataset(file_path)
       self.file_to_delete = downloaded_file_path
 
+  def test_validated_content(self):
+    file_path = f'{S3_BASE_DIRECTORY}/download_test.csv'
+    etag = self.profiler.handler.get_etag(file_path)
+    self.file_to_delete = self.profiler._download_dataset(file_path, etag)
+    self.assertTrue(os.path.exists(self.file_to_delete))
+
+  def test_changed_content(self):
+    # The content validated was replaced by another upload
+    with self.assertRaises(s3_exceptions.DownloadFileException):
+      self.file_to_delete = self.profiler._download_dataset(f'{S3_BASE_DIRECTORY}/download_test.csv', '"0"')
+
 
 class TestGetChunkSize(TestCase):
   def setUp(self):
@@ -301,6 +309,15 @@ class TestProfileUsers(TestCase):
     columns = df.columns.tolist()
     self.assertIn('gender_class', columns)
   
+  def test_job_stats(self):
+    processed_file = self.profiler._profile_users(self.test_file_1)
+    self.processed_file = processed_file
+    stats = self.profiler.get_job_stats()
+    self.assertGreater(stats['rows'], 0)
+    for stage in ['parse', 'tokenize', 'infer', 'write']:
+      self.assertIn(stage, stats['stage_seconds'])
+    self.assertIn('chunk_sizes', stats['chunks'])
+
   def test_profile_users_2(self):
     processed_file = self.profiler._profile_users(self.test_file_2)
     self.processed_file = processed_file
@@ -312,6 +329,395 @@ class TestProfileUsers(TestCase):
     self.assertIn('gender_class', columns)
 
 
+class TestProfileUsersPipelined(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_same_output_as_sequential(self):
+    self.profiler._get_chunk_size = lambda file: 100
+    self.profiler._pipeline = False
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.profiler._pipeline = True
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+
+    sequential, pipelined = [
+      pd.read_csv(f, sep=UserProfiler._DEFAULT_SEPARATOR) for f in self.processed_files
+    ]
+    pd.testing.assert_frame_equal(sequential, pipelined)
+
+  def test_error_cleans_up(self):
+    self.profiler._get_chunk_size = lambda file: 100
+    self.profiler._pipeline = True
+    def fail(chunk):
+      raise RuntimeError('Failed to process chunk.')
+    self.profiler._process_chunk = fail
+    with self.assertRaises(RuntimeError):
+      self.profiler._profile_users(self.test_file)
+
+
+class TestProfileUsersPassthrough(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_same_output_as_full_parse(self):
+    self.profiler._get_chunk_size = lambda file: 100
+    self.profiler._passthrough = False
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.profiler._passthrough = True
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+
+    full, passthrough = [
+      pd.read_csv(f, sep=UserProfiler._DEFAULT_SEPARATOR) for f in self.processed_files
+    ]
+    pd.testing.assert_frame_equal(full, passthrough)
+
+  def test_raw_records_kept(self):
+    self.profiler._passthrough = True
+    processed_file = self.profiler._profile_users(self.test_file)
+    self.processed_files.append(processed_file)
+    with open(self.test_file, newline='', encoding='utf-8') as f:
+      header = f.readline()
+    with open(processed_file, newline='', encoding='utf-8') as f:
+      processed_header = f.readline()
+    self.assertEqual(processed_header, header.rstrip('\n') + ';gender_class\n')
+
+
+class TestProfileUsersParallel(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    if self.profiler._pool is not None:
+      self.profiler._pool.shutdown()
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_same_output_as_sequential(self):
+    self.profiler._get_chunk_size = lambda file: 50
+    self.profiler._workers = 1
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.profiler._workers = 2
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+
+    sequential, parallel = [
+      pd.read_csv(f, sep=UserProfiler._DEFAULT_SEPARATOR) for f in self.processed_files
+    ]
+    pd.testing.assert_frame_equal(sequential, parallel)
+
+
+class TestProfileUsersIncremental(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.directory = os.path.join(TEST_DATA_DIRECTORY, 'incremental')
+    os.makedirs(self.directory, exist_ok=True)
+    df = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), sep=UserProfiler._DEFAULT_SEPARATOR)
+    self.test_file = os.path.join(self.directory, 'dataset.csv')
+    df.to_csv(self.test_file, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+    self.previous_dataset = os.path.join(self.directory, 'previous_dataset.csv')
+    df.iloc[:100].to_csv(self.previous_dataset, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+    self.changed_dataset = os.path.join(self.directory, 'changed_dataset.csv')
+    df.loc[50, 'bio'] = 'a changed bio'
+    df.to_csv(self.changed_dataset, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+    self.rows = len(df)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_find_profiled_prefix(self):
+    previous_file = self.profiler._profile_users(self.previous_dataset)
+    self.assertEqual(self.profiler._find_profiled_prefix(self.test_file, previous_file), 100)
+    self.assertEqual(self.profiler._find_profiled_prefix(self.changed_dataset, previous_file), 50)
+    os.remove(previous_file)
+
+  def test_other_columns(self):
+    previous_file = self.profiler._profile_users(self.previous_dataset)
+    other_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset_1.csv')
+    self.assertEqual(self.profiler._find_profiled_prefix(other_file, previous_file), 0)
+    os.remove(previous_file)
+
+  def test_other_column_changed(self):
+    df = pd.read_csv(self.previous_dataset, sep=UserProfiler._DEFAULT_SEPARATOR).drop(columns='id_str')
+    previous_dataset = os.path.join(self.directory, 'previous_dataset_no_id.csv')
+    df.to_csv(previous_dataset, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+    previous_file = self.profiler._profile_users(previous_dataset)
+    df.loc[2, 'text'] = 'a changed tweet'
+    changed_dataset = os.path.join(self.directory, 'changed_dataset_no_id.csv')
+    df.to_csv(changed_dataset, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+    self.assertEqual(self.profiler._find_profiled_prefix(changed_dataset, previous_file), 2)
+    incremental_file = self.profiler._profile_users(changed_dataset, previous_file)
+    report = pd.read_csv(incremental_file, sep=UserProfiler._DEFAULT_SEPARATOR)
+    self.assertEqual(report.loc[2, 'text'], 'a changed tweet')
+    for f in (previous_file, incremental_file):
+      os.remove(f)
+
+  def test_same_output_as_full_profile(self):
+    for passthrough in (False, True):
+      self.profiler._passthrough = passthrough
+      previous_file = self.profiler._profile_users(self.previous_dataset)
+      incremental_file = self.profiler._profile_users(self.test_file, previous_file)
+      self.assertEqual(self.profiler._gender_classifier.get_stats()['total_rows'], self.rows - 100)
+      processed_file = self.profiler._profile_users(self.test_file)
+      with open(incremental_file, 'rb') as incremental, open(processed_file, 'rb') as full:
+        self.assertEqual(incremental.read(), full.read())
+      for f in (previous_file, incremental_file, processed_file):
+        os.remove(f)
+
+  def test_failed_prefix_cleans_up(self):
+    previous_file = self.profiler._profile_users(self.previous_dataset)
+    self.profiler._output_compression = 'gzip'
+    outputs = []
+
+    def write_prefix(previous_file, output, rows):
+      outputs.append(output)
+      self.profiler._write_text(output, 'header\n')
+      raise OSError('Failed to read the previous report.')
+
+    with mock.patch.object(self.profiler, '_write_profiled_prefix', side_effect=write_prefix):
+      with self.assertRaises(OSError):
+        self.profiler._profile_users(self.test_file, previous_file)
+    self.assertFalse(os.path.exists(outputs[0]))
+    self.assertEqual(self.profiler._writers, {})
+    os.remove(previous_file)
+
+
+@skipIf(importlib.util.find_spec('pyarrow') is None, 'pyarrow is not installed')
+class TestProfileUsersColumnar(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    self.profiler._set_output_format('csv')
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_same_content_as_csv(self):
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    expected = pd.read_csv(self.processed_files[-1], sep=UserProfiler._DEFAULT_SEPARATOR, dtype=str)
+    readers = {'parquet': pd.read_parquet, 'feather': pd.read_feather}
+    for output_format, read in readers.items():
+      self.profiler._set_output_format(output_format)
+      self.processed_files.append(self.profiler._profile_users(self.test_file))
+      self.assertTrue(self.processed_files[-1].endswith(output_format))
+      df = read(self.processed_files[-1])
+      df['gender_class'] = df['gender_class'].astype(str)
+      pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+class TestProfileUsersCompressed(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.compressed_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset_compressed.csv.gz')
+    with open(self.test_file, 'rb') as f, gzip.open(self.compressed_file, 'wb') as g:
+      shutil.copyfileobj(f, g)
+    self.processed_files = []
+
+  def tearDown(self):
+    self.profiler._output_compression = None
+    for f in self.processed_files + [self.compressed_file]:
+      os.remove(f)
+
+  def test_compressed_input(self):
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.processed_files.append(self.profiler._profile_users(self.compressed_file))
+    with open(self.processed_files[0], 'rb') as f, open(self.processed_files[1], 'rb') as g:
+      self.assertEqual(f.read(), g.read())
+
+  def test_compressed_output(self):
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.profiler._output_compression = 'gzip'
+    self.processed_files.append(self.profiler._profile_users(self.compressed_file))
+    with open(self.processed_files[0], 'rb') as f, gzip.open(self.processed_files[1], 'rb') as g:
+      self.assertEqual(f.read(), g.read())
+
+
+class TestProfileUsersClassifiers(TestCase):
+  def setUp(self):
+    self.environ = dict(os.environ)
+    os.environ['PROFILER_CLASSIFIERS'] = f'gender,bot={__name__}:BotClassifier'
+    for name in ('MODEL_DIRECTORY', 'TOKENIZER_DIRECTORY'):
+      os.environ['BOT_CLASSIFIER_' + name] = os.environ['GENDER_CLASSIFIER_' + name]
+    self.profiler = UserProfiler(Handler())
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    os.environ.clear()
+    os.environ.update(self.environ)
+    registry._CLASSIFIERS.pop('bot', None)
+    registry._CLASSIFIERS.pop('other', None)
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_one_pass(self):
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    df = pd.read_csv(self.processed_files[-1], sep=UserProfiler._DEFAULT_SEPARATOR)
+    self.assertEqual(list(df.columns[-2:]), ['gender_class', 'bot_class'])
+    # Same model and tokenizer: the bot classifier reuses the encodings of the gender one
+    np.testing.assert_array_equal(df['bot_class'].values, df['gender_class'].values)
+    stats = self.profiler.get_job_stats()['classifiers']
+    self.assertEqual(list(stats), ['gender', 'bot'])
+    self.assertEqual(stats['bot']['total_rows'], len(df))
+    self.assertIn('predict_seconds', stats['bot'])
+
+  def test_passthrough(self):
+    self.profiler._passthrough = True
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    with open(self.processed_files[-1]) as f:
+      self.assertTrue(f.readline().rstrip('\r\n').endswith(';gender_class;bot_class'))
+
+  def test_same_class_column(self):
+    os.environ['PROFILER_CLASSIFIERS'] = f'gender,other={__name__}:GenderClassifier'
+    for name in ('MODEL_DIRECTORY', 'TOKENIZER_DIRECTORY'):
+      os.environ['OTHER_CLASSIFIER_' + name] = os.environ['GENDER_CLASSIFIER_' + name]
+    with self.assertRaises(ValueError):
+      UserProfiler(Handler())
+
+
+class TestProfileUsersProbabilities(TestCase):
+  def setUp(self):
+    self.environ = dict(os.environ)
+    os.environ['GENDER_CLASSIFIER_PROBABILITIES'] = 'true'
+    self.profiler = UserProfiler(Handler())
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    os.environ.clear()
+    os.environ.update(self.environ)
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_probability_columns(self):
+    for passthrough in (False, True):
+      self.profiler._passthrough = passthrough
+      self.processed_files.append(self.profiler._profile_users(self.test_file))
+      df = pd.read_csv(self.processed_files[-1], sep=UserProfiler._DEFAULT_SEPARATOR)
+      columns = [column for column in df.columns if column.startswith('gender_proba_')]
+      self.assertEqual(list(df.columns[-len(columns) - 1:]), ['gender_class'] + columns)
+      y_probas = df[columns].values
+      # float16 may round the two most likely classes to the same probability
+      class_probas = y_probas[np.arange(len(df)), df['gender_class'].values]
+      self.assertTrue((class_probas >= y_probas.max(axis=1) - 1e-3).all())
+      np.testing.assert_allclose(y_probas.sum(axis=1), 1.0, atol=1e-2)
+
+
+class TestProfileUsersMemoryBounded(TestCase):
+  def setUp(self):
+    self.environ = dict(os.environ)
+    os.environ['PROFILER_MAX_RSS_BYTES'] = str(resources.current_rss() + 1073741824)
+    self.profiler = UserProfiler(Handler())
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.processed_files = []
+
+  def tearDown(self):
+    os.environ.clear()
+    os.environ.update(self.environ)
+    for f in self.processed_files:
+      os.remove(f)
+
+  def test_same_report(self):
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    self.profiler._max_rss_bytes = None
+    self.processed_files.append(self.profiler._profile_users(self.test_file))
+    bounded, unbounded = [pd.read_csv(f, sep=UserProfiler._DEFAULT_SEPARATOR, dtype=str) for f in self.processed_files]
+    pd.testing.assert_frame_equal(bounded, unbounded)
+
+  def test_fails_over_ceiling(self):
+    self.profiler._max_rss_bytes = resources.current_rss() // 2
+    with self.assertRaises(exceptions.MemoryLimitExceededException):
+      self.profiler._profile_users(self.test_file)
+
+  def test_shrinks_on_pressure(self):
+    self.profiler._get_chunk_size(self.test_file)
+    self.profiler._chunk_sizer._size = 4 * self.profiler._chunk_sizer._batch_size
+    ceiling = self.profiler._max_rss_bytes
+    with mock.patch.object(resources, 'current_rss', return_value=int(ceiling * 0.9)):
+      self.profiler._check_memory(rss_before=int(ceiling * 0.5))
+    self.assertEqual(self.profiler._chunk_sizer.next_size(), 2 * self.profiler._chunk_sizer._batch_size)
+
+  def test_workers_counted(self):
+    self.profiler._workers = 2
+    ceiling = self.profiler._max_rss_bytes
+    with mock.patch.object(resources, 'children_rss', return_value=ceiling):
+      with self.assertRaises(exceptions.MemoryLimitExceededException):
+        self.profiler._check_memory()
+
+  def test_workers_started_before_sizing(self):
+    self.profiler._workers = 2
+    calls = []
+    with mock.patch.object(self.profiler, '_get_pool', side_effect=lambda: calls.append('pool')), \
+         mock.patch.object(self.profiler, '_get_memory_budget',
+                           side_effect=lambda: calls.append('budget') or self.profiler._max_rss_bytes):
+      self.profiler._get_chunk_size(self.test_file)
+    self.assertEqual(calls, ['pool', 'budget'])
+
+  def test_parallel_chunks_measured(self):
+    self.profiler._get_chunk_size(self.test_file)
+    rows = self.profiler._chunk_sizer.next_size()
+    with self.profiler._measure_chunk(rows) as worker_measure:
+      worker_measure.update(seconds=0.1, memory_bytes=rows * 10 * 1048576)
+    self.assertLess(self.profiler._chunk_sizer.next_size(), rows)
+    self.assertGreaterEqual(self.profiler._chunk_sizer.get_stats()['measured_bytes_per_row'], 10 * 1048576)
+
+
+class TestProfileUsersBatch(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.test_files = [
+      os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'),
+      os.path.join(TEST_DATA_DIRECTORY, 'dataset_1.csv'),
+    ]
+    self.processed_files = []
+
+  def tearDown(self):
+    for processed_file in self.processed_files:
+      if os.path.exists(processed_file):
+        os.remove(processed_file)
+
+  def test_same_output_as_single_datasets(self):
+    failures = {}
+    processed_files = self.profiler._profile_users_batch(self.test_files, failures, ['a.csv', 'b.csv'])
+    self.processed_files.extend(processed_files.values())
+    self.assertEqual(failures, {})
+    for index, test_file in enumerate(self.test_files):
+      processed_file = self.profiler._profile_users(test_file)
+      self.processed_files.append(processed_file)
+      with open(processed_files[index], 'rb') as batch_output, open(processed_file, 'rb') as output:
+        self.assertEqual(batch_output.read(), output.read())
+
+  def test_missing_dataset_fails_alone(self):
+    failures = {}
+    files = [self.test_files[0], 'non_existing_dataset.csv']
+    processed_files = self.profiler._profile_users_batch(files, failures, ['a.csv', 'b.csv'])
+    self.processed_files.extend(processed_files.values())
+    self.assertEqual(list(failures), ['b.csv'])
+    self.assertIn(0, processed_files)
+
+
 class TestUploadProcessedDataset(TestCase):
   def setUp(self):
     handler = Handler()
@@ -400,6 +806,116 @@ class TestProfile1(TestCase):
     self.assertTrue(s3.file_exists(self.processed_object_key))
 
 
+class TestReuseReport(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.s3_key = f'{S3_BASE_DIRECTORY}/test_profile_method.csv'
+    self.copy_key = f'{S3_BASE_DIRECTORY}/test_profile_method_copy.csv'
+    handler.copy_file(self.s3_key, self.copy_key)
+    self.processed_object_keys = [
+      self.profiler._generate_processed_file_key(key) for key in (self.s3_key, self.copy_key)
+    ]
+    self.manifest_key = self.profiler._get_manifest_key(handler.get_etag(self.s3_key))
+
+  def tearDown(self):
+    for key in [self.copy_key, self.manifest_key] + self.processed_object_keys:
+      try:
+        s3.delete_object(key)
+      except:
+        pass
+
+  def test_manifest_written(self):
+    email = 'falak.sher@venturedive.com'
+    self.profiler.profile(self.s3_key, email)
+    manifest = self.profiler.handler.read_json(self.manifest_key)
+    self.assertEqual(manifest['report_key'], self.processed_object_keys[0])
+    self.assertEqual(manifest['model_version'], self.profiler._gender_classifier.get_model_version())
+
+  def test_same_content_reused(self):
+    email = 'falak.sher@venturedive.com'
+    self.profiler.profile(self.s3_key, email)
+    self.profiler.profile(self.copy_key, email)
+    self.assertTrue(self.profiler.get_job_stats()['report_reused'])
+    self.assertEqual(
+      self.profiler.handler.open_stream(self.processed_object_keys[1]).read(),
+      self.profiler.handler.open_stream(self.processed_object_keys[0]).read()
+    )
+
+  def test_overwritten_report_not_reused(self):
+    email = 'falak.sher@venturedive.com'
+    self.profiler.profile(self.s3_key, email)
+    self.profiler.handler.copy_file(self.s3_key, self.processed_object_keys[0])
+    etag, manifest = asyncio.run(self.profiler._validate_async(self.copy_key, email))
+    self.assertIsNone(manifest)
+
+
+class TestProfileIncremental(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.s3_key = f'{S3_BASE_DIRECTORY}/test_profile_incremental.csv'
+    self.processed_object_key = self.profiler._generate_processed_file_key(self.s3_key)
+    self.test_file = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    self.previous_dataset = os.path.join(TEST_DATA_DIRECTORY, 'previous_dataset.csv')
+    df = pd.read_csv(self.test_file, sep=UserProfiler._DEFAULT_SEPARATOR)
+    df.iloc[:100].to_csv(self.previous_dataset, sep=UserProfiler._DEFAULT_SEPARATOR, index=False)
+
+  def tearDown(self):
+    os.remove(self.previous_dataset)
+    for key in (self.s3_key, self.processed_object_key):
+      try:
+        s3.delete_object(key)
+      except:
+        pass
+
+  def test_profile(self):
+    email = 'falak.sher@venturedive.com'
+    self.profiler._incremental = True
+    s3.upload_file(self.s3_key, self.previous_dataset)
+    self.profiler.profile(self.s3_key, email)
+    s3.upload_file(self.s3_key, self.test_file)
+    self.profiler.profile(self.s3_key, email)
+    self.assertEqual(self.profiler.get_job_stats()['reused_rows'], 100)
+
+
+class TestStreamChunkSize(TestCase):
+  def setUp(self):
+    self.profiler = UserProfiler(Handler())
+    with open(os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv'), 'rb') as f:
+      self.content = f.read()
+
+  def test_head_cut_in_quoted_field(self):
+    size = self.content.index(b'#COVID')  # Inside the quoted text of the third row
+    with mock.patch.object(self.profiler, '_STREAM_SAMPLE_SIZE_IN_BYTES', size), \
+         mock.patch.object(self.profiler.handler, 'read_head', return_value=self.content[:size]):
+      chunk_size = self.profiler._get_stream_chunk_size('dataset.csv')
+    self.assertEqual(chunk_size % self.profiler._gender_classifier.get_batch_size(), 0)
+    self.assertIsNotNone(self.profiler._chunk_sizer.get_stats()['estimated_bytes_per_row'])
+
+
+class TestProfileStream(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.s3_key = f'{S3_BASE_DIRECTORY}/test_profile_method.csv'
+    self.processed_object_key = f'{S3_BASE_DIRECTORY}/user_profiling/test_profile_stream.csv'
+
+  def tearDown(self):
+    try:
+      s3.delete_object(self.processed_object_key)
+    except:
+      pass
+
+  def test_profile_stream(self):
+    self.profiler._profile_stream(self.s3_key, self.processed_object_key)
+    self.assertTrue(s3.file_exists(self.processed_object_key))
+
+    stream = self.profiler.handler.open_stream(self.processed_object_key)
+    df = pd.read_csv(stream, nrows=10, sep=UserProfiler._DEFAULT_SEPARATOR)
+    self.assertIn('gender_class', df.columns.tolist())
+
+
 class TestProfile2(TestCase):
   def setUp(self):
     handler = Handler()
@@ -417,3 +933,58 @@ class TestProfile2(TestCase):
     email = 'falak.sher@venturedive.com'
     self.profiler.profile(self.s3_key, email)
     self.assertTrue(s3.file_exists(self.processed_object_key))
+
+
+class TestProfileBatch(TestCase):
+  def setUp(self):
+    handler = Handler()
+    self.profiler = UserProfiler(handler)
+    self.s3_keys = [f'{S3_BASE_DIRECTORY}/test_profile_method.csv', f'{S3_BASE_DIRECTORY}/test2.csv']
+    self.processed_object_keys = [self.profiler._generate_processed_file_key(key) for key in self.s3_keys]
+
+  def tearDown(self):
+    for key in self.processed_object_keys:
+      try:
+        s3.delete_object(key)
+      except:
+        pass
+
+  def test_profile_batch(self):
+    email = 'falak.sher@venturedive.com'
+    statuses = self.profiler.profile_batch([(key, email) for key in self.s3_keys])
+    self.assertEqual(set(statuses), set(self.s3_keys))
+    for key in self.processed_object_keys:
+      self.assertTrue(s3.file_exists(key))
+
+  def test_failed_dataset(self):
+    email = 'falak.sher@venturedive.com'
+    missing_key = f'{S3_BASE_DIRECTORY}/non_existing_dataset.csv'
+    with self.assertRaises(exceptions.BatchProfilingException) as context:
+      self.profiler.profile_batch([(self.s3_keys[0], email), (missing_key, email)])
+    self.assertEqual(list(context.exception.failures), [missing_key])
+    self.assertTrue(s3.file_exists(self.processed_object_keys[0]))
+
+  def test_failed_content_read(self):
+    email = 'falak.sher@venturedive.com'
+    get_content_id = self.profiler._get_content_id
+    calls = []
+
+    def fail_first(file):
+      calls.append(file)
+      if len(calls) == 1:
+        raise OSError('Failed to read the dataset.')
+      return get_content_id(file)
+
+    profile_users_batch = mock.Mock(wraps=self.profiler._profile_users_batch)
+    with mock.patch.object(self.profiler, '_get_content_id', side_effect=fail_first), \
+         mock.patch.object(self.profiler, '_profile_users_batch', profile_users_batch):
+      with self.assertRaises(exceptions.BatchProfilingException) as context:
+        self.profiler.profile_batch([(key, email) for key in self.s3_keys])
+    self.assertEqual(list(context.exception.failures), [self.s3_keys[0]])
+    self.assertFalse(s3.file_exists(self.processed_object_keys[0]))
+    self.assertTrue(s3.file_exists(self.processed_object_keys[1]))
+    # Only the dataset read is profiled, paired with its own key
+    files, _, keys = profile_users_batch.call_args[0]
+    self.assertEqual(files, calls[1:])
+    self.assertEqual(keys, self.s3_keys[1:])
+    self.assertFalse(os.path.exists(calls[0]))
@@ -0,0 +1,64 @@
+import io
+import os
+import gzip
+import shutil
+import tempfile
+import pandas as pd
+from unittest import TestCase
+
+from user_profiler.records import RecordReader, append_column, drop_last_record
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestRecordReader(TestCase):
+  def test_multiline_records(self):
+    content = b'a;b\n1;"first\nsecond"\n\n2;"say ""hi"""\r\n3;x"y\n'
+    records = list(RecordReader(io.BytesIO(content), separator=';'))
+    self.assertEqual(records, [
+      'a;b\n', '1;"first\nsecond"\n', '2;"say ""hi"""\r\n', '3;x"y\n',
+    ])
+
+  def test_matches_parsed_rows(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    df = pd.read_csv(path, sep=';')
+    reader = RecordReader(path, separator=';')
+    records = list(reader)
+    reader.close()
+    self.assertEqual(len(records), len(df) + 1)  # Header
+    with open(path, newline='', encoding='utf-8') as f:
+      self.assertEqual(''.join(records), f.read())
+
+  def test_compressed_file(self):
+    path = os.path.join(TEST_DATA_DIRECTORY, 'dataset.csv')
+    directory = tempfile.mkdtemp()
+    compressed = os.path.join(directory, 'dataset.csv.gz')
+    try:
+      with open(path, 'rb') as f, gzip.open(compressed, 'wb') as g:
+        shutil.copyfileobj(f, g)
+      reader = RecordReader(compressed, separator=';')
+      records = list(reader)
+      reader.close()
+      with open(path, newline='', encoding='utf-8') as f:
+        self.assertEqual(''.join(records), f.read())
+    finally:
+      shutil.rmtree(directory)
+
+
+class TestDropLastRecord(TestCase):
+  def test_cut_in_quoted_field(self):
+    head = b'a;b\n1;"first\nsecond"\n2;"cut\ninside'
+    self.assertEqual(drop_last_record(head, separator=';'), b'a;b\n1;"first\nsecond"\n')
+
+  def test_cut_in_character(self):
+    head = 'a;b\n1;é\n2;é'.encode('utf-8')[:-1]
+    self.assertEqual(drop_last_record(head, separator=';'), 'a;b\n'.encode('utf-8'))
+
+
+class TestAppendColumn(TestCase):
+  def test_line_endings(self):
+    self.assertEqual(append_column('a;b\n', '1', ';'), 'a;b;1\n')
+    self.assertEqual(append_column('a;b\r\n', '1', ';'), 'a;b;1\r\n')
+    self.assertEqual(append_column('a;b', '1', ';'), 'a;b;1\n')
+    self.assertEqual(append_column('a;"b\nc"\n', '1', ';'), 'a;"b\nc";1\n')
@@ -0,0 +1,80 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from unittest import TestCase, skipIf
+
+from user_profiler import writers
+
+try:
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None  # The columnar output formats are optional
+
+
+TEST_DATA_DIRECTORY = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestGetExtension(TestCase):
+  def test_formats(self):
+    self.assertEqual(writers.get_extension('csv'), 'csv')
+    self.assertEqual(writers.get_extension('parquet'), 'parquet')
+    self.assertEqual(writers.get_extension('feather'), 'feather')
+
+  def test_unknown_format(self):
+    with self.assertRaises(ValueError):
+      writers.get_extension('xlsx')
+
+
+class TestColumnarWriter(TestCase):
+  def test_abstract(self):
+    with self.assertRaises(TypeError):
+      writers.ColumnarWriter('report')
+
+
+@skipIf(pa is None, 'pyarrow is not installed')
+class TestColumnarWriters(TestCase):
+  def setUp(self):
+    self.directory = os.path.join(TEST_DATA_DIRECTORY, 'writers')
+    os.makedirs(self.directory, exist_ok=True)
+    df = pd.read_csv(os.path.join(TEST_DATA_DIRECTORY, 'dataset_1.csv'), sep=';', dtype=str)
+    df['gender_class'] = 1
+    self.chunks = [df.iloc[:20], df.iloc[20:40], df.iloc[40:]]
+    # A column missing from the whole first chunk is still written as text
+    self.chunks[0] = self.chunks[0].assign(lat=pd.Series(np.nan, index=self.chunks[0].index, dtype=object))
+    self.expected = pd.concat(self.chunks, ignore_index=True)
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def _write(self, output_format: str, output):
+    writer = writers.get_writer(output_format, output)
+    for chunk in self.chunks:
+      writer.write(chunk)
+    writer.close()
+
+  def test_parquet_row_group_per_chunk(self):
+    output = os.path.join(self.directory, 'report.parquet')
+    self._write('parquet', output)
+    parquet_file = pq.ParquetFile(output)
+    self.assertEqual(parquet_file.metadata.num_row_groups, len(self.chunks))
+    pd.testing.assert_frame_equal(parquet_file.read().to_pandas(), self.expected, check_dtype=False)
+
+  def test_feather_batch_per_chunk(self):
+    output = os.path.join(self.directory, 'report.feather')
+    self._write('feather', output)
+    reader = pa.ipc.open_file(output)
+    self.assertEqual(reader.num_record_batches, len(self.chunks))
+    pd.testing.assert_frame_equal(reader.read_all().to_pandas(), self.expected, check_dtype=False)
+
+  def test_stream_output(self):
+    output = os.path.join(self.directory, 'report.parquet')
+    with open(output, 'wb') as f:
+      self._write('parquet', f)
+      self.assertFalse(f.closed)
+    pd.testing.assert_frame_equal(pd.read_parquet(output), self.expected, check_dtype=False)
+
+  def test_not_columnar(self):
+    with self.assertRaises(ValueError):
+      writers.get_writer('csv', os.path.join(self.directory, 'report.csv'))
@@ -0,0 +1,50 @@
+"""
+Entry points of the processes used by UserProfiler to classify chunks in parallel.
+Each worker process loads its own classifiers once, in the pool initializer.
+"""
+import os
+import time
+import pandas as pd
+
+from classifiers.base import predict_all
+from . import resources
+
+
+_classifiers = None
+
+
+def init_worker(classifier_specs: dict, ready=None):
+  """
+  Loads the classifiers of the profiler, given as {name: (class, arguments)}, then puts
+  the pid of the worker in the ready queue, when given.
+  """
+  global _classifiers
+  _classifiers = {
+    name: classifier_class(**classifier_args)
+    for name, (classifier_class, classifier_args) in classifier_specs.items()
+  }
+  if ready is not None:
+    ready.put(os.getpid())
+
+
+def get_pid() -> int:
+  return os.getpid()
+
+
+def predict_outputs(features: pd.DataFrame):
+  """
+  Predicts the output columns of a chunk in the worker process.
+  Returns the values by output column, the prediction counters of this chunk by classifier,
+  and the seconds and growth of the resident memory of the worker it took, in bytes.
+  """
+  rss_before = resources.current_rss()
+  started = time.perf_counter()
+  for classifier in _classifiers.values():
+    classifier.reset_stats()
+  outputs = predict_all(list(_classifiers.values()), features)
+  stats = {name: classifier.get_stats() for name, classifier in _classifiers.items()}
+  measure = {
+    'seconds': time.perf_counter() - started,
+    'memory_bytes': max(resources.current_rss() - rss_before, 0),
+  }
+  return outputs, stats, measure
@@ -0,0 +1,126 @@
+"""
+Writers of the processed chunks in the columnar output formats of UserProfiler, each chunk
+being written as it is produced: one row group of a Parquet file, or one record batch of
+an Arrow IPC (Feather v2) file. Both are compressed with zstd.
+
+pyarrow is only needed by these formats (pip install pyarrow); CSV reports are written
+by the profiler itself.
+"""
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
+
+
+OUTPUT_FORMATS = {
+  'csv': 'csv',
+  'parquet': 'parquet',
+  'feather': 'feather',
+}  # Output format: extension of the report
+_COMPRESSION = 'zstd'
+
+
+def get_extension(output_format: str) -> str:
+  if output_format not in OUTPUT_FORMATS:
+    raise ValueError(f'{output_format}: Unknown output format, expected one of {list(OUTPUT_FORMATS)}.')
+  return OUTPUT_FORMATS[output_format]
+
+
+def _import_pyarrow():
+  try:
+    import pyarrow
+  except ImportError:
+    raise ImportError('The parquet and feather output formats need pyarrow: pip install pyarrow')
+  return pyarrow
+
+
+class ColumnarWriter(ABC):
+  """
+  Writes chunks to output, a local file path or a writable stream, with the schema of the
+  first chunk. The datasets are read as text, so every column but the outputs of the
+  classifiers is a string, even when all its values in the first chunk are missing.
+  Each format opens its writer of the file in _open.
+  """
+
+  def __init__(self, output):
+    self._pa = _import_pyarrow()
+    self._output = output
+    self._sink = None
+    self._writer = None
+    self._schema = None
+
+  def _get_schema(self, chunk: pd.DataFrame):
+    pa = self._pa
+    fields = []
+    for column, dtype in chunk.dtypes.items():
+      if pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+        fields.append(pa.field(str(column), pa.from_numpy_dtype(dtype)))
+      else:
+        fields.append(pa.field(str(column), pa.string()))
+    return pa.schema(fields)
+
+  @abstractmethod
+  def _open(self, sink, schema):
+    """Returns the pyarrow writer of the file to sink, with schema."""
+
+  def _write_table(self, table):
+    self._writer.write_table(table)
+
+  def write(self, chunk: pd.DataFrame):
+    if self._writer is None:
+      self._schema = self._get_schema(chunk)
+      if isinstance(self._output, str):
+        self._sink = self._pa.OSFile(self._output, 'wb')
+      else:
+        self._sink = self._pa.PythonFile(self._output, mode='w')
+      self._writer = self._open(self._sink, self._schema)
+    table = self._pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+    self._write_table(table)
+
+  def close(self):
+    """Writes the footer of the file. A stream given as output is left open."""
+    if self._writer is None:
+      return
+    self._writer.close()
+    if isinstance(self._output, str):
+      self._sink.close()
+    self._writer = None
+
+
+class ParquetWriter(ColumnarWriter):
+
+  def write(self, chunk: pd.DataFrame):
+    # Parquet has no half float type before format 2.10, the probabilities are written as float32
+    halves = {column: np.float32 for column, dtype in chunk.dtypes.items() if dtype == np.float16}
+    super().write(chunk.astype(halves) if halves else chunk)
+
+  def _open(self, sink, schema):
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(sink, schema, compression=_COMPRESSION)
+
+  def _write_table(self, table):
+    # One row group per chunk, instead of splitting it at the default row group size
+    self._writer.write_table(table, row_group_size=max(table.num_rows, 1))
+
+
+class FeatherWriter(ColumnarWriter):
+
+  def _open(self, sink, schema):
+    options = self._pa.ipc.IpcWriteOptions(compression=_COMPRESSION)
+    return self._pa.ipc.new_file(sink, schema, options=options)
+
+  def _write_table(self, table):
+    # One record batch per chunk
+    self._writer.write_table(table, max_chunksize=max(table.num_rows, 1))
+
+
+_WRITERS = {
+  'parquet': ParquetWriter,
+  'feather': FeatherWriter,
+}
+
+
+def get_writer(output_format: str, output) -> ColumnarWriter:
+  """Returns the writer of a columnar output format to output, a local file path or a writable stream."""
+  if output_format not in _WRITERS:
+    raise ValueError(f'{output_format}: Not a columnar output format, expected one of {list(_WRITERS)}.')
+  return _WRITERS[output_format](output)